@@ -0,0 +1,167 @@
+# werewolf_game/agents/agent_pool.py
+"""
+跨局复用AI玩家Agent和模型客户端。
+
+连续多局（main.py 的重玩、游戏服务器、基准测试、反事实分支）时，每局都新建全部 Agent：
+读取提示词文件、为每个座位创建模型客户端（openai SDK 每次新建 HTTP 客户端约 20 毫秒，
+主要是 SSL 上下文），连接也无法复用。Agent 池在游戏结束后收回 Agent，下一局原地重置：
+清空记忆、按新角色换系统提示、换回原来的模型；模型客户端和格式化器继续复用。
+
+同一服务地址的所有模型共用一个 HTTP 客户端（连接池），裁判模型和游戏中切换的模型也是。
+HTTP 连接绑定在创建它的事件循环上，事件循环变化时（如多次 asyncio.run）池会清空。
+
+用法：
+    agent = agent_pool.acquire(role, model_config, agent_id)   # 代替 create_player_agent
+    model = agent_pool.create_model(model_config)              # 代替直接创建 OpenAIChatModel
+    agent_pool.release(agents)                                 # 游戏结束后归还（人类玩家会被跳过）
+    await agent_pool.aclose()                                  # 事件循环结束前关闭连接
+"""
+import asyncio
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from agents.player_agent import create_player_agent, create_chat_model, reset_player_agent
+
+try:
+    from configs import AGENT_POOL
+except ImportError:
+    AGENT_POOL = {}
+
+# 默认配置，configs.py 中的 AGENT_POOL 会覆盖同名字段
+DEFAULT_AGENT_POOL_CONFIG = {
+    "enabled": True,
+    # 最多保留的空闲 Agent 数
+    "max_idle": 64,
+}
+
+
+def get_agent_pool_config() -> Dict:
+    """合并默认配置与 configs.py 中的 AGENT_POOL。"""
+    config = dict(DEFAULT_AGENT_POOL_CONFIG)
+    config.update(AGENT_POOL)
+    return config
+
+
+def _pool_key(model_config: Dict) -> Tuple[str, str, str]:
+    return model_config["model_name"], model_config.get("base_url") or "", model_config.get("api_key") or ""
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None  # 在 asyncio.to_thread 的线程中创建游戏时没有运行中的事件循环
+
+
+class AgentPool:
+    """
+    按模型配置分组的空闲 Agent 池，以及按服务地址共用的 HTTP 客户端。
+    可以在多个线程中使用（游戏服务器在线程中创建游戏）。
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._idle: Dict[Tuple[str, str, str], List[Any]] = {}
+        self._http_clients: Dict[str, Any] = {}
+        self.created = 0
+        self.reused = 0
+
+    def _check_loop(self) -> None:
+        """事件循环变化时关闭并丢弃绑定在旧循环上的连接和 Agent（调用方持有锁）。"""
+        loop = _running_loop()
+        if loop is not None and loop is not self._loop:
+            if self._loop is not None:
+                self._idle.clear()
+                clients = list(self._http_clients.values())
+                self._http_clients.clear()
+                # 旧循环仍在其他线程中运行时在该循环上关闭连接；已结束的循环上无法再 aclose，
+                # 只能释放引用（事件循环的所有者应在结束前调用 aclose，见下）
+                if self._loop.is_running():
+                    for client in clients:
+                        asyncio.run_coroutine_threadsafe(client.aclose(), self._loop)
+            self._loop = loop
+
+    async def aclose(self) -> None:
+        """
+        关闭所有共用的 HTTP 客户端并清空池。
+        事件循环的所有者（asyncio.run 的入口协程，如 main.py 的主循环、基准测试）在结束前调用，
+        连接在创建它们的事件循环上关闭，不会泄漏到下一个事件循环。
+        """
+        with self._lock:
+            clients = list(self._http_clients.values())
+            self._http_clients.clear()
+            self._idle.clear()
+            self._loop = None
+        for client in clients:
+            await client.aclose()
+
+    def _http_client(self, base_url: str) -> Any:
+        """同一服务地址共用的 HTTP 客户端（调用方持有锁）。"""
+        client = self._http_clients.get(base_url)
+        if client is None:
+            import openai
+            client = self._http_clients[base_url] = openai.DefaultAsyncHttpxClient()
+        return client
+
+    def create_model(self, model_config: Dict) -> Any:
+        """创建一个模型实例，共用该服务地址的 HTTP 客户端；关闭池时与直接创建相同。"""
+        if not get_agent_pool_config().get("enabled"):
+            return create_chat_model(model_config)
+        with self._lock:
+            self._check_loop()
+            http_client = self._http_client(model_config.get("base_url") or "")
+        return create_chat_model(model_config, http_client)
+
+    def acquire(self, role: str, model_config: Dict, agent_id: Optional[int] = None) -> Any:
+        """
+        取出一个使用该模型配置的空闲 Agent 并按新角色重置；没有时新建。
+
+        Args:
+            role (str): 本局的角色
+            model_config (Dict): 同 create_player_agent
+            agent_id (int, optional): 新建时使用的 agent id
+        """
+        if not get_agent_pool_config().get("enabled"):
+            return create_player_agent(role=role, model_config=model_config, agent_id=agent_id)
+        key = _pool_key(model_config)
+        with self._lock:
+            self._check_loop()
+            idle = self._idle.get(key)
+            agent = idle.pop() if idle else None
+            http_client = self._http_client(key[1]) if agent is None else None
+        if agent is not None:
+            self.reused += 1
+            return reset_player_agent(agent, role, agent._pool_model)
+
+        self.created += 1
+        agent = create_player_agent(role=role, model_config=model_config, agent_id=agent_id, http_client=http_client)
+        setattr(agent, '_pool_key', key)
+        setattr(agent, '_pool_model', agent.model)
+        return agent
+
+    def release(self, agents: Iterable[Any]) -> None:
+        """游戏结束后归还 Agent（人类玩家和不是从池中取出的 Agent 会被跳过）。"""
+        if not get_agent_pool_config().get("enabled"):
+            return
+        max_idle = get_agent_pool_config()["max_idle"]
+        with self._lock:
+            self._check_loop()
+            for agent in agents:
+                key = getattr(agent, '_pool_key', None)
+                if key is None or getattr(agent, 'is_user', False):
+                    continue
+                if sum(len(idle) for idle in self._idle.values()) >= max_idle:
+                    break
+                idle = self._idle.setdefault(key, [])
+                if agent not in idle:
+                    idle.append(agent)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            idle = sum(len(idle) for idle in self._idle.values())
+        return {"created": self.created, "reused": self.reused, "idle": idle, "http_clients": len(self._http_clients)}
+
+
+# 创建一个全局的Agent池实例，方便在其他模块中导入和使用
+agent_pool = AgentPool()
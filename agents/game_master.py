@@ -3,18 +3,63 @@
 import asyncio
 import sys
 import os
-import io
-import contextlib
-from typing import List, Dict, Union, Optional, Tuple
+import time
+import json
+from typing import Any, List, Dict, Union, Optional, Tuple
 from agentscope.agent import AgentBase, UserAgent, ReActAgent
 # from agentscope.model import ModelWrapperBase
 from agentscope.message import Msg
 from agentscope.pipeline import MsgHub
 from collections import Counter
 import random
-import re
-from logger import game_logger, prompt_logger, memory_logger # 【新功能】引入prompt_logger和memory_logger
+from logger import game_logger, prompt_logger, memory_logger, event_logger, new_game_id # 【新功能】引入prompt_logger和memory_logger
+from prompt_budget import PromptBuilder, prompt_stats, count_tokens
+from call_metrics import call_metrics, get_metrics_config, resolve_model_key, OUTCOME_OK, OUTCOME_RECOVERED, OUTCOME_ERROR, OUTCOME_TIMEOUT
+from tracing import tracer, traced, get_tracing_config
+from mem_profiler import memory_profiler
+from token_budget import token_budget, LEVEL_NORMAL, BRIEF_INSTRUCTION
+from response_sanitizer import extract_text, extract_thinking, remove_thinking_tags, clean_speech
+from structured_output import structured_decisions
+from table_setup import seat_key
+from game_context import capture_output
+from model_probe import (
+    STATUS_OK, get_model_probe_config, model_identity, probe_models, format_probe_results,
+)
+from checkpoint import (
+    PHASE_ORDER, CHECKPOINT_VERSION, get_checkpoint_config, checkpoint_path, write_checkpoint, remove_checkpoint,
+    rng_state, restore_rng_state,
+)
+from target_matcher import TargetMatcher, MATCH_TARGET, MATCH_ABSTAIN, MATCH_AMBIGUOUS, MATCH_NONE, HUNTER_ABSTAIN_TOKENS, POISON_ABSTAIN_TOKENS
 from agentscope.formatter import OpenAIMultiAgentFormatter
+from agents.agent_pool import agent_pool
+from ratings import get_ratings_config, record_finished_game
+from seeding import next_game_seed
+
+try:
+    from configs import MODEL_LIST, API_PROVIDERS
+except ImportError:
+    MODEL_LIST, API_PROVIDERS = {}, {}
+
+try:
+    from configs import INPUT_OVERLAP
+except ImportError:
+    INPUT_OVERLAP = {}
+
+# 默认配置，configs.py 中的 INPUT_OVERLAP 会覆盖同名字段
+DEFAULT_INPUT_OVERLAP_CONFIG = {
+    "enabled": False,
+    # 投票：人类玩家的投票提示立即显示，与AI投票同时收集
+    "vote": True,
+    # 夜晚：预言家查验与狼人行动同时进行（二者互不依赖；女巫需要知道击杀目标，仍在之后行动）
+    "night": True,
+}
+
+
+def get_input_overlap_config() -> Dict:
+    """合并默认配置与 configs.py 中的 INPUT_OVERLAP。"""
+    config = dict(DEFAULT_INPUT_OVERLAP_CONFIG)
+    config.update(INPUT_OVERLAP)
+    return config
 
 # 角色中英文映射
 ROLE_CN_MAP = {
@@ -38,6 +83,9 @@ class GameMasterAgent(ReActAgent):
         player_identities: Dict[str, str],
         model: None,
         summary_model: None,  # 新增：专门用于生成摘要的模型
+        checkpoint: Optional[Dict] = None,
+        seed: Optional[int] = None,
+        rng: Optional[random.Random] = None,
     ) -> None:
         """
         初始化裁判Agent。
@@ -47,6 +95,9 @@ class GameMasterAgent(ReActAgent):
             player_identities (Dict[str, str]): 一个字典，key是玩家名，value是角色身份.
             model (ModelWrapperBase, optional): 为裁判配置的语言模型（主模型）. Defaults to None.
             summary_model (ModelWrapperBase, optional): 专门用于生成记忆摘要的模型. Defaults to None.
+            checkpoint (Dict, optional): 从检查点恢复时传入（见 checkpoint.py），恢复游戏状态并继续写入原来的日志.
+            seed (int, optional): 本局的随机种子，为空时按 SEEDING 配置生成（见 seeding.py）.
+            rng (random.Random, optional): 开局时已用该种子分配过角色的随机数生成器，裁判接着使用.
         """
         # 【重要更新】将name硬编码，并接收model参数
         # super().__init__()
@@ -94,10 +145,51 @@ class GameMasterAgent(ReActAgent):
             f"本局游戏共有 {num_players} 名玩家，角色配置为：{roles_summary}。"
         )
 
-        game_logger.start_game(self.game_state["identities"])
-        prompt_logger.start_logging() # 【新功能】为新游戏初始化prompt日志
+        # 本局的随机数生成器：随机换模型、裁判随机选人都使用它，同一种子的两局做出相同的随机决定
+        if checkpoint and checkpoint.get("seed") is not None:
+            seed = checkpoint["seed"]
+        self.seed = seed if seed is not None else next_game_seed()
+        self.rng = rng or random.Random(self.seed)
+
+        # 本局的对局 ID：日志文件名、事件日志、检查点和模型评分共用；从检查点恢复时沿用原对局的 ID，继续写入原来的日志
+        game_id = checkpoint["game_id"] if checkpoint else new_game_id()
+        game_logger.start_game(self.game_state["identities"], game_id)
+        # 继续追加到原来的游戏日志（反事实分支不带日志文件名，写入自己的新日志）
+        resumed_log = checkpoint.get("logs", {}).get("game_log") if checkpoint else None
+        if resumed_log:
+            game_logger.log_filename = resumed_log
+        else:
+            game_logger.add_entry(f"本局随机种子: {self.seed}")
+        prompt_logger.start_logging(game_id) # 【新功能】为新游戏初始化prompt日志
+        memory_logger.start_logging(game_id)
+        prompt_stats.reset() # 每局重新统计prompt的token分布
+        event_logger.start_game(game_id)
+        call_metrics.reset(event_logger.game_id) # 每局重新统计模型调用
+        token_budget.reset() # 每局重新累计token用量
+        structured_decisions.reset() # 每局重新统计决策解析情况
+        tracer.reset(event_logger.game_id)
         self._setup_msghub(players)
 
+        # 检查点：每个阶段开始前保存；从检查点恢复时从保存的阶段继续（路径为 None 时不保存）
+        self.checkpoint_path = checkpoint_path(event_logger.game_id)
+        self._resume_phase = None
+        # 反事实分支（见 counterfactual.py）：{决定类型: 指定的结果}，每种决定在下一次出现时替换一次
+        self.decision_overrides: Dict[str, Any] = {}
+        # 开局探测中不健康的模型ID，游戏中遇到 429 切换模型时避开（见 model_probe.py）
+        self.unhealthy_models: set = set()
+        # 游戏结束后是否计入模型评分（见 ratings.py）；反事实分支不计入
+        self.record_ratings = True
+        if checkpoint:
+            self._restore_checkpoint(checkpoint)
+            print(f"===== 从检查点恢复：第 {self.game_state['day']} 天 {self._resume_phase} =====")
+            return
+        self._log_event("game_start", payload={
+            "seed": self.seed,
+            "identities": dict(player_identities),
+            "models": {p.name: self._get_agent_model_info(p) for p in players},
+            "game_log": game_logger.log_filename,
+        })
+
         print("===== 游戏开始，裁判已就位 =====")
 
         # print("玩家列表:")
@@ -121,8 +213,13 @@ class GameMasterAgent(ReActAgent):
         self.public_channel = MsgHub(participants=players)
         print("已创建游戏公共通信频道。")
 
-    async def notify_werewolves_of_teammates(self) -> None:
-        """向所有狼人玩家（包括AI和人类）私密地通知他们的队友。"""
+    async def notify_werewolves_of_teammates(self, users_only: bool = False) -> None:
+        """
+        向所有狼人玩家（包括AI和人类）私密地通知他们的队友。
+
+        Args:
+            users_only (bool): 只通知人类玩家（从检查点恢复时，AI的对话记忆中已有队友信息）
+        """
         werewolf_names = [
             p_name
             for p_name, p_role in self.game_state["identities"].items()
@@ -140,6 +237,8 @@ class GameMasterAgent(ReActAgent):
 
             # 获取玩家agent实例
             player_agent = self.game_state["players"][werewolf_name]["agent"]
+            if users_only and not getattr(player_agent, 'is_user', False):
+                continue
 
             # 根据agent类型（用户或AI）发送不同的私密消息
             if getattr(player_agent, 'is_user', False):
@@ -154,33 +253,37 @@ class GameMasterAgent(ReActAgent):
         """
         游戏的主循环。
         """
-        # 【新功能】在游戏开始时广播一次游戏设置
-        await self._announce_game_setup()
+        # 开局前并发探测所有用到的模型：预热首次调用、测量基线延迟，把座位从不健康的模型上移开
+        await self._probe_models()
+
+        # 【新功能】在游戏开始时广播一次游戏设置（从检查点恢复时玩家已经听过）
+        if self._resume_phase is None:
+            await self._announce_game_setup()
 
+        phases = {"NIGHT": self._night_phase, "DAY_DISCUSSION": self._day_phase, "VOTE": self._vote_phase}
         while not self.game_state["game_over"]:
-            # 1. 增加天数
-            self.game_state["day"] += 1
+            start_phase = self._resume_phase or PHASE_ORDER[0]
+            if self._resume_phase is None:
+                # 1. 增加天数
+                self.game_state["day"] += 1
+
+                # 重置夜晚信息
+                self.game_state["night_info"] = {
+                    "killed_by_werewolf": None,
+                    "poisoned": None,
+                    "saved": False,
+                    "death_cause": {},
+                }
+            self._resume_phase = None
+            memory_profiler.snapshot(f"第 {self.game_state['day']} 天开始", self)
             print(f"\n\n===== 第 {self.game_state['day']} 天 =====")
 
-            # 重置夜晚信息
-            self.game_state["night_info"] = {
-                "killed_by_werewolf": None,
-                "poisoned": None,
-                "saved": False,
-                "death_cause": {},
-            }
-
-            # 2. 进入夜晚阶段
-            await self._night_phase()
-            if self.game_state["game_over"]: break
-
-            # 3. 进入白天阶段
-            await self._day_phase()
-            if self.game_state["game_over"]: break
-            
-            # 4. 进入投票阶段
-            await self._vote_phase()
-            if self.game_state["game_over"]: break
+            with tracer.span(f"day {self.game_state['day']}"):
+                # 2-4. 依次进入夜晚、白天发言、投票阶段，每个阶段开始前保存检查点
+                for phase in PHASE_ORDER[PHASE_ORDER.index(start_phase):]:
+                    self._save_checkpoint(phase)
+                    await phases[phase]()
+                    if self.game_state["game_over"]: break
 
         winner = self.game_state['winner']
         identities = self.game_state["identities"]
@@ -196,49 +299,120 @@ class GameMasterAgent(ReActAgent):
 
         # 在日志中记录身份信息
         game_logger.log_identities_at_end(identities)
-        game_logger.save_log() # 保存日志
-
-
+        game_logger.add_entry(prompt_stats.report())
+        game_logger.add_entry(call_metrics.report())
+        game_logger.add_entry(token_budget.report())
+        game_logger.add_entry(structured_decisions.report())
+        self._log_event("game_end", payload={
+            "winner": winner,
+            "seed": self.seed,
+            "identities": dict(identities),
+            "alive": [p["agent"].name for p in self._get_alive_players_by_role()],
+        })
+        memory_profiler.game_boundary(self) # 内存分析模式下检查跨局增长
+        # 收尾的文件和数据库读写放到线程中，游戏服务器上其他桌子不会被阻塞
+        await asyncio.to_thread(self._finish_game_io, winner)
+        await game_logger.save_log() # 保存日志
+        await event_logger.end_game() # 压缩事件日志并轮转logs目录
+        if self.checkpoint_path and not get_checkpoint_config().get("keep_after_game"):
+            await asyncio.to_thread(remove_checkpoint, self.checkpoint_path)
+
+    def _finish_game_io(self, winner: str) -> None:
+        """游戏结束时的阻塞 I/O：导出调用指标和追踪数据，计入模型评分（在线程中运行，按桌的全局实例随上下文传入）。"""
+        if get_metrics_config().get("dump_at_game_end"):
+            call_metrics.dump()
+        if get_tracing_config().get("export_at_game_end"):
+            tracer.export() # 可在 chrome://tracing 或 ui.perfetto.dev 中打开
+        self._record_ratings(winner)
+
+
+    @traced("night")
     async def _night_phase(self) -> None:
         """
         处理夜晚阶段的逻辑。
         """
         self.game_state["phase"] = "NIGHT"
+        self._log_event("phase_start")
         log_entry = f"\n--- 第 {self.game_state['day']} 天 - 夜晚 ---"
         game_logger.add_entry(log_entry)
         await self._announce_to_public("天黑请闭眼...", role="system", to_print=True)
         
         # 记忆已经在投票阶段结束后更新了，这里不需要再更新
         
-        # 1. 狼人行动
-        await self._werewolf_action()
-        
-        # 2. 预言家行动
-        if self._get_alive_players_by_role("seer"):
-            await self._seer_action()
+        overlap = self._input_overlap("night") and self._get_alive_players_by_role("seer")
+        if overlap:
+            # 1+2. 狼人行动和预言家查验互不依赖，同时进行：人类玩家思考时AI的调用不必排队等待
+            await asyncio.gather(self._werewolf_action(), self._seer_action())
+        else:
+            # 1. 狼人行动
+            await self._werewolf_action()
+
+            # 2. 预言家行动
+            if self._get_alive_players_by_role("seer"):
+                await self._seer_action()
 
         # 3. 女巫行动
         if self._get_alive_players_by_role("witch"):
             await self._witch_action()
 
-    async def _get_silent_reply(self, agent: AgentBase, prompt: str) -> Msg:
+    @traced("model_call")
+    async def _get_silent_reply(self, agent: AgentBase, prompt: str, call_site: str = "other",
+                                decision_targets: Optional[List[str]] = None) -> Msg:
         """
         一个辅助函数，用于从AI Agent处获取回复而不打印到控制台。
         通过临时重定向标准输出和标准错误来实现静默。
         支持429限流错误时自动切换模型重试。
+        每次调用的耗时、token、重试次数和结果都会记录到 call_metrics。
+
+        Args:
+            call_site (str): 调用点名称，用于按调用点统计指标
+            decision_targets (List[str], optional): 决策类调用的候选目标；开启结构化决策模式时
+                按 JSON Schema 约束回复，校验通过后改写为该决策的标准格式
         """
         # 检查是否为用户代理，如果是，则直接调用其 reply 方法
         # 这样可以避免捕获和打印用户代理的输入提示
         if isinstance(agent, UserAgent):
+            tracer.current().annotate(seat=agent.name, call_site=call_site, model="Human")
             return await agent.reply(Msg(self.name, prompt, role="user"))
 
+        # 按 token 预算决定本次调用的生成上限；预算紧张时缩短输出或切换到廉价模型
+        # 记忆总结由裁判发起，不计入任何座位的预算
+        budget_seat = None if call_site == "summary" else agent.name
+        budget_plan = token_budget.plan(call_site, budget_seat, resolve_model_key(self._get_agent_model_name(agent)))
+        if budget_plan["level"] != LEVEL_NORMAL:
+            game_logger.add_entry(f"[{agent.name} {budget_plan['reason']}]")
+            prompt += BRIEF_INSTRUCTION
+        if budget_plan["fallback_model"]:
+            await self._switch_agent_model(agent, target_key=budget_plan["fallback_model"])
+
+        # 结构化决策模式：要求模型按 JSON Schema 回复（切换模型后按新模型重新判断）
+        base_prompt = prompt
+
         # 对于AI代理，使用静默方式获取回复
         max_retries = 3  # 最多重试3次（包括切换模型）
+        start_time = time.perf_counter()
         for retry_count in range(max_retries):
-            f = io.StringIO()
-            with contextlib.redirect_stdout(f), contextlib.redirect_stderr(f):
+            structured = decision_targets is not None and structured_decisions.active(
+                call_site, resolve_model_key(self._get_agent_model_name(agent)))
+            response_format = None
+            prompt = base_prompt
+            if structured:
+                response_format, instruction = structured_decisions.request(call_site, decision_targets)
+                prompt = base_prompt + instruction
+            # 切换模型会重建 generate_kwargs，因此每次尝试前都重新设置
+            generate_kwargs = getattr(getattr(agent, "model", None), "generate_kwargs", None)
+            if generate_kwargs is not None:
+                for key, value in (("max_tokens", budget_plan["max_tokens"]), ("response_format", response_format)):
+                    if value:
+                        generate_kwargs[key] = value
+                    else:
+                        generate_kwargs.pop(key, None)
+
+            # 只捕获当前 Task 的输出；redirect_stdout 会替换整个进程的 sys.stdout，并发调用时会相互覆盖
+            with capture_output() as f:
                 try:
                     response_msg = await agent.reply(Msg(self.name, prompt, role="user"))
+                    outcome = OUTCOME_OK
                     # 成功则直接返回
                     break
                 except Exception as e:
@@ -250,6 +424,13 @@ class GameMasterAgent(ReActAgent):
                                           f"  - Error: {e}\n"
                                           f"  - Raw Exception Details: {e.args}")
                     
+                    # 服务商不支持结构化输出：该模型回退到自由文本模式后重试
+                    if structured and structured_decisions.is_unsupported_error(e) and retry_count < max_retries - 1:
+                        model_key = resolve_model_key(self._get_agent_model_name(agent))
+                        structured_decisions.mark_unsupported(model_key)
+                        game_logger.add_entry(f"[{model_key} 不支持结构化输出，回退到自由文本解析]")
+                        continue
+
                     # 如果是429限流错误且还有重试机会，尝试切换模型
                     if is_rate_limit and retry_count < max_retries - 1:
                         game_logger.add_entry(f"[检测到429限流，尝试为 {agent.name} 切换模型]")
@@ -276,7 +457,6 @@ class GameMasterAgent(ReActAgent):
                     if not raw_response:
                         if "'response':" in error_str:
                             try:
-                                import json
                                 dict_str = error_str[error_str.find("{") : error_str.rfind("}") + 1]
                                 json_str = dict_str.replace("'", "\"")
                                 error_dict = json.loads(json_str)
@@ -286,8 +466,53 @@ class GameMasterAgent(ReActAgent):
                                 pass # 解析失败则忽略
                     
                     response_msg = Msg(agent.name, str(raw_response), role="assistant")
+                    outcome = OUTCOME_RECOVERED if raw_response else OUTCOME_ERROR
                     break  # 已处理异常，退出重试循环
 
+        latency = time.perf_counter() - start_time
+        model_name = self._get_agent_model_name(agent)
+        if decision_targets is not None:
+            # 校验结构化回复并改写为标准格式；无效时保留原文，由调用方按自由文本解析
+            reply_text = self._parse_ai_response(response_msg.content)
+            if structured:
+                canonical = structured_decisions.parse(call_site, reply_text, decision_targets)
+                if canonical is not None:
+                    response_msg.content = canonical
+                valid = canonical is not None
+            else:
+                valid = structured_decisions.is_valid_free_text(call_site, reply_text, decision_targets)
+            structured_decisions.record(resolve_model_key(model_name), structured=structured, valid=valid)
+        prompt_tokens = count_tokens(prompt, model_name)
+        completion_tokens = count_tokens(str(response_msg.content), model_name)
+        token_budget.record(budget_seat, resolve_model_key(model_name), prompt_tokens, completion_tokens)
+        call_metrics.record(
+            call_site,
+            seat=agent.name,
+            model_name=model_name,
+            phase=self.game_state["phase"],
+            day=self.game_state["day"],
+            latency=latency,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            retries=retry_count,
+            outcome=outcome,
+        )
+        tracer.current().annotate(
+            seat=agent.name,
+            call_site=call_site,
+            model=self._get_agent_model_info(agent),
+            retries=retry_count,
+            outcome=outcome,
+        )
+        self._log_event(
+            "model_call",
+            actor=agent.name,
+            model=self._get_agent_model_info(agent),
+            latency=round(latency, 3),
+            tokens={"prompt": prompt_tokens, "completion": completion_tokens},
+            payload={"call_site": call_site, "retries": retry_count, "outcome": outcome},
+        )
+
         captured_output = f.getvalue()
         if "thinking" in captured_output or "<think>" in captured_output.lower():
              game_logger.add_entry(f"[{agent.name} thinking process]: {captured_output.strip()}")
@@ -297,26 +522,24 @@ class GameMasterAgent(ReActAgent):
             content_str = str(response_msg.content)
             if "<think>" in content_str.lower():
                 # 提取思考内容
-                import re
-                think_match = re.search(r'<think>(.*?)</think>', content_str, re.DOTALL | re.IGNORECASE)
-                if think_match:
-                    thinking_content = think_match.group(1).strip()
+                thinking_content = extract_thinking(content_str)
+                if thinking_content:
                     game_logger.add_entry(f"[{agent.name} <think> content]: {thinking_content}")
             
         return response_msg
 
-    async def _switch_agent_model(self, agent: AgentBase) -> bool:
+    async def _switch_agent_model(self, agent: AgentBase, target_key: Optional[str] = None) -> bool:
         """
         当检测到429限流错误时，为agent切换到其他可用模型。
+
+        Args:
+            target_key (str, optional): 指定切换到的模型key（如token预算用完时的廉价模型）；
+                指定的模型不可用时不切换；不指定时随机选择一个其他模型
         
         Returns:
             bool: 切换成功返回True，否则返回False
         """
         try:
-            # 导入配置
-            from configs import MODEL_LIST, API_PROVIDERS
-            from agentscope.model import OpenAIChatModel
-            
             # 获取当前模型名称
             current_model_name = getattr(agent.model, 'model_name', None)
             if not current_model_name:
@@ -329,38 +552,31 @@ class GameMasterAgent(ReActAgent):
                     current_model_key = key
                     break
             
-            # 获取所有可用的其他模型
-            available_models = [key for key in MODEL_LIST.keys() if key != current_model_key]
+            # 获取所有可用的其他模型（跳过开局探测中不健康的模型）
+            available_models = [key for key in MODEL_LIST.keys()
+                                if key != current_model_key and MODEL_LIST[key] not in self.unhealthy_models]
             
             if not available_models:
                 game_logger.add_entry(f"[{agent.name}] 没有其他可用模型")
                 return False
             
-            # 随机选择一个新模型
-            import random
-            new_model_key = random.choice(available_models)
+            # 指定了目标模型时只切换到该模型：目标不可用时不能随机换成其他（可能更贵的）模型
+            if target_key is not None and target_key not in available_models:
+                game_logger.add_entry(f"[{agent.name}] 目标模型 {target_key} 不可用（未配置、不健康或已在使用），不切换模型")
+                return False
+            # 未指定时随机选择一个新模型
+            new_model_key = target_key or self.rng.choice(available_models)
             new_model_id = MODEL_LIST[new_model_key]
             
             # 获取API配置（假设都使用modelscope）
             provider_config = API_PROVIDERS["modelscope"]
             
-            # 创建新模型实例
-            model_init_args = {
+            # 创建新模型实例（禁用工具调用，共用该服务地址的 HTTP 客户端）
+            new_model = agent_pool.create_model({
                 "model_name": new_model_id,
                 "api_key": provider_config["api_key"],
-            }
-            
-            if "base_url" in provider_config and provider_config["base_url"]:
-                model_init_args["client_args"] = {
-                    "base_url": provider_config["base_url"]
-                }
-            
-            # 禁用工具调用
-            model_init_args["generate_kwargs"] = {
-                "tool_choice": "none"
-            }
-            
-            new_model = OpenAIChatModel(**model_init_args)
+                "base_url": provider_config.get("base_url"),
+            })
             
             # 替换agent的模型
             agent.model = new_model
@@ -372,6 +588,157 @@ class GameMasterAgent(ReActAgent):
             game_logger.add_entry(f"[{agent.name}] 切换模型时发生错误: {e}")
             return False
     
+    def reseed(self, seed: int) -> None:
+        """换用新的随机种子，如反事实分支各自重新播种：分支之间互不相同，同一分支可以复现。"""
+        self.seed = seed
+        self.rng = random.Random(seed)
+        game_logger.add_entry(f"本局随机种子: {seed}")
+
+    def _record_ratings(self, winner: str) -> None:
+        """把本局计入模型评分：每个AI座位按游戏结束时使用的模型和角色（见 ratings.py）。"""
+        if not self.record_ratings or not get_ratings_config().get("enabled"):
+            return
+        seats = [(resolve_model_key(getattr(data["agent"].model, "model_name", None)), self.game_state["identities"][name])
+                 for name, data in self.game_state["players"].items() if not getattr(data["agent"], 'is_user', False)]
+        try:
+            if record_finished_game(event_logger.game_id, winner, seats):
+                game_logger.add_entry(f"[模型评分] 本局已计入评分（{len(seats)} 个AI座位）")
+        except Exception as e:
+            # 评分数据库出错不影响游戏结束的其他收尾
+            game_logger.add_entry(f"[模型评分] 计入评分失败: {e}")
+
+    async def _probe_models(self) -> None:
+        """开局前并发探测座位、裁判和摘要模型，把不健康模型上的座位换到健康的模型（见 model_probe.py）。"""
+        config = get_model_probe_config()
+        if not config.get("enabled"):
+            return
+        seats = [data["agent"] for data in self.game_state["players"].values()
+                 if not getattr(data["agent"], 'is_user', False)]
+        with tracer.span("model_probe"):
+            results = await probe_models([agent.model for agent in seats] + [self.model, self.summary_model], config)
+        game_logger.add_entry(format_probe_results(results))
+        self._log_event("model_probe", payload={"results": list(results.values())})
+
+        unhealthy = {identity for identity, result in results.items() if result["status"] != STATUS_OK}
+        self.unhealthy_models = {model_name for model_name, _ in unhealthy}
+        if not unhealthy or not config.get("reassign"):
+            return
+
+        # 按基线延迟从快到慢轮流分配健康的模型（只能切换到 MODEL_LIST 中的模型）
+        healthy = sorted((result for result in results.values() if result["status"] == STATUS_OK),
+                         key=lambda result: result["latency"])
+        healthy_keys = [resolve_model_key(result["model"]) for result in healthy]
+        healthy_keys = [key for key in healthy_keys if key in MODEL_LIST]
+        moved = 0
+        for agent in seats:
+            if model_identity(agent.model) not in unhealthy:
+                continue
+            if healthy_keys and await self._switch_agent_model(agent, target_key=healthy_keys[moved % len(healthy_keys)]):
+                moved += 1
+            else:
+                game_logger.add_entry(f"[模型探测] {agent.name} 没有可换的健康模型，保留原模型")
+
+        # 裁判模型和摘要模型中有一个不健康时，都使用健康的那个
+        if model_identity(self.summary_model) in unhealthy and model_identity(self.model) not in unhealthy:
+            self.summary_model = self.model
+        elif model_identity(self.model) in unhealthy and model_identity(self.summary_model) not in unhealthy:
+            self.model = self.summary_model
+
+        statuses = ", ".join(f"{results[identity]['model']}({results[identity]['status']})" for identity in unhealthy)
+        print(f"[模型探测] 不健康的模型: {statuses}；已为 {moved} 个座位换到健康的模型")
+
+    # --- 检查点 ---
+    def snapshot(self, next_phase: str) -> Dict:
+        """
+        把当前游戏状态导出为检查点字典（应在阶段之间调用）。
+
+        Args:
+            next_phase (str): 恢复后从哪个阶段继续（PHASE_ORDER 之一）
+        """
+        state = {key: value for key, value in self.game_state.items() if key != "players"}
+        state["players"] = {name: {"status": data["status"], "memory_summary": data["memory_summary"]}
+                            for name, data in self.game_state["players"].items()}
+        agents = {}
+        for name, data in self.game_state["players"].items():
+            agent = data["agent"]
+            if getattr(agent, 'is_user', False):
+                agents[name] = {"is_user": True}
+                continue
+            agents[name] = {
+                "is_user": False,
+                "model_name": self._get_agent_model_name(agent),
+                "base_url": str(getattr(getattr(agent.model, "client", None), "base_url", "") or ""),
+                "memory": agent.memory.state_dict(),
+            }
+        return {
+            "version": CHECKPOINT_VERSION,
+            "game_id": event_logger.game_id,
+            "next_phase": next_phase,
+            "game_state": state,
+            "agents": agents,
+            "seed": self.seed,
+            "rng_state": rng_state(self.rng),
+            "token_budget": token_budget.state_dict(),
+            "logs": {"game_log": game_logger.log_filename},
+        }
+
+    def _save_checkpoint(self, next_phase: str) -> None:
+        """在阶段开始前保存检查点（原子写入，见 checkpoint.py）。"""
+        config = get_checkpoint_config()
+        if not config.get("enabled") or not self.checkpoint_path:
+            return
+        with tracer.span("checkpoint", phase=next_phase):
+            data = self.snapshot(next_phase)
+            try:
+                size = write_checkpoint(self.checkpoint_path, data, fsync=config.get("fsync", False))
+                tracer.current().annotate(bytes=size)
+            except OSError as e:
+                game_logger.add_entry(f"[检查点写入失败]: {e}")
+
+    def _restore_checkpoint(self, checkpoint: Dict) -> None:
+        """用检查点恢复游戏状态、AI玩家的对话记忆、随机数状态和 token 用量。"""
+        state = checkpoint["game_state"]
+        for key, value in state.items():
+            if key != "players":
+                self.game_state[key] = value
+        for name, saved in state["players"].items():
+            self.game_state["players"][name].update(saved)
+        for name, saved in checkpoint["agents"].items():
+            if not saved.get("is_user"):
+                self.game_state["players"][name]["agent"].memory.load_state_dict(saved["memory"])
+        restore_rng_state(checkpoint["rng_state"], self.rng)
+        token_budget.load_state_dict(checkpoint.get("token_budget", {}))
+        self._resume_phase = checkpoint["next_phase"]
+        game_logger.add_entry(f"\n===== 从检查点恢复：第 {self.game_state['day']} 天 {self._resume_phase} =====")
+        self._log_event("game_resume", payload={
+            "next_phase": self._resume_phase,
+            "models": {p["agent"].name: self._get_agent_model_info(p["agent"]) for p in self.game_state["players"].values()},
+        })
+
+    def _apply_override(self, kind: str, decided: Any, allowed: List[Any]) -> Any:
+        """
+        反事实分支：用 decision_overrides 中指定的结果替换本次决定（每种决定只替换一次）。
+
+        Args:
+            kind (str): 决定类型（wolf_kill / witch_save / witch_poison / vote_out）
+            decided (Any): 玩家实际做出的决定
+            allowed (List[Any]): 本次允许的结果；指定的结果不在其中时忽略覆盖
+        """
+        if kind not in self.decision_overrides:
+            return decided
+        forced = self.decision_overrides.pop(kind)
+        if forced not in allowed:
+            game_logger.add_entry(f"[反事实分支] 忽略无效的 {kind} 覆盖: {forced}")
+            return decided
+        game_logger.add_entry(f"[反事实分支] {kind}: {decided} -> {forced}")
+        self._log_event("override", payload={"decision": kind, "original": decided, "forced": forced})
+        return forced
+
+    def _input_overlap(self, phase: str) -> bool:
+        """该阶段是否让人类输入与AI调用同时进行（见 INPUT_OVERLAP）。"""
+        config = get_input_overlap_config()
+        return bool(config.get("enabled") and config.get(phase))
+
     def _get_agent_model_info(self, agent) -> str:
         """
         获取Agent当前使用的模型信息
@@ -387,9 +754,6 @@ class GameMasterAgent(ReActAgent):
             if not current_model_name:
                 return "Unknown"
             
-            # 导入配置（避免循环导入）
-            from configs import MODEL_LIST
-            
             # 查找对应的模型key
             for key, model_id in MODEL_LIST.items():
                 if model_id == current_model_name:
@@ -401,55 +765,37 @@ class GameMasterAgent(ReActAgent):
         except Exception:
             return "Unknown"
 
+    def _get_agent_model_name(self, agent) -> Optional[str]:
+        """获取Agent当前使用的模型ID，用于按模型计算prompt的token数"""
+        if getattr(agent, 'is_user', False):
+            return None
+        return getattr(getattr(agent, 'model', None), 'model_name', None)
+
+    def _log_event(self, event_type: str, actor: Optional[str] = None, payload: Optional[Dict] = None, **kwargs) -> None:
+        """记录一条结构化事件，自动附带当前的天数和阶段"""
+        event_logger.log_event(
+            event_type,
+            day=self.game_state["day"],
+            phase=self.game_state["phase"],
+            actor=actor,
+            payload=payload,
+            **kwargs,
+        )
+
+    def _seer_history(self, seer_name: str) -> List[str]:
+        """返回历史记录中该预言家的查验记录（按完整名称匹配，Player_1 不会匹配到 Player_10 的记录）。"""
+        prefix = f"预言家 {seer_name} 查验了"
+        return [log for log in self.game_state["full_history"] if prefix in log]
+
     def _parse_ai_response(self, content: any) -> str:
         """
         一个健壮的解析函数，用于从AI的回复内容中提取纯文本。
-        它可以递归地处理字典、列表和纯字符串等多种格式。
+        支持字典、列表（含 agentscope 的内容块）和纯字符串等多种格式，
         同时会过滤掉 <think> 标签中的思考过程。
         """
-        # 1. 如果是字典（ReActAgent的标准输出）
-        if isinstance(content, dict):
-            if "speak" in content:
-                text = str(content["speak"]).strip()
-            elif "content" in content:
-                text = str(content["content"]).strip()
-            else:
-                text = str(content)
-        # 2. 如果是列表
-        elif isinstance(content, list) and content:
-            # 递归地解析列表的第一个元素
-            text = self._parse_ai_response(content[0])
-        # 3. 如果是纯字符串
-        elif isinstance(content, str):
-            text = content.strip()
-        # 4. 其他情况或空内容
-        else:
-            text = str(content) if content is not None else ""
-        
-        # 【新增】过滤掉 <think> 标签内的思考过程
-        text = self._remove_thinking_tags(text)
-        
-        return text
-    
-    def _remove_thinking_tags(self, text: str) -> str:
-        """
-        移除文本中的 <think>...</think> 标签及其内容。
-        支持多行和嵌套的情况。
-        """
-        import re
-        # 使用正则表达式移除 <think>...</think> 标签（包括标签内的所有内容）
-        # re.DOTALL 使 . 匹配包括换行符在内的所有字符
-        # 非贪婪匹配 .*? 确保只匹配最近的闭合标签
-        cleaned_text = re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL | re.IGNORECASE)
-        
-        # 也处理可能的变体，如 </think> 或 <thinking>
-        cleaned_text = re.sub(r'</?think(?:ing)?>.*?</think(?:ing)?>', '', cleaned_text, flags=re.DOTALL | re.IGNORECASE)
-        
-        # 清理多余的空行
-        cleaned_text = re.sub(r'\n\s*\n', '\n\n', cleaned_text)
-        
-        return cleaned_text.strip()
+        return remove_thinking_tags(extract_text(content))
 
+    @traced("werewolf_action")
     async def _werewolf_action(self) -> None:
         """处理狼人讨论和刀人的逻辑（包含2轮讨论 + 最终决策）"""
         await self._announce_to_public("狼人请睁眼，商量要淘汰的玩家。", role="system", to_print=True)
@@ -520,7 +866,7 @@ class GameMasterAgent(ReActAgent):
                 prompt=prompt_to_coordinator
             )
             # 使用静默回复来避免泄露信息
-            response_msg = await self._get_silent_reply(coordinator_wolf, prompt_to_coordinator)
+            response_msg = await self._get_silent_reply(coordinator_wolf, prompt_to_coordinator, call_site="wolf_kill", decision_targets=potential_targets)
             # 【修复】使用新的健壮解析函数
             raw_response = self._parse_ai_response(response_msg.content)
             
@@ -529,20 +875,11 @@ class GameMasterAgent(ReActAgent):
             game_logger.add_entry(f"[{coordinator_wolf.name} 狼人击杀回复 - {model_info}]: {raw_response}")
 
             # 统一处理来自用户和AI的输入
-            parsed_name = raw_response
-            if "我们决定淘汰:" in raw_response:
-                parsed_name = raw_response.split(":")[-1].strip()
-
-            # 模糊匹配
-            for p_target in potential_targets:
-                player_id = p_target.split('_')[-1]
-                if parsed_name.lower() == p_target.lower() or \
-                    parsed_name.lower() == f"player{player_id}" or \
-                    parsed_name.lower() == f"player {player_id}" or \
-                    parsed_name.lower() == player_id or \
-                    parsed_name in p_target:
-                    target_name = p_target
-                    break
+            result = TargetMatcher.for_targets(potential_targets, abstain_tokens=()).match(raw_response, marker="我们决定淘汰")
+            if result.status == MATCH_TARGET:
+                target_name = result.target
+            elif result.status == MATCH_AMBIGUOUS:
+                game_logger.add_entry(f"[{coordinator_wolf.name} 击杀目标含糊]: {', '.join(result.candidates)}")
             
             if target_name:
                 break
@@ -553,6 +890,8 @@ class GameMasterAgent(ReActAgent):
                 if isinstance(coordinator_wolf, UserAgent):
                     print(error_msg) # 确保用户能看到
         
+        target_name = self._apply_override("wolf_kill", target_name, potential_targets)
+
         # 3. 处理结果
         if target_name:
             self.game_state["night_info"]["killed_by_werewolf"] = target_name
@@ -561,22 +900,25 @@ class GameMasterAgent(ReActAgent):
             # 【修复】狼人击杀是私密信息，只记录到 game_logger，不记录到 full_history
             # full_history 中只记录公开的裁判公告（在白天开始时记录）
             game_logger.add_entry(log_entry)
+            self._log_event("wolf_kill", actor=coordinator_wolf.name, payload={"target": target_name, "fallback": False})
             
             await self._announce_to_public("狼人已完成击杀。", role="system", to_print=False)
             # 将最终决定广播回狼人频道，让队友知晓
             await self.werewolf_channel.broadcast(Msg(self.name, f"已确认，本次淘汰目标: {target_name}", role="system"))
         else:
             # 如果AI多次无法给出有效回复，裁判随机选择
-            fallback_target = random.choice(potential_targets)
+            fallback_target = self.rng.choice(potential_targets)
             self.game_state["night_info"]["killed_by_werewolf"] = fallback_target
             log_entry = f"狼人代表未能提供有效目标，裁判随机选择淘汰: {fallback_target}"
             
             # 【修复】将随机击杀记录也添加到 full_history
             self.game_state["full_history"].append(f"[第{self.game_state['day']}天-夜晚]: {log_entry}")
             game_logger.add_entry(log_entry)
+            self._log_event("wolf_kill", actor=coordinator_wolf.name, payload={"target": fallback_target, "fallback": True})
             
             await self._announce_to_public("狼人已完成击杀。", role="system", to_print=False)
 
+    @traced("werewolf_discussion")
     async def _werewolf_discussion(self, werewolves: list, potential_targets: list) -> list:
         """
         狼人讨论阶段：2轮讨论，每个狼人依次发言
@@ -656,7 +998,7 @@ class GameMasterAgent(ReActAgent):
                 )
                 
                 # 使用静默回复避免在控制台显示（狼人讨论是私密的）
-                response_msg = await self._get_silent_reply(werewolf, prompt)
+                response_msg = await self._get_silent_reply(werewolf, prompt, call_site="wolf_discussion")
                 
                 # 解析回复
                 raw_response = self._parse_ai_response(response_msg.content)
@@ -664,6 +1006,8 @@ class GameMasterAgent(ReActAgent):
                 # 记录到日志（这是唯一应该记录的地方）
                 model_info = self._get_agent_model_info(werewolf)
                 game_logger.add_entry(f"[狼人讨论-第{round_num}轮-{werewolf.name}-{model_info}]: {raw_response}")
+                self._log_event("wolf_discussion", actor=werewolf.name, model=model_info,
+                                payload={"round": round_num, "text": raw_response})
                 
                 # 收集讨论历史（用于后续传递给决策者）
                 discussion_record = f"[第{round_num}轮] {werewolf.name}: {raw_response}"
@@ -684,6 +1028,7 @@ class GameMasterAgent(ReActAgent):
         
         return discussion_history  # 返回讨论历史
 
+    @traced("seer_action")
     async def _seer_action(self) -> None:
         """【新功能】实现预言家验人逻辑"""
         await self._announce_to_public("预言家请睁眼,选择你要查验的玩家。", role="system", to_print=True)
@@ -698,7 +1043,7 @@ class GameMasterAgent(ReActAgent):
         memory_summary = self._get_player_memory(seer_agent.name)
         
         # 2. 获取预言家的查验历史
-        seer_history = [log for log in self.game_state["full_history"] if "查验了" in log and seer_agent.name in log]
+        seer_history = self._seer_history(seer_agent.name)
         if seer_history:
             private_info = "你的查验历史如下：\n" + "\n".join(seer_history)
         else:
@@ -723,7 +1068,7 @@ class GameMasterAgent(ReActAgent):
             prompt=prompt_to_seer
         )
         # 使用静默回复来避免泄露信息
-        response_msg = await self._get_silent_reply(seer_agent, prompt_to_seer)
+        response_msg = await self._get_silent_reply(seer_agent, prompt_to_seer, call_site="seer_check", decision_targets=potential_targets)
         # 【修复】使用新的健壮解析函数
         raw_response = self._parse_ai_response(response_msg.content)
 
@@ -731,19 +1076,11 @@ class GameMasterAgent(ReActAgent):
         model_info = self._get_agent_model_info(seer_agent)
         game_logger.add_entry(f"[{seer_agent.name} 预言家查验回复 - {model_info}]: {raw_response}")
 
-        parsed_name = raw_response
-        if "我查验:" in raw_response:
-            parsed_name = raw_response.split(":")[-1].strip()
-
-        for p_target in potential_targets:
-            player_id = p_target.split('_')[-1]
-            if parsed_name.lower() == p_target.lower() or \
-                parsed_name.lower() == f"player{player_id}" or \
-                parsed_name.lower() == f"player {player_id}" or \
-                parsed_name.lower() == player_id or \
-                parsed_name in p_target:
-                target_name = p_target
-                break
+        result = TargetMatcher.for_targets(potential_targets, abstain_tokens=()).match(raw_response, marker="我查验")
+        if result.status == MATCH_TARGET:
+            target_name = result.target
+        elif result.status == MATCH_AMBIGUOUS:
+            game_logger.add_entry(f"[{seer_agent.name} 查验目标含糊]: {', '.join(result.candidates)}")
         
         if target_name:
             target_identity = self.game_state["identities"][target_name]
@@ -752,6 +1089,7 @@ class GameMasterAgent(ReActAgent):
             
             # 【修复】预言家查验是私密信息，只记录到 game_logger，不记录到 full_history
             game_logger.add_entry(log_entry)
+            self._log_event("seer_check", actor=seer_agent.name, payload={"target": target_name, "result": target_identity})
             
             # 将查验结果私密地告诉预言家，使用特殊前缀标记
             await seer_agent.observe(Msg(self.name, f"__PRIVATE__查验结果：玩家 {target_name} 的身份是【{result}】。", role="system"))
@@ -763,12 +1101,14 @@ class GameMasterAgent(ReActAgent):
             # 【修复】将失败记录也添加到 full_history
             self.game_state["full_history"].append(f"[第{self.game_state['day']}天-夜晚]: {log_entry}")
             game_logger.add_entry(log_entry)
+            self._log_event("seer_check", actor=seer_agent.name, payload={"target": None})
             
             # 使用特殊前缀标记私密消息
             await seer_agent.observe(Msg(self.name, "__PRIVATE__无效的查验目标。", role="system"))
             # 即使没有有效目标，也要有模糊播报以防暴露信息
             await self._announce_to_public("预言家已完成查验。", role="system", to_print=False)
 
+    @traced("witch_action")
     async def _witch_action(self) -> None:
         """【新功能】实现女巫用药逻辑"""
         await self._announce_to_public("女巫请睁眼。", role="system", to_print=True)
@@ -820,7 +1160,7 @@ class GameMasterAgent(ReActAgent):
                 prompt=prompt_save
             )
             # 使用静默回复来避免AI的决策过程被打印
-            response_msg = await self._get_silent_reply(witch_agent, prompt_save)
+            response_msg = await self._get_silent_reply(witch_agent, prompt_save, call_site="witch_save", decision_targets=[])
             # 【修复】使用新的健壮解析函数
             raw_response = self._parse_ai_response(response_msg.content)
 
@@ -839,12 +1179,14 @@ class GameMasterAgent(ReActAgent):
                 else:
                     user_wants_to_save = False
             else:
-                # 对于AI，优先检测明确短语 '使用解药'
-                if '使用解药' in raw_response:
+                # 对于AI，优先检测明确短语 '使用解药'（注意 '不使用解药' 也包含该短语）
+                if '使用解药' in raw_response and '不使用解药' not in raw_response:
                     user_wants_to_save = True
                 else:
                     user_wants_to_save = False
 
+            user_wants_to_save = self._apply_override("witch_save", user_wants_to_save, [True, False])
+            self._log_event("witch_save", actor=witch_agent.name, payload={"target": killed_player, "used": user_wants_to_save})
             if user_wants_to_save:
                 self.game_state["night_info"]["saved"] = True
                 self.game_state["witch_potions"]["save"] = False
@@ -887,7 +1229,7 @@ class GameMasterAgent(ReActAgent):
                 prompt=prompt_poison
             )
             # 使用静默回复来避免AI的决策过程被打印
-            response_msg = await self._get_silent_reply(witch_agent, prompt_poison)
+            response_msg = await self._get_silent_reply(witch_agent, prompt_poison, call_site="witch_poison", decision_targets=potential_targets)
             # 【修复】使用新的健壮解析函数
             raw_response = self._parse_ai_response(response_msg.content)
 
@@ -895,39 +1237,23 @@ class GameMasterAgent(ReActAgent):
             model_info = self._get_agent_model_info(witch_agent)
             game_logger.add_entry(f"[{witch_agent.name} 女巫毒药回复 - {model_info}]: {raw_response}")
 
+            # 用户和AI共用同一个匹配器：回车、n/no、"不使用"、"跳过" 都表示不使用毒药
             target_name = None
-            parsed_name = ""
-
-            if getattr(witch_agent, 'is_user', False):
-                if raw_response and raw_response.lower() not in ['n', 'no', '不使用']:
-                    parsed_name = raw_response
-            else:
-                # AI 回复解析：支持多种格式
-                if "我毒杀:" in raw_response or "我毒杀：" in raw_response:
-                    parsed_name = raw_response.split(":")[-1].split("：")[-1].strip()
-                elif "不使用" in raw_response or "跳过" in raw_response:
-                    parsed_name = ""  # 明确不使用毒药
-                else:
-                    # 尝试从回复中提取玩家名称
-                    parsed_name = raw_response.strip()
-
-            if parsed_name:
-                for p_target in potential_targets:
-                    player_id = p_target.split('_')[-1]
-                    if parsed_name.lower() == p_target.lower() or \
-                       parsed_name.lower() == f"player{player_id}" or \
-                       parsed_name.lower() == f"player {player_id}" or \
-                       parsed_name.lower() == player_id or \
-                       parsed_name in p_target:
-                        target_name = p_target
-                        break
+            result = TargetMatcher.for_targets(potential_targets, abstain_tokens=POISON_ABSTAIN_TOKENS).match(raw_response, marker="我毒杀")
+            if result.status == MATCH_TARGET:
+                target_name = result.target
+            elif result.status == MATCH_AMBIGUOUS:
+                game_logger.add_entry(f"[{witch_agent.name} 毒药目标含糊，视为不使用]: {', '.join(result.candidates)}")
+            target_name = self._apply_override("witch_poison", target_name, potential_targets + [None])
             
             if target_name:
                 self.game_state["night_info"]["poisoned"] = target_name
                 self.game_state["witch_potions"]["poison"] = False
                 log_entry = f"女巫使用了【毒药】，目标是 {target_name}。"
                 game_logger.add_entry(log_entry)
+            self._log_event("witch_poison", actor=witch_agent.name, payload={"target": target_name})
 
+    @traced("night_settlement")
     async def _night_settlement(self) -> List[Dict]:
         """【逻辑修正】夜晚结算只处理状态更新，不进行任何广播"""
         deaths = []
@@ -948,13 +1274,17 @@ class GameMasterAgent(ReActAgent):
             for player_name in deaths:
                 self.game_state["players"][player_name]["status"] = "dead"
                 dead_players_data.append(self.game_state["players"][player_name])
+                self._log_event("death", actor=player_name,
+                                payload={"cause": self.game_state["night_info"]["death_cause"][player_name]})
         
         self._check_win_condition()
         return dead_players_data
 
+    @traced("day_discussion")
     async def _day_phase(self) -> None:
         """【逻辑修正】实现真实的白天发言环节"""
         self.game_state["phase"] = "DAY_DISCUSSION"
+        self._log_event("phase_start")
         
         # 1. 夜晚结算，只更新内部状态
         dead_players_data = await self._night_settlement()
@@ -991,7 +1321,7 @@ class GameMasterAgent(ReActAgent):
         # 【修复】不再统一生成摘要，而是在每个玩家发言前单独生成，避免并发限流
         
         # 按照玩家编号顺序发言
-        for player_data in sorted(alive_players_data, key=lambda p: p['agent'].name):
+        for player_data in sorted(alive_players_data, key=lambda p: seat_key(p['agent'].name)):
             agent = player_data["agent"]
             
             # 【修复】在白天发言前为该玩家生成记忆摘要
@@ -1011,7 +1341,7 @@ class GameMasterAgent(ReActAgent):
             private_info = "你是一个普通村民，没有特殊信息。"
             if player_role == "seer":
                 # 预言家可以看到自己的查验历史
-                seer_history = [log for log in self.game_state["full_history"] if "查验了" in log and agent.name in log]
+                seer_history = self._seer_history(agent.name)
                 if seer_history:
                     private_info = "你的查验历史如下：\n" + "\n".join(seer_history)
                 else:
@@ -1039,27 +1369,33 @@ class GameMasterAgent(ReActAgent):
 
             # 2. 构建完整的Prompt
             alive_players_str = ", ".join([p["agent"].name for p in alive_players_data])
-            history_str = "\n".join(self.game_state["discussion_history"]) if self.game_state["discussion_history"] else "你是第一个发言。"
             
             # 构建发言顺序提示
-            speaker_order = [p["agent"].name for p in sorted(alive_players_data, key=lambda p: p['agent'].name)]
+            speaker_order = [p["agent"].name for p in sorted(alive_players_data, key=lambda p: seat_key(p['agent'].name))]
             current_index = speaker_order.index(agent.name)
             order_info = f"发言顺序：{' → '.join(speaker_order)}（你是第 {current_index + 1} 个发言）"
             
-            prompt = (f"现在是第 {current_day} 天的白天发言环节。\n"
-                      f"你是 {agent.name}，你的身份是【{ROLE_CN_MAP.get(player_role, player_role)}】。\n"
-                      f"{order_info}\n\n"
-                      f"=== 你的私密信息 ===\n{private_info}\n\n"
-                      f"=== 你的专属记忆摘要 ===\n{memory_summary}\n\n"
-                      f"=== 本轮公开信息 ===\n"
-                      f"- 昨晚的公开信息是：{night_summary}\n"
-                      f"- 当前存活的玩家有：{alive_players_str}\n"
-                      f"- 目前的发言记录如下：\n---\n{history_str}\n---\n\n"
-                      f"=== 你的任务 ===\n"
-                      f"请综合以上所有信息，扮演好你的角色并发表观点。你的目标是：\n"
-                      f"- 如果你是好人阵营（村民、预言家、女巫、猎人），你需要找出并投票淘汰狼人。\n"
-                      f"- 如果你是狼人阵营，你需要伪装自己，误导好人，并保护你的狼人队友。\n"
-                      f"请直接给出你的发言，不要包含任何思考过程或分析。")
+            # 按token预算组装：发言记录最先被压缩，其次是记忆摘要和私密信息
+            builder = PromptBuilder("speech", self._get_agent_model_name(agent))
+            builder.add_fixed(f"现在是第 {current_day} 天的白天发言环节。\n"
+                              f"你是 {agent.name}，你的身份是【{ROLE_CN_MAP.get(player_role, player_role)}】。\n"
+                              f"{order_info}\n\n"
+                              f"=== 你的私密信息 ===\n")
+            builder.add_text(private_info, priority=1)
+            builder.add_fixed("\n\n=== 你的专属记忆摘要 ===\n")
+            builder.add_text(memory_summary, priority=2, keep="tail")
+            builder.add_fixed(f"\n\n=== 本轮公开信息 ===\n"
+                              f"- 昨晚的公开信息是：{night_summary}\n"
+                              f"- 当前存活的玩家有：{alive_players_str}\n"
+                              f"- 目前的发言记录如下：\n---\n")
+            builder.add_lines(self.game_state["discussion_history"], priority=3, empty_text="你是第一个发言。")
+            builder.add_fixed(f"\n---\n\n"
+                              f"=== 你的任务 ===\n"
+                              f"请综合以上所有信息，扮演好你的角色并发表观点。你的目标是：\n"
+                              f"- 如果你是好人阵营（村民、预言家、女巫、猎人），你需要找出并投票淘汰狼人。\n"
+                              f"- 如果你是狼人阵营，你需要伪装自己，误导好人，并保护你的狼人队友。\n"
+                              f"请直接给出你的发言，不要包含任何思考过程或分析。")
+            prompt = builder.build()
             
             # 【新功能】记录Prompt
             prompt_logger.add_prompt(
@@ -1067,7 +1403,7 @@ class GameMasterAgent(ReActAgent):
                 prompt=prompt
             )
             # 【修复】统一使用静默回复，避免直接打印思考过程
-            response_msg = await self._get_silent_reply(agent, prompt)
+            response_msg = await self._get_silent_reply(agent, prompt, call_site="speech")
             
             # 【修复】使用新的健壮解析函数
             raw_response = self._parse_ai_response(response_msg.content)
@@ -1075,41 +1411,8 @@ class GameMasterAgent(ReActAgent):
             # 对AI的回复进行后处理，移除思考过程
             cleaned_content = raw_response
             if not getattr(agent, 'is_user', False):
-                # 【修复】更智能地移除思考过程，保留完整发言
-                
-                # 首先移除明确的思考标记
-                cleaned_content = re.sub(r"^\(thinking\):", "", cleaned_content, flags=re.IGNORECASE).strip()
-                
-                # 处理可能的格式："思考过程... Player_X: 实际发言内容"
-                if f"{agent.name}:" in cleaned_content:
-                    parts = cleaned_content.split(f"{agent.name}:")
-                    if len(parts) > 1:
-                        # 检查分割后的第一部分是否主要是思考内容
-                        first_part = parts[0].strip().lower()
-                        thinking_indicators = ['thinking', 'strategy', '策略', '分析', '我需要', '考虑', '想法', 'player_' + agent.name.split('_')[1] + '(thinking)']
-                        
-                        # 如果第一部分包含大量思考关键词，或明显是思考过程，则移除
-                        if (len(first_part) > 100 and any(indicator in first_part for indicator in thinking_indicators)) or \
-                           '(thinking)' in first_part:
-                            # 取最后一个 "Player_X:" 之后的内容
-                            cleaned_content = parts[-1].strip()
-                        else:
-                            # 否则保留完整内容，只是去掉重复的玩家名前缀
-                            cleaned_content = f"{agent.name}:" + ":".join(parts[1:])
-                            cleaned_content = cleaned_content.replace(f"{agent.name}:", "", 1).strip()
-                
-                # 处理段落级别的思考内容移除
-                paragraphs = [p.strip() for p in cleaned_content.split('\n\n') if p.strip()]
-                if len(paragraphs) > 1:
-                    first_para = paragraphs[0].lower()
-                    thinking_keywords = ['thinking', 'strategy', '策略', '分析：', '我的想法是', '我需要考虑', '当前局面']
-                    # 只有当第一段明确是思考内容且较长时才移除
-                    if len(first_para) > 80 and any(keyword in first_para for keyword in thinking_keywords):
-                        cleaned_content = "\n\n".join(paragraphs[1:])
-                    else:
-                        cleaned_content = "\n\n".join(paragraphs)
-                else:
-                    cleaned_content = "\n\n".join(paragraphs)
+                # 移除 "(thinking):" 前缀、写在发言前的分析段落等思考过程
+                cleaned_content = clean_speech(cleaned_content, speaker=agent.name)
 
             # 记录并广播发言
             speech = f"玩家 {agent.name} 说: {cleaned_content}"
@@ -1117,6 +1420,7 @@ class GameMasterAgent(ReActAgent):
             # 【新增】获取模型信息并记录到日志
             model_info = self._get_agent_model_info(agent)
             game_logger.add_entry(f"[{agent.name} 发言 - {model_info}]: {cleaned_content}")
+            self._log_event("speech", actor=agent.name, model=model_info, payload={"text": cleaned_content})
             
             # 【修复】手动打印处理干净的发言
             print(speech)
@@ -1131,8 +1435,10 @@ class GameMasterAgent(ReActAgent):
 
         await self._announce_to_public("所有玩家发言结束。", role="system")
 
+    @traced("vote_phase")
     async def _vote_phase(self) -> None:
         self.game_state["phase"] = "VOTE"
+        self._log_event("phase_start")
         await self._announce_to_public("现在进入投票环节。请投票选出你认为的狼人。若无明确选择，可以输入 '弃票' 表示本轮弃票。", role="system")
 
         alive_players_data = self._get_alive_players_by_role()
@@ -1144,6 +1450,12 @@ class GameMasterAgent(ReActAgent):
         
         votes = []
 
+        # 同时收集模式：人类玩家的投票提示立即显示，与下面的AI投票同时进行
+        user_votes_task = None
+        if user_voters and self._input_overlap("vote"):
+            user_votes_task = asyncio.ensure_future(
+                asyncio.gather(*(self._collect_vote(voter, potential_targets) for voter in user_voters)))
+
         # 1. 首先，串行收集所有AI的投票
         for voter in ai_voters:
             try:
@@ -1155,14 +1467,21 @@ class GameMasterAgent(ReActAgent):
                 votes.append((voter.name, None)) # 计为弃票
 
         # 2. 然后，收集所有人类玩家的投票
-        for voter in user_voters:
-            # 人类玩家没有超时
-            vote_result = await self._collect_vote(voter, potential_targets)
-            votes.append(vote_result)
+        if user_votes_task is not None:
+            votes.extend(await user_votes_task)
+        else:
+            for voter in user_voters:
+                # 人类玩家没有超时
+                vote_result = await self._collect_vote(voter, potential_targets)
+                votes.append(vote_result)
+
+        # 按座位顺序公布，与收集的先后无关
+        votes.sort(key=lambda vote: seat_key(vote[0]))
 
         # 3. 计票和公布投票详情
         vote_details = []
         for voter_name, target_name in votes:
+            self._log_event("vote", actor=voter_name, payload={"target": target_name})
             if target_name:
                 detail = f"{voter_name} 投票给 -> {target_name}"
             else:
@@ -1180,25 +1499,38 @@ class GameMasterAgent(ReActAgent):
         game_logger.add_entry(log_entry)
         await self._announce_to_public(log_entry, role="system", to_print=True)
 
-        if not vote_counter:
+        self._log_event("vote_result", payload={"counts": dict(vote_counter)})
+        max_votes = max(vote_counter.values(), default=0)
+        most_voted_players = [p for p, v in vote_counter.items() if v == max_votes]
+
+        # 反事实分支可以指定本轮出局的玩家（None 表示无人出局）
+        decided = most_voted_players[0] if len(most_voted_players) == 1 else None
+        forced = self._apply_override("vote_out", decided, potential_targets + [None])
+        if forced != decided:
+            most_voted_players = [forced] if forced else []
+
+        if not vote_counter and not most_voted_players:
             log_entry = "无人投票，本轮平票。"
             game_logger.add_entry(log_entry)
             await self._announce_to_public(log_entry, role="system", to_print=True)
             return
 
-        max_votes = max(vote_counter.values())
-        most_voted_players = [p for p, v in vote_counter.items() if v == max_votes]
-
         # 处理平票
         if len(most_voted_players) > 1:
             log_entry = f"出现平票 ({', '.join(most_voted_players)})，本轮无人出局。"
             self.game_state["full_history"].append(f"[第{self.game_state['day']}天-投票]: {log_entry}")
             game_logger.add_entry(log_entry)
             await self._announce_to_public(log_entry, role="system", to_print=True)
+        elif not most_voted_players:
+            log_entry = "本轮无人出局。"
+            self.game_state["full_history"].append(f"[第{self.game_state['day']}天-投票]: {log_entry}")
+            game_logger.add_entry(log_entry)
+            await self._announce_to_public(log_entry, role="system", to_print=True)
         else:
             voted_out_player_name = most_voted_players[0]
             self.game_state["players"][voted_out_player_name]["status"] = "dead"
             self.game_state["night_info"]["death_cause"][voted_out_player_name] = "vote"  # 记录死因
+            self._log_event("death", actor=voted_out_player_name, payload={"cause": "vote"})
             log_entry = f"投票结果：玩家 {voted_out_player_name} 被淘汰。"
             # 【新功能】将投票结果记录到长期历史中
             vote_details_str = ", ".join([f"{voter}->{target}" for voter, target in votes if target])
@@ -1217,9 +1549,11 @@ class GameMasterAgent(ReActAgent):
         if not self.game_state["game_over"]:
             await self._update_all_players_memory_for_night()
 
+    @traced("collect_vote")
     async def _collect_vote(self, voter: AgentBase, potential_targets: List[str]) -> Tuple[str, Optional[str]]:
         """辅助函数：向单个玩家收集投票，增强了对用户和AI输入的兼容性"""
         target_name = None
+        matcher = TargetMatcher.for_targets(potential_targets)
         if getattr(voter, 'is_user', False):
             # 针对人类玩家的优化输入
             while target_name is None:
@@ -1228,17 +1562,11 @@ class GameMasterAgent(ReActAgent):
                 response_msg = await voter.reply(Msg(self.name, prompt, role="user"))
                 user_input = response_msg.content.strip().lower() if response_msg.content else ""
 
-                for p_target in potential_targets:
-                    player_id = p_target.split('_')[-1]
-                    if user_input == p_target.lower() or \
-                       user_input == f"player{player_id}" or \
-                       user_input == f"player {player_id}" or \
-                       user_input == player_id:
-                        target_name = p_target
-                        break
-                
+                result = matcher.match(user_input)
+                if result.status == MATCH_TARGET:
+                    target_name = result.target
                 # 支持弃票
-                if not target_name and user_input in ['弃票','abstain','pass','skip','不投','不投票']:
+                elif result.status == MATCH_ABSTAIN:
                     return voter.name, None
 
                 if not target_name:
@@ -1255,7 +1583,7 @@ class GameMasterAgent(ReActAgent):
             # 1. 构建私密信息部分 (与发言环节逻辑相同)
             private_info = "你是一个普通村民，没有特殊信息。"
             if player_role == "seer":
-                seer_history = [log for log in self.game_state["full_history"] if "查验了" in log and voter.name in log]
+                seer_history = self._seer_history(voter.name)
                 if seer_history:
                     private_info = "你的查验历史如下：\n" + "\n".join(seer_history)
                 else:
@@ -1281,19 +1609,23 @@ class GameMasterAgent(ReActAgent):
                 
                 private_info = teammates_info + kill_history
             
-            # 2. 构建完整的Prompt
-            discussion_summary = "\n".join(self.game_state["discussion_history"])
+            # 2. 构建完整的Prompt（按token预算组装）
             memory_summary = self._get_player_memory(voter.name)
             
-            prompt = (f"现在是第 {current_day} 天的投票环节。\n"
-                      f"你是 {voter.name}，你的身份是【{ROLE_CN_MAP.get(player_role, player_role)}】。\n\n"
-                      f"=== 你的私密信息 ===\n{private_info}\n\n"
-                      f"=== 游戏至今的记忆摘要 ===\n{memory_summary}\n\n"
-                      f"=== 今天白天的发言回顾 ===\n{discussion_summary}\n\n"
-                      f"=== 你的任务 ===\n"
-                      f"根据以上所有信息，从下列存活玩家中投票淘汰一人：\n[{', '.join(potential_targets)}]\n"
-                      f"你的回复必须严格遵循 '我投票给: [玩家姓名]' 的格式，不要包含任何其他内容或思考过程。\n"
-                      f"如果你想弃票，请仅回复：弃票。")
+            builder = PromptBuilder("vote", self._get_agent_model_name(voter))
+            builder.add_fixed(f"现在是第 {current_day} 天的投票环节。\n"
+                              f"你是 {voter.name}，你的身份是【{ROLE_CN_MAP.get(player_role, player_role)}】。\n\n"
+                              f"=== 你的私密信息 ===\n")
+            builder.add_text(private_info, priority=1)
+            builder.add_fixed("\n\n=== 游戏至今的记忆摘要 ===\n")
+            builder.add_text(memory_summary, priority=2, keep="tail")
+            builder.add_fixed("\n\n=== 今天白天的发言回顾 ===\n")
+            builder.add_lines(self.game_state["discussion_history"], priority=3)
+            builder.add_fixed(f"\n\n=== 你的任务 ===\n"
+                              f"根据以上所有信息，从下列存活玩家中投票淘汰一人：\n[{', '.join(potential_targets)}]\n"
+                              f"你的回复必须严格遵循 '我投票给: [玩家姓名]' 的格式，不要包含任何其他内容或思考过程。\n"
+                              f"如果你想弃票，请仅回复：弃票。")
+            prompt = builder.build()
 
             # 增加重试逻辑
             for attempt in range(2): # 最多尝试2次
@@ -1303,7 +1635,7 @@ class GameMasterAgent(ReActAgent):
                         title=f"向 {voter.name} 提问投票目标 (尝试 {attempt + 1})",
                         prompt=prompt
                     )
-                    response_msg = await self._get_silent_reply(voter, prompt)
+                    response_msg = await self._get_silent_reply(voter, prompt, call_site="vote", decision_targets=potential_targets)
                     # 【修复】使用新的健壮解析函数
                     raw_response = self._parse_ai_response(response_msg.content)
                     
@@ -1311,18 +1643,16 @@ class GameMasterAgent(ReActAgent):
                     model_info = self._get_agent_model_info(voter)
                     game_logger.add_entry(f"[{voter.name} 投票回复 (尝试 {attempt + 1}) - {model_info}]: {raw_response}")
 
-                    # 解析是否为弃票（支持多种同义词）
-                    normalized = raw_response.strip().lower() if raw_response else ""
-                    if any(token in normalized for token in ['弃票','abstain','pass','skip','不投','不投票']):
+                    # 解析投票目标或弃票（支持多种同义词）；提到多个目标时视为含糊，重新询问
+                    result = matcher.match(raw_response, marker="我投票给")
+                    if result.status == MATCH_ABSTAIN:
                         game_logger.add_entry(f"[{voter.name} 弃票]")
                         return voter.name, None
-
-                    # 【最终修复方案】采用最稳健的解析方式：直接在原始回复中搜索有效的玩家名字
-                    # 从后向前搜索，以正确匹配 Player_10 而不是 Player_1
-                    for p_target in sorted(potential_targets, key=len, reverse=True):
-                        if p_target in raw_response:
-                            game_logger.add_entry(f"[{voter.name} 投票给]: {p_target}")
-                            return voter.name, p_target
+                    if result.status == MATCH_TARGET:
+                        game_logger.add_entry(f"[{voter.name} 投票给]: {result.target}")
+                        return voter.name, result.target
+                    if result.status == MATCH_AMBIGUOUS:
+                        game_logger.add_entry(f"[{voter.name} 投票目标含糊]: {', '.join(result.candidates)}")
                 except Exception as e:
                     game_logger.add_entry(f"[{voter.name} 投票时出现异常 (尝试 {attempt + 1})]: {e}")
             
@@ -1330,6 +1660,7 @@ class GameMasterAgent(ReActAgent):
             game_logger.add_entry(f"[{voter.name} 弃票 (多次尝试失败)]")
             return voter.name, None
 
+    @traced("last_words")
     async def _handle_last_words(self, dead_players_data: List[Dict]) -> None:
         """处理被淘汰玩家的遗言环节"""
         if not dead_players_data:
@@ -1346,12 +1677,11 @@ class GameMasterAgent(ReActAgent):
                 # 为AI构建更丰富的遗言prompt
                 player_role = self.game_state["identities"][agent.name]
                 memory_summary = self._get_player_memory(agent.name)
-                discussion_summary = "\n".join(self.game_state["discussion_history"])
 
                 # 构建私密信息
                 private_info = "你是一个普通村民，没有特殊信息。"
                 if player_role == "seer":
-                    seer_history = [log for log in self.game_state["full_history"] if "查验了" in log and agent.name in log]
+                    seer_history = self._seer_history(agent.name)
                     if seer_history:
                         private_info = "你的查验历史如下：\n" + "\n".join(seer_history)
                     else:
@@ -1397,15 +1727,20 @@ class GameMasterAgent(ReActAgent):
                         f"请直接给出你的发言，不要包含任何思考过程。"
                     )
 
-                prompt = (
-                    f"你已经被淘汰了。现在是第 {self.game_state['day']} 天的遗言环节。\n"
-                    f"你是 {agent.name}，你的身份是【{ROLE_CN_MAP.get(player_role, player_role)}】。\n\n"
-                    f"=== 你的私密信息 ===\n{private_info}\n\n"
-                    f"=== 游戏至今的记忆摘要 ===\n{memory_summary if memory_summary else '(第一天没有历史信息)'}\n\n"
-                    f"=== 导致你出局的当天发言回顾 ===\n{discussion_summary if discussion_summary else '(第一天晚上被淘汰，没有发言记录)'}\n\n"
-                    f"=== 你的任务 ===\n"
-                    f"{task_instruction}"
-                )
+                # 按token预算组装遗言prompt
+                builder = PromptBuilder("last_words", self._get_agent_model_name(agent))
+                builder.add_fixed(f"你已经被淘汰了。现在是第 {self.game_state['day']} 天的遗言环节。\n"
+                                  f"你是 {agent.name}，你的身份是【{ROLE_CN_MAP.get(player_role, player_role)}】。\n\n"
+                                  f"=== 你的私密信息 ===\n")
+                builder.add_text(private_info, priority=1)
+                builder.add_fixed("\n\n=== 游戏至今的记忆摘要 ===\n")
+                builder.add_text(memory_summary if memory_summary else '(第一天没有历史信息)', priority=2, keep="tail")
+                builder.add_fixed("\n\n=== 导致你出局的当天发言回顾 ===\n")
+                builder.add_lines(self.game_state["discussion_history"], priority=3,
+                                  empty_text='(第一天晚上被淘汰，没有发言记录)')
+                builder.add_fixed(f"\n\n=== 你的任务 ===\n"
+                                  f"{task_instruction}")
+                prompt = builder.build()
 
             # 【修复】统一使用静默回复，并为遗言环节增加超时
             try:
@@ -1414,9 +1749,22 @@ class GameMasterAgent(ReActAgent):
                     title=f"为 {agent.name} (已淘汰) 生成遗言的Prompt",
                     prompt=prompt
                 )
-                response_msg = await asyncio.wait_for(self._get_silent_reply(agent, prompt), timeout=30.0)
+                response_msg = await asyncio.wait_for(self._get_silent_reply(agent, prompt, call_site="last_words"), timeout=30.0)
             except asyncio.TimeoutError:
                 game_logger.add_entry(f"[{agent.name} 发表遗言超时]")
+                if not getattr(agent, 'is_user', False):
+                    call_metrics.record(
+                        "last_words",
+                        seat=agent.name,
+                        model_name=self._get_agent_model_name(agent),
+                        phase=self.game_state["phase"],
+                        day=self.game_state["day"],
+                        latency=30.0,
+                        prompt_tokens=count_tokens(prompt, self._get_agent_model_name(agent)),
+                        completion_tokens=0,
+                        retries=0,
+                        outcome=OUTCOME_TIMEOUT,
+                    )
                 response_msg = Msg(agent.name, "...", role="assistant") # 使用默认遗言
             
             # 【修复】使用新的健壮解析函数
@@ -1425,41 +1773,8 @@ class GameMasterAgent(ReActAgent):
             # 【修复】同样对遗言进行后处理，与发言逻辑保持一致
             cleaned_content = raw_response
             if not getattr(agent, 'is_user', False):
-                # 【修复】更智能地移除思考过程，保留完整发言
-                
-                # 首先移除明确的思考标记
-                cleaned_content = re.sub(r"^\(thinking\):", "", cleaned_content, flags=re.IGNORECASE).strip()
-                
-                # 处理可能的格式："思考过程... Player_X: 实际遗言内容"
-                if f"{agent.name}:" in cleaned_content:
-                    parts = cleaned_content.split(f"{agent.name}:")
-                    if len(parts) > 1:
-                        # 检查分割后的第一部分是否主要是思考内容
-                        first_part = parts[0].strip().lower()
-                        thinking_indicators = ['thinking', 'strategy', '策略', '分析', '我需要', '考虑', '想法', 'player_' + agent.name.split('_')[1] + '(thinking)']
-                        
-                        # 如果第一部分包含大量思考关键词，或明显是思考过程，则移除
-                        if (len(first_part) > 100 and any(indicator in first_part for indicator in thinking_indicators)) or \
-                           '(thinking)' in first_part:
-                            # 取最后一个 "Player_X:" 之后的内容
-                            cleaned_content = parts[-1].strip()
-                        else:
-                            # 否则保留完整内容，只是去掉重复的玩家名前缀
-                            cleaned_content = f"{agent.name}:" + ":".join(parts[1:])
-                            cleaned_content = cleaned_content.replace(f"{agent.name}:", "", 1).strip()
-                
-                # 处理段落级别的思考内容移除
-                paragraphs = [p.strip() for p in cleaned_content.split('\n\n') if p.strip()]
-                if len(paragraphs) > 1:
-                    first_para = paragraphs[0].lower()
-                    thinking_keywords = ['thinking', 'strategy', '策略', '分析：', '我的想法是', '我需要考虑', '当前局面']
-                    # 只有当第一段明确是思考内容且较长时才移除
-                    if len(first_para) > 80 and any(keyword in first_para for keyword in thinking_keywords):
-                        cleaned_content = "\n\n".join(paragraphs[1:])
-                    else:
-                        cleaned_content = "\n\n".join(paragraphs)
-                else:
-                    cleaned_content = "\n\n".join(paragraphs)
+                # 移除 "(thinking):" 前缀、写在发言前的分析段落等思考过程
+                cleaned_content = clean_speech(cleaned_content, speaker=agent.name)
 
             # 广播遗言
             last_words = f"玩家 {agent.name} 的遗言是：{cleaned_content}"
@@ -1467,6 +1782,7 @@ class GameMasterAgent(ReActAgent):
             # 【新增】获取模型信息并记录到日志
             model_info = self._get_agent_model_info(agent)
             game_logger.add_entry(f"[{agent.name} 遗言 - {model_info}]: {cleaned_content}")
+            self._log_event("last_words", actor=agent.name, model=model_info, payload={"text": cleaned_content})
             
             # 【修复】手动打印处理干净的遗言
             print(last_words)
@@ -1480,6 +1796,7 @@ class GameMasterAgent(ReActAgent):
             # 【新功能】处理猎人开枪
             await self._handle_hunter_shoot(agent.name)
 
+    @traced("hunter_shoot")
     async def _handle_hunter_shoot(self, dead_player_name: str) -> None:
         """【新功能】处理猎人开枪机制"""
         # 检查死者是否是猎人
@@ -1505,6 +1822,7 @@ class GameMasterAgent(ReActAgent):
         
         if not potential_targets:
             return
+        matcher = TargetMatcher.for_targets(potential_targets, abstain_tokens=HUNTER_ABSTAIN_TOKENS)
         
         # 【优化】获取猎人的记忆摘要
         memory_summary = self._get_player_memory(dead_player_name)
@@ -1531,7 +1849,7 @@ class GameMasterAgent(ReActAgent):
                 prompt=prompt
             )
             
-            response_msg = await self._get_silent_reply(hunter_agent, prompt)
+            response_msg = await self._get_silent_reply(hunter_agent, prompt, call_site="hunter_shot", decision_targets=potential_targets)
             raw_response = self._parse_ai_response(response_msg.content)
             
             # 【新增】获取模型信息并记录到日志
@@ -1542,7 +1860,6 @@ class GameMasterAgent(ReActAgent):
             parsed_candidate = raw_response.strip() if raw_response else ""
             # 处理可能的 JSON 字符串或转义
             try:
-                import json
                 # 如果是被额外引号包裹的 JSON 字符串，先去掉外部引号并解码转义
                 if parsed_candidate.startswith('"') and parsed_candidate.endswith('"'):
                     inner = parsed_candidate[1:-1]
@@ -1560,43 +1877,23 @@ class GameMasterAgent(ReActAgent):
                 # 解析失败则继续使用原始文本
                 pass
             
-            # 如果包含格式化指令，提取冒号后的部分
-            if '我开枪带走:' in parsed_candidate or '我开枪带走：' in parsed_candidate:
-                parsed_candidate = parsed_candidate.split(':')[-1].split('：')[-1].strip()
-            
             # 【调试】记录解析过程
             game_logger.add_entry(f"[猎人开枪解析]: 原始回复='{raw_response}', 处理后='{parsed_candidate}'")
             
-            # 检查是否为弃票
-            norm = parsed_candidate.strip().lower()
-            if any(tok in norm for tok in ['弃票','abstain','pass','skip','不想','不投']):
+            # 解析目标或弃枪；支持 Player_6、player6、player 6、6、6号 以及 '我开枪带走: Player_X'
+            result = matcher.match(parsed_candidate, marker="我开枪带走")
+            if result.status == MATCH_NONE and parsed_candidate != raw_response:
+                # 处理后的文本中没有目标时，再在原始回复中查找
+                result = matcher.match(raw_response, marker="我开枪带走")
+            if result.status == MATCH_ABSTAIN:
                 game_logger.add_entry(f"[{dead_player_name} 弃枪]")
+                self._log_event("hunter_shot", actor=dead_player_name, payload={"target": None, "fallback": False})
                 return
-            
-            # 增强匹配逻辑，支持更多格式
-            for p_target in potential_targets:
-                player_id = p_target.split('_')[-1]
-                normalized_input = parsed_candidate.lower().strip()
-                
-                # 支持的格式：Player_6, player_6, player6, player 6, 6
-                if normalized_input == p_target.lower() or \
-                   normalized_input == f"player_{player_id}" or \
-                   normalized_input == f"player{player_id}" or \
-                   normalized_input == f"player {player_id}" or \
-                   normalized_input == f"player-{player_id}" or \
-                   normalized_input == player_id or \
-                   p_target.lower() in normalized_input:
-                    target_name = p_target
-                    game_logger.add_entry(f"[猎人开枪匹配成功]: '{normalized_input}' 匹配到 '{p_target}'")
-                    break
-            
-            # 如果上面没匹配到，再检查是否直接在原始输入中出现目标名
-            if not target_name:
-                for p_target in sorted(potential_targets, key=len, reverse=True):
-                    if p_target in raw_response:
-                        target_name = p_target
-                        game_logger.add_entry(f"[猎人开枪备用匹配成功]: 在原始回复中找到 '{p_target}'")
-                        break
+            if result.status == MATCH_TARGET:
+                target_name = result.target
+                game_logger.add_entry(f"[猎人开枪匹配成功]: '{parsed_candidate}' 匹配到 '{target_name}'")
+            elif result.status == MATCH_AMBIGUOUS:
+                game_logger.add_entry(f"[猎人开枪目标含糊]: {', '.join(result.candidates)}")
             
             # 【关键修复】如果找到了有效目标，立即跳出外层循环
             if target_name:
@@ -1605,6 +1902,8 @@ class GameMasterAgent(ReActAgent):
         
         if target_name:
             self.game_state["players"][target_name]["status"] = "dead"
+            self._log_event("hunter_shot", actor=dead_player_name, payload={"target": target_name, "fallback": False})
+            self._log_event("death", actor=target_name, payload={"cause": "hunter"})
             log_entry = f"猎人 {dead_player_name} 开枪带走了 {target_name}。"
             self.game_state["full_history"].append(f"[第{self.game_state['day']}天-猎人开枪]: {log_entry}")
             game_logger.add_entry(log_entry)
@@ -1632,8 +1931,10 @@ class GameMasterAgent(ReActAgent):
         else:
             # 如果多次都无法给出有效目标，随机选择
             game_logger.add_entry(f"[猎人开枪匹配失败]: 3次尝试都未能匹配到有效目标")
-            fallback_target = random.choice(potential_targets)
+            fallback_target = self.rng.choice(potential_targets)
             self.game_state["players"][fallback_target]["status"] = "dead"
+            self._log_event("hunter_shot", actor=dead_player_name, payload={"target": fallback_target, "fallback": True})
+            self._log_event("death", actor=fallback_target, payload={"cause": "hunter"})
             log_entry = f"猎人 {dead_player_name} 未能提供有效目标，裁判随机选择了 {fallback_target}。"
             self.game_state["full_history"].append(f"[第{self.game_state['day']}天-猎人开枪]: {log_entry}")
             game_logger.add_entry(log_entry)
@@ -1713,6 +2014,7 @@ class GameMasterAgent(ReActAgent):
         """
         pass
 
+    @traced("memory_update")
     async def _update_all_players_memory_for_night(self) -> None:
         """
         【新增】在夜晚开始前为所有存活玩家更新记忆摘要。
@@ -1729,6 +2031,7 @@ class GameMasterAgent(ReActAgent):
             except Exception as e:
                 game_logger.add_entry(f"[夜晚前更新记忆失败]: {player_name} - {e}")
 
+    @traced("memory_summary")
     async def _generate_memory_summary(self, player_name: str, for_morning: bool = False, current_discussion: list = None) -> str:
         """
         【逻辑重构】实现增量式记忆摘要
@@ -1846,7 +2149,7 @@ class GameMasterAgent(ReActAgent):
             )
             
             # 使用和其他Agent一样的方式调用
-            response_msg = await self._get_silent_reply(summary_agent, prompt)
+            response_msg = await self._get_silent_reply(summary_agent, prompt, call_site="summary")
             content = self._parse_ai_response(response_msg.content)
             
             return content
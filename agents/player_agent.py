@@ -4,14 +4,90 @@ import os
 from agentscope.agent import ReActAgent
 from agentscope.model import OpenAIChatModel
 from agentscope.formatter import OpenAIMultiAgentFormatter
+from agentscope.memory import InMemoryMemory
+
+from prompt_budget import get_budget_config
 
 # 定义prompts文件夹的路径
 PROMPT_DIR = os.path.join(os.path.dirname(__file__), '..', 'prompts')
 
+# 角色 -> 系统提示
+_PROMPT_CACHE = {}
+
+def load_role_prompt(role: str) -> str:
+    """读取角色的系统提示（进程内缓存，多局游戏只读一次文件）"""
+    prompt = _PROMPT_CACHE.get(role)
+    if prompt is None:
+        prompt_path = os.path.join(PROMPT_DIR, f"{role}.txt")
+        if not os.path.exists(prompt_path):
+            raise FileNotFoundError(f"Prompt file not found for role: {role}")
+        with open(prompt_path, 'r', encoding='utf-8') as f:
+            prompt = _PROMPT_CACHE[role] = f.read()
+    return prompt
+
+
+class RecentMemory(InMemoryMemory):
+    """
+    只保留最近 max_messages 条消息的对话记忆。
+
+    ReActAgent 每次调用都把整个记忆发给模型，而裁判的 prompt 已包含记忆摘要和发言记录；
+    不设上限时每次调用的请求体、检查点都随天数和座位数增长。
+    """
+
+    def __init__(self, max_messages: int = None) -> None:
+        super().__init__()
+        self.max_messages = max_messages
+
+    async def add(self, memories, marks=None, allow_duplicates: bool = False, **kwargs) -> None:
+        await super().add(memories, marks, allow_duplicates, **kwargs)
+        if self.max_messages and len(self.content) > self.max_messages:
+            del self.content[:-self.max_messages]
+
+
+def create_memory() -> RecentMemory:
+    """按 PROMPT_BUDGET 的 memory_messages 创建玩家的对话记忆。"""
+    return RecentMemory(get_budget_config().get("memory_messages"))
+
+
+def create_chat_model(model_config: dict, http_client=None) -> OpenAIChatModel:
+    """
+    按配置创建玩家使用的模型（禁用工具调用）。
+
+    Args:
+        model_config (dict): 同 create_player_agent
+        http_client (httpx.AsyncClient, optional): 共用的 HTTP 客户端（见 agent_pool.py）；
+            为空时由 openai SDK 新建（每个约 20 毫秒，主要是 SSL 上下文）
+    """
+    # AgentScope的OpenAIChat可以兼容所有OpenAI API标准的接口
+    model_init_args = {
+        "model_name": model_config["model_name"],
+        "api_key": model_config["api_key"],
+    }
+    # 检查是否有base_url，并将其放入client_args
+    client_args = {}
+    if "base_url" in model_config and model_config["base_url"]:
+        client_args["base_url"] = model_config["base_url"]
+    if http_client is not None:
+        client_args["http_client"] = http_client
+    if client_args:
+        model_init_args["client_args"] = client_args
+    
+    # 增加网络请求重试机制
+    # model_init_args["max_retries"] = 5
+    
+    # 【修复】通过 generate_kwargs 禁用工具调用，避免 "tool_calls" 错误
+    model_init_args["generate_kwargs"] = {
+        "tool_choice": "none"
+    }
+    
+    return OpenAIChatModel(**model_init_args)
+
+
 def create_player_agent(
     role: str,
     model_config: dict,
     agent_id: int = None,
+    http_client=None,
 ) -> ReActAgent:
     """
     一个用于创建玩家Agent的工厂函数
@@ -26,38 +102,16 @@ def create_player_agent(
                 "base_url": "YOUR_BASE_URL"
             }
         agent_id (int, optional): agent的唯一id. Defaults to None.
+        http_client (httpx.AsyncClient, optional): 共用的 HTTP 客户端. Defaults to None.
 
     Returns:
         ReActAgent: 根据配置实例化的Agent.
     """
     # 1. 读取对应角色的系统提示
-    prompt_path = os.path.join(PROMPT_DIR, f"{role}.txt")
-    if not os.path.exists(prompt_path):
-        raise FileNotFoundError(f"Prompt file not found for role: {role}")
-    with open(prompt_path, 'r', encoding='utf-8') as f:
-        prompt = f.read()
+    prompt = load_role_prompt(role)
 
     # 2. 初始化模型
-    # AgentScope的OpenAIChat可以兼容所有OpenAI API标准的接口
-    model_init_args = {
-        "model_name": model_config["model_name"],
-        "api_key": model_config["api_key"],
-    }
-    # 检查是否有base_url，并将其放入client_args
-    if "base_url" in model_config and model_config["base_url"]:
-        model_init_args["client_args"] = {
-            "base_url": model_config["base_url"]
-        }
-    
-    # 增加网络请求重试机制
-    # model_init_args["max_retries"] = 5
-    
-    # 【修复】通过 generate_kwargs 禁用工具调用，避免 "tool_calls" 错误
-    model_init_args["generate_kwargs"] = {
-        "tool_choice": "none"
-    }
-    
-    model = OpenAIChatModel(**model_init_args)
+    model = create_chat_model(model_config, http_client)
 
     # 3. 创建并返回Agent实例
     # 我们使用基础的Agent，因为它更适合纯对话驱动的决策
@@ -68,6 +122,7 @@ def create_player_agent(
         sys_prompt=prompt,
         model=model,
         formatter=OpenAIMultiAgentFormatter(),
+        memory=create_memory(),
         max_iters=1,
     )
     
@@ -75,3 +130,18 @@ def create_player_agent(
     setattr(agent, 'is_user', False)
     
     return agent
+
+
+def reset_player_agent(agent: ReActAgent, role: str, model: OpenAIChatModel) -> ReActAgent:
+    """
+    让上一局的Agent原地开始新的一局：清空记忆、按新角色换系统提示、换回原来的模型。
+    模型客户端和格式化器继续复用（见 agent_pool.py）。
+    """
+    agent.memory = create_memory()
+    agent._sys_prompt = load_role_prompt(role)
+    agent._subscribers = {}
+    # 上一局中途可能切换过模型（429、token 预算），generate_kwargs 中也可能留有单次调用的参数
+    agent.model = model
+    model.generate_kwargs = {"tool_choice": "none"}
+    setattr(agent, 'is_user', False)
+    return agent
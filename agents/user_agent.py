@@ -44,8 +44,51 @@ class MyUserAgent(UserAgent):
         # If you need other observe functionalities, you can add them here.
         pass
 
+class RemoteUserAgent(UserAgent):
+    """
+    A user agent whose human plays over a network connection (see game_server.py).
+
+    Prompts are sent to the seat's connection and the reply is awaited on the
+    event loop, so no thread is parked per pending input. Each decision has a
+    timeout; when it expires, or the player has disconnected, the agent answers
+    with `timeout_reply` so the table keeps going.
+    """
+
+    def __init__(self, name: str, seat, input_timeout: float = 120.0, timeout_reply: str = "弃票") -> None:
+        super().__init__(name=name)
+        self.seat = seat
+        self.input_timeout = input_timeout
+        self.timeout_reply = timeout_reply
+
+    async def reply(self, x: Msg) -> Msg:
+        """
+        Send the prompt to the remote player and wait for their input
+        without blocking the event loop.
+        """
+        user_input = await self.seat.ask(x.content, timeout=self.input_timeout)
+        if user_input is None:
+            user_input = self.timeout_reply
+            await self.seat.send("notice", f"输入超时，已自动回复: {user_input}")
+        return Msg(self.name, user_input, role="user")
+
+    async def observe(self, x: Msg) -> None:
+        """
+        Forward private system messages to the remote player. Public
+        announcements reach them through the table's console output.
+        """
+        if x.role == "system" and x.content.startswith("__PRIVATE__"):
+            await self.seat.send("private", x.content.replace("__PRIVATE__", "", 1))
+
+
 def create_user_agent() -> MyUserAgent:
     """
     Creates a custom user agent instance.
     """
     return MyUserAgent(name="User_Player")
+
+
+def create_remote_user_agent(seat, input_timeout: float = 120.0, timeout_reply: str = "弃票") -> RemoteUserAgent:
+    """
+    Creates a user agent for a human seat connected to the game server.
+    """
+    return RemoteUserAgent(name="User_Player", seat=seat, input_timeout=input_timeout, timeout_reply=timeout_reply)
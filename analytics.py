@@ -0,0 +1,516 @@
+# werewolf_game/analytics.py
+"""
+对局结果的批量统计：把 log_index.py 索引好的对局一次性载入为按列存放的 NumPy 数组，
+用向量化运算计算各项指标，并给出 bootstrap 置信区间，十万局量级也能交互式使用。
+
+指标（表名）：
+    summary                 对局数、阵营胜率、平均天数
+    winrate-by-role         各角色胜率
+    winrate-by-model        各模型胜率（按座位计）
+    winrate-by-seat         各座位号胜率
+    winrate-by-model-role   各（模型, 角色）胜率
+    vote-accuracy-by-model  好人阵营的投票中投给真狼的比例，按投票者的模型
+    vote-accuracy-by-role   同上，按投票者的角色
+    abstain-by-model        弃票率，按模型
+    seer-survival           预言家生存曲线（Kaplan-Meier，按天；游戏结束时仍存活视为删失）
+
+置信区间按对局整体重抽样（同一局内的座位和投票并不独立），所有指标共用同一组泊松 bootstrap
+权重，一次遍历算完：每个指标先汇总成"每局 × 分组"的分子、分母矩阵，重抽样只需要矩阵乘法。
+
+用法:
+    python log_index.py index                          # 先索引日志
+    python analytics.py                                # 打印所有指标
+    python analytics.py --tables winrate-by-model,seer-survival --reps 1000
+    python analytics.py --export analytics_out         # 每张表导出为 CSV
+"""
+import os
+import csv
+import math
+import time
+import sqlite3
+import argparse
+import warnings
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from log_index import DEFAULT_DB_PATH, connect
+
+WOLF_ROLE = "werewolf"
+WOLF_SIDE = "狼人阵营"
+
+# 载入的事件类型，其余事件（发言、查验）不参与统计
+EVENT_KINDS = ("vote", "abstain", "wolf_kill", "witch_save", "witch_poison", "vote_out", "hunter_shot")
+_KIND = {kind: code for code, kind in enumerate(EVENT_KINDS)}
+
+# 每批重抽样的次数：权重矩阵为 批大小 × 对局数
+_BOOTSTRAP_CHUNK = 50
+
+# Poisson(1) 的逆累积分布表：用 16 位均匀随机数查表生成泊松权重，比 rng.poisson 快约 6 倍，
+# 各取值的概率误差小于 1/65536
+_POISSON_TABLE = np.searchsorted(
+    np.cumsum([math.exp(-1) / math.factorial(k) for k in range(20)]),
+    (np.arange(65536) + 0.5) / 65536, side="right",
+).astype(np.float32)
+
+
+class GameColumns:
+    """
+    按列存放的对局数据。座位矩阵的形状为 (对局数, 座位数)，缺失处为 -1。
+
+    Attributes:
+        game_ids (np.ndarray): 对局 ID
+        wolf_won (np.ndarray): 是否狼人阵营获胜
+        days (np.ndarray): 对局天数
+        role (np.ndarray): 座位的角色编号，对应 roles
+        model (np.ndarray): 座位的模型编号，对应 models
+        ev_game, ev_day, ev_kind, ev_actor, ev_target (np.ndarray): 事件列，
+            ev_kind 对应 EVENT_KINDS，ev_actor/ev_target 为座位号（没有时为 -1）
+    """
+
+    def __init__(self, game_ids, wolf_won, days, role, model, roles, models,
+                 ev_game, ev_day, ev_kind, ev_actor, ev_target) -> None:
+        self.game_ids = game_ids
+        self.wolf_won = wolf_won
+        self.days = days
+        self.role = role
+        self.model = model
+        self.roles: List[str] = [str(name) for name in roles]
+        self.models: List[str] = [str(name) for name in models]
+        self.ev_game = ev_game
+        self.ev_day = ev_day
+        self.ev_kind = ev_kind
+        self.ev_actor = ev_actor
+        self.ev_target = ev_target
+
+    @property
+    def num_games(self) -> int:
+        return len(self.game_ids)
+
+
+_COLUMN_NAMES = ("game_ids", "wolf_won", "days", "role", "model", "roles", "models",
+                 "ev_game", "ev_day", "ev_kind", "ev_actor", "ev_target")
+
+
+def _fetch_array(conn: sqlite3.Connection, sql: str, columns: int, dtype=np.int32) -> np.ndarray:
+    rows = conn.execute(sql).fetchall()
+    return np.array(rows, dtype=dtype).reshape(len(rows), columns)
+
+
+def _query_columns(conn: sqlite3.Connection, game_ids: List[str]) -> GameColumns:
+    """
+    从索引数据库载入指定的对局。字符串（对局、模型、角色、玩家名）在 SQL 中换成整数编号，
+    Python 端只需要把整数行转成数组。
+    """
+    conn.executescript(
+        "DROP TABLE IF EXISTS temp.g; DROP TABLE IF EXISTS temp.r; DROP TABLE IF EXISTS temp.m;"
+        "CREATE TEMP TABLE g (game_id TEXT PRIMARY KEY, idx INTEGER);"
+        "CREATE TEMP TABLE r AS SELECT role, ROW_NUMBER() OVER (ORDER BY role) - 1 AS code "
+        "  FROM (SELECT DISTINCT role FROM players WHERE role IS NOT NULL);"
+        "CREATE TEMP TABLE m AS SELECT model, ROW_NUMBER() OVER (ORDER BY model) - 1 AS code "
+        "  FROM (SELECT DISTINCT model FROM players WHERE model IS NOT NULL);"
+    )
+    conn.executemany("INSERT INTO temp.g VALUES (?, ?)", ((game_id, idx) for idx, game_id in enumerate(game_ids)))
+    game_rows = conn.execute("SELECT g.game_id, games.winner, games.days FROM g JOIN games "
+                             "ON games.game_id = g.game_id ORDER BY g.idx").fetchall()
+    roles = [row[0] for row in conn.execute("SELECT role FROM r ORDER BY code")]
+    models = [row[0] for row in conn.execute("SELECT model FROM m ORDER BY code")]
+
+    # 玩家名 "Player_<座位号>"
+    seat_sql = "CAST(SUBSTR({}, 8) AS INTEGER)"
+    players = _fetch_array(conn, (
+        f"SELECT g.idx, {seat_sql.format('p.name')}, COALESCE(r.code, -1), COALESCE(m.code, -1) "
+        "FROM players p JOIN g ON g.game_id = p.game_id "
+        "LEFT JOIN r ON r.role = p.role LEFT JOIN m ON m.model = p.model"
+    ), 4)
+    kind_case = " ".join(f"WHEN '{kind}' THEN {code}" for kind, code in _KIND.items())
+    kinds = ", ".join(f"'{kind}'" for kind in EVENT_KINDS)
+    events = _fetch_array(conn, (
+        f"SELECT g.idx, e.day, CASE e.kind {kind_case} END, "
+        f"COALESCE({seat_sql.format('e.actor')}, -1), "
+        f"CASE WHEN e.target LIKE 'Player_%' THEN {seat_sql.format('e.target')} ELSE -1 END "
+        f"FROM events e JOIN g ON g.game_id = e.game_id WHERE e.kind IN ({kinds})"
+    ), 5)
+    conn.execute("DROP TABLE temp.g")
+
+    num_games = len(game_rows)
+    num_seats = int(players[:, 1].max()) + 1 if len(players) else 0
+    role = np.full((num_games, num_seats), -1, dtype=np.int8)
+    model = np.full((num_games, num_seats), -1, dtype=np.int16)
+    role[players[:, 0], players[:, 1]] = players[:, 2]
+    model[players[:, 0], players[:, 1]] = players[:, 3]
+
+    return GameColumns(
+        game_ids=np.array([row[0] for row in game_rows], dtype=str),
+        wolf_won=np.array([row[1] == WOLF_SIDE for row in game_rows], dtype=bool),
+        days=np.array([row[2] or 0 for row in game_rows], dtype=np.int16),
+        role=role, model=model, roles=roles, models=models,
+        ev_game=events[:, 0], ev_day=events[:, 1].astype(np.int16), ev_kind=events[:, 2].astype(np.int8),
+        ev_actor=events[:, 3].astype(np.int16), ev_target=events[:, 4].astype(np.int16),
+    )
+
+
+def _recode(codes: np.ndarray, names: List[str], target: List[str]) -> np.ndarray:
+    """把按 names 编号的数组改为按 target 编号（target 中没有的名字会追加到 target 末尾）。"""
+    for name in names:
+        if name not in target:
+            target.append(name)
+    mapping = np.array([target.index(name) for name in names] + [-1], dtype=codes.dtype)
+    return mapping[codes]  # -1 经过索引仍映射为 -1（mapping 的最后一项）
+
+
+def merge_columns(old: GameColumns, new: GameColumns) -> GameColumns:
+    """把新载入的对局追加到已有的列数据之后。"""
+    roles, models = list(old.roles), list(old.models)
+    new_role = _recode(new.role, new.roles, roles)
+    new_model = _recode(new.model, new.models, models)
+    num_seats = max(old.role.shape[1], new.role.shape[1])
+
+    def seats(matrix: np.ndarray) -> np.ndarray:
+        return np.pad(matrix, ((0, 0), (0, num_seats - matrix.shape[1])), constant_values=-1)
+
+    return GameColumns(
+        game_ids=np.concatenate([old.game_ids, new.game_ids]),
+        wolf_won=np.concatenate([old.wolf_won, new.wolf_won]),
+        days=np.concatenate([old.days, new.days]),
+        role=np.concatenate([seats(old.role), seats(new_role)]),
+        model=np.concatenate([seats(old.model), seats(new_model)]),
+        roles=roles, models=models,
+        ev_game=np.concatenate([old.ev_game, new.ev_game + old.num_games]),
+        ev_day=np.concatenate([old.ev_day, new.ev_day]),
+        ev_kind=np.concatenate([old.ev_kind, new.ev_kind]),
+        ev_actor=np.concatenate([old.ev_actor, new.ev_actor]),
+        ev_target=np.concatenate([old.ev_target, new.ev_target]),
+    )
+
+
+def default_cache_path(db_path: str) -> str:
+    """索引数据库对应的列数据缓存路径，如 logs/index.db -> logs/index_columns.npz。"""
+    return f"{os.path.splitext(db_path)[0]}_columns.npz"
+
+
+def load_columns(conn: sqlite3.Connection, cache_path: Optional[str] = None) -> GameColumns:
+    """
+    载入索引中所有已结束的对局。
+
+    从 SQLite 逐行读取数百万个事件需要数秒，指定 cache_path 时把列数据保存为 .npz：
+    之后只从数据库读取缓存中没有的新对局，追加后写回缓存，已有的对局直接从缓存读取。
+
+    Args:
+        cache_path (str, optional): 列数据缓存文件路径，为空时不使用缓存
+    """
+    game_ids = [row[0] for row in conn.execute("SELECT game_id FROM games WHERE complete = 1 ORDER BY game_id")]
+    cached = None
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with np.load(cache_path) as data:
+                cached = GameColumns(**{name: data[name] for name in _COLUMN_NAMES})
+        except (OSError, KeyError, ValueError):
+            cached = None  # 缓存损坏或格式过时，重新载入
+
+    if cached is not None:
+        missing = np.array(game_ids, dtype=str)
+        missing = missing[~np.isin(missing, cached.game_ids)] if len(missing) else missing
+        if len(missing) == 0:
+            return cached
+        cols = merge_columns(cached, _query_columns(conn, missing.tolist()))
+    else:
+        cols = _query_columns(conn, game_ids)
+
+    if cache_path:
+        directory = os.path.dirname(cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{cache_path}.tmp.npz"
+        np.savez(tmp_path, **{name: np.asarray(getattr(cols, name)) for name in _COLUMN_NAMES})
+        os.replace(tmp_path, cache_path)
+    return cols
+
+
+# ===== 每局 × 分组的汇总 =====
+
+def per_game(game: np.ndarray, group: np.ndarray, num_games: int, num_groups: int,
+             weights: Optional[np.ndarray] = None) -> np.ndarray:
+    """把 (对局, 分组, 值) 三列汇总为 对局数 × 分组数 的矩阵（值缺省为 1，即计数）。"""
+    flat = np.bincount(game.astype(np.int64) * num_groups + group, weights=weights,
+                       minlength=num_games * num_groups)
+    return flat.reshape(num_games, num_groups).astype(np.float32)
+
+
+def _seat_columns(cols: GameColumns) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """把座位矩阵展开为有角色的座位列表：(对局, 座位号, 角色, 模型, 是否获胜)。"""
+    game, seat = np.nonzero(cols.role >= 0)
+    role = cols.role[game, seat].astype(np.int64)
+    model = cols.model[game, seat].astype(np.int64)
+    is_wolf = role == cols.roles.index(WOLF_ROLE) if WOLF_ROLE in cols.roles else np.zeros(len(role), bool)
+    won = is_wolf == cols.wolf_won[game]
+    return game, seat, role, model, won
+
+
+def bootstrap(sums: Dict[str, np.ndarray], stats: Dict[str, Callable[[Dict[str, np.ndarray]], np.ndarray]],
+              reps: int = 200, confidence: float = 0.95, seed: int = 0) -> Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    按对局重抽样，计算各统计量的点估计和置信区间。
+
+    Args:
+        sums (Dict[str, np.ndarray]): {名称: 对局数 × 分组数 的矩阵}
+        stats (Dict[str, Callable]): {统计量: 函数}，函数接收 {名称: 重抽样数 × 分组数 的加权和}，
+            返回 重抽样数 × 输出数 的数组
+        reps (int): 重抽样次数；泊松权重（每局的权重服从 Poisson(1)）近似有放回抽样，可以分批生成
+        confidence (float): 置信度
+
+    Returns:
+        Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]]: {统计量: (点估计, 下界, 上界)}
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        totals = {key: m.sum(axis=0, dtype=np.float64)[None, :] for key, m in sums.items()}
+        points = {name: stat(totals)[0] for name, stat in stats.items()}
+        num_games = next(iter(sums.values())).shape[0]
+        if reps <= 0 or num_games == 0:
+            return {name: (point, np.full_like(point, np.nan), np.full_like(point, np.nan))
+                    for name, point in points.items()}
+
+        rng = np.random.default_rng(seed)
+        samples = {name: [] for name in stats}
+        for start in range(0, reps, _BOOTSTRAP_CHUNK):
+            size = (min(_BOOTSTRAP_CHUNK, reps - start), num_games)
+            weights = _POISSON_TABLE[rng.integers(0, 65536, size=size, dtype=np.uint16)]
+            weighted = {key: weights @ m for key, m in sums.items()}
+            for name, stat in stats.items():
+                samples[name].append(stat(weighted))
+
+    tail = (1 - confidence) / 2 * 100
+    results = {}
+    for name, point in points.items():
+        draws = np.concatenate(samples[name])
+        if draws.shape[1] == 0:
+            # 没有分组（如所有座位都没有模型）时 nanpercentile 返回空数组，无法拆成上下界
+            results[name] = (point, np.zeros(0), np.zeros(0))
+            continue
+        with warnings.catch_warnings():
+            # 某个分组在所有重抽样中都没有样本时区间为 NaN，不需要警告
+            warnings.simplefilter("ignore", RuntimeWarning)
+            low, high = np.nanpercentile(draws, [tail, 100 - tail], axis=0)
+        results[name] = (point, low, high)
+    return results
+
+
+def _ratio(num: str, den: str) -> Callable[[Dict[str, np.ndarray]], np.ndarray]:
+    return lambda s: s[num] / s[den]
+
+
+def _survival(deaths: str, at_risk: str) -> Callable[[Dict[str, np.ndarray]], np.ndarray]:
+    # Kaplan-Meier：S(d) = ∏(1 - 第 k 天死亡数 / 第 k 天开始时仍在风险中的数)
+    return lambda s: np.cumprod(1 - np.nan_to_num(s[deaths] / s[at_risk]), axis=1)
+
+
+# ===== 指标 =====
+
+def seer_death_days(cols: GameColumns) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    每局预言家的死亡天数。
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (有预言家的对局编号, 死亡天数；游戏结束仍存活为 0)
+    """
+    if "seer" not in cols.roles:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64)
+    seer_game, seer_seat = np.nonzero(cols.role == cols.roles.index("seer"))
+    seat_of = np.full(cols.num_games, -1, dtype=np.int64)
+    seat_of[seer_game] = seer_seat
+
+    target_seat = seat_of[cols.ev_game]
+    on_seer = (cols.ev_target == target_seat) & (target_seat >= 0)
+    max_day = int(cols.ev_day.max()) + 1 if len(cols.ev_day) else 1
+    key = cols.ev_game.astype(np.int64) * max_day + cols.ev_day
+    saved = np.isin(key, key[on_seer & (cols.ev_kind == _KIND["witch_save"])])
+    killed = on_seer & (
+        ((cols.ev_kind == _KIND["wolf_kill"]) & ~saved)
+        | np.isin(cols.ev_kind, [_KIND["witch_poison"], _KIND["vote_out"], _KIND["hunter_shot"]])
+    )
+    death_day = np.full(cols.num_games, np.iinfo(np.int64).max)
+    np.minimum.at(death_day, cols.ev_game[killed], cols.ev_day[killed].astype(np.int64))
+    death_day = death_day[seer_game]
+    death_day[death_day == np.iinfo(np.int64).max] = 0
+    return seer_game, death_day
+
+
+def compute_tables(cols: GameColumns, reps: int = 200, confidence: float = 0.95, seed: int = 0,
+                   tables: Optional[List[str]] = None) -> Dict[str, Tuple[List[str], List[Tuple]]]:
+    """
+    计算指标表。
+
+    Args:
+        tables (List[str], optional): 只计算这些表，默认全部（见 TABLES）
+
+    Returns:
+        Dict[str, Tuple[List[str], List[Tuple]]]: {表名: (列名, 行)}
+    """
+    tables = tables or list(TABLES)
+    n = cols.num_games
+    sums: Dict[str, np.ndarray] = {}
+    stats: Dict[str, Callable] = {}
+    labels: Dict[str, List] = {}
+
+    def add_rate(name: str, game: np.ndarray, group: np.ndarray, hit: np.ndarray, names: List) -> None:
+        if not names:
+            return  # 没有分组（如日志中没有记录模型）时跳过这张表
+        sums[f"{name}/num"] = per_game(game, group, n, len(names), weights=hit.astype(np.float64))
+        sums[f"{name}/den"] = per_game(game, group, n, len(names))
+        stats[name] = _ratio(f"{name}/num", f"{name}/den")
+        labels[name] = names
+
+    if "summary" in tables:
+        sums["summary/wolf"] = cols.wolf_won.astype(np.float32)[:, None]
+        sums["summary/games"] = np.ones((n, 1), dtype=np.float32)
+        sums["summary/days"] = cols.days.astype(np.float32)[:, None]
+        stats["summary/wolf_rate"] = _ratio("summary/wolf", "summary/games")
+        stats["summary/avg_days"] = _ratio("summary/days", "summary/games")
+
+    if any(name.startswith("winrate-") for name in tables):
+        game, seat, role, model, won = _seat_columns(cols)
+        has_model = model >= 0
+        if "winrate-by-role" in tables:
+            add_rate("winrate-by-role", game, role, won, cols.roles)
+        if "winrate-by-model" in tables:
+            add_rate("winrate-by-model", game[has_model], model[has_model], won[has_model], cols.models)
+        if "winrate-by-seat" in tables:
+            add_rate("winrate-by-seat", game, seat, won, [f"Player_{i}" for i in range(cols.role.shape[1])])
+        if "winrate-by-model-role" in tables:
+            pairs = [f"{m}:{r}" for m in cols.models for r in cols.roles]
+            add_rate("winrate-by-model-role", game[has_model], model[has_model] * len(cols.roles) + role[has_model],
+                     won[has_model], pairs)
+
+    votes = (cols.ev_kind == _KIND["vote"]) & (cols.ev_actor >= 0) & (cols.ev_target >= 0)
+    if "vote-accuracy-by-model" in tables or "vote-accuracy-by-role" in tables:
+        wolf_code = cols.roles.index(WOLF_ROLE) if WOLF_ROLE in cols.roles else -2
+        v_game, v_actor, v_target = cols.ev_game[votes], cols.ev_actor[votes], cols.ev_target[votes]
+        voter_role = cols.role[v_game, v_actor].astype(np.int64)
+        voter_model = cols.model[v_game, v_actor].astype(np.int64)
+        on_wolf = cols.role[v_game, v_target] == wolf_code
+        good = (voter_role >= 0) & (voter_role != wolf_code)
+        if "vote-accuracy-by-model" in tables:
+            mask = good & (voter_model >= 0)
+            add_rate("vote-accuracy-by-model", v_game[mask], voter_model[mask], on_wolf[mask], cols.models)
+        if "vote-accuracy-by-role" in tables:
+            add_rate("vote-accuracy-by-role", v_game[good], voter_role[good], on_wolf[good], cols.roles)
+
+    if "abstain-by-model" in tables:
+        ballots = ((cols.ev_kind == _KIND["abstain"]) & (cols.ev_actor >= 0)) | votes
+        b_game, b_actor = cols.ev_game[ballots], cols.ev_actor[ballots]
+        b_model = cols.model[b_game, b_actor].astype(np.int64)
+        mask = b_model >= 0
+        add_rate("abstain-by-model", b_game[mask], b_model[mask],
+                 cols.ev_kind[ballots][mask] == _KIND["abstain"], cols.models)
+
+    if "seer-survival" in tables:
+        seer_game, death_day = seer_death_days(cols)
+        last_day = np.where(death_day > 0, death_day, cols.days[seer_game])
+        max_day = int(last_day.max()) if len(last_day) else 0
+        day_range = np.arange(1, max_day + 1)
+        # 第 d 天开始时仍在风险中：死亡或删失发生在第 d 天或之后
+        at_risk = (last_day[:, None] >= day_range[None, :]).astype(np.float32)
+        died = (death_day[:, None] == day_range[None, :]).astype(np.float32)
+        sums["seer/at_risk"] = np.zeros((n, max_day), dtype=np.float32)
+        sums["seer/deaths"] = np.zeros((n, max_day), dtype=np.float32)
+        sums["seer/at_risk"][seer_game] = at_risk
+        sums["seer/deaths"][seer_game] = died
+        stats["seer-survival"] = _survival("seer/deaths", "seer/at_risk")
+        labels["seer-survival"] = list(day_range)
+
+    results = bootstrap(sums, stats, reps, confidence, seed) if stats else {}
+    output: Dict[str, Tuple[List[str], List[Tuple]]] = {}
+    pct = f"{confidence:.0%}"
+    for name in tables:
+        if name == "summary":
+            wolf, wolf_low, wolf_high = (values[0] for values in results["summary/wolf_rate"])
+            days, days_low, days_high = (values[0] for values in results["summary/avg_days"])
+            output[name] = (["games", "wolf_win_rate", f"wolf_{pct}_low", f"wolf_{pct}_high",
+                             "avg_days", f"days_{pct}_low", f"days_{pct}_high"],
+                            [(n, *_round(wolf, wolf_low, wolf_high), *_round(days, days_low, days_high))])
+        elif name == "seer-survival":
+            point, low, high = results[name]
+            at_risk = sums["seer/at_risk"].sum(axis=0)
+            output[name] = (["day", "at_risk", "survival", f"{pct}_low", f"{pct}_high"],
+                            [(int(day), int(at_risk[i]), *_round(point[i], low[i], high[i]))
+                             for i, day in enumerate(labels[name])])
+        elif name in results:
+            point, low, high = results[name]
+            counts = sums[f"{name}/den"].sum(axis=0)
+            output[name] = (["group", "n", "rate", f"{pct}_low", f"{pct}_high"],
+                            [(label, int(counts[i]), *_round(point[i], low[i], high[i]))
+                             for i, label in enumerate(labels[name]) if counts[i] > 0])
+    return output
+
+
+def _round(*values) -> Tuple:
+    return tuple(None if not np.isfinite(value) else round(float(value), 4) for value in values)
+
+
+TABLES = (
+    "summary", "winrate-by-role", "winrate-by-model", "winrate-by-seat", "winrate-by-model-role",
+    "vote-accuracy-by-model", "vote-accuracy-by-role", "abstain-by-model", "seer-survival",
+)
+
+
+def export_tables(tables: Dict[str, Tuple[List[str], List[Tuple]]], out_dir: str) -> List[str]:
+    """把每张表写为 <out_dir>/<表名>.csv，返回写入的路径。"""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for name, (columns, rows) in tables.items():
+        path = os.path.join(out_dir, f"{name}.csv")
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(rows)
+        paths.append(path)
+    return paths
+
+
+def format_table(name: str, columns: List[str], rows: List[Tuple]) -> str:
+    """把一张表格式化为对齐的文本。"""
+    cells = [[str(col) for col in columns]] + [["-" if value is None else str(value) for value in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(columns))]
+    lines = [f"== {name} =="]
+    lines.append("  ".join(cell.ljust(w) for cell, w in zip(cells[0], widths)))
+    lines.append("  ".join("-" * w for w in widths))
+    lines.extend("  ".join(cell.ljust(w) for cell, w in zip(row, widths)) for row in cells[1:])
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="对局结果的批量统计（需要先运行 log_index.py index）")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="索引数据库路径")
+    parser.add_argument("--tables", help=f"逗号分隔的表名，默认全部（{', '.join(TABLES)}）")
+    parser.add_argument("--reps", type=int, default=200, help="bootstrap 重抽样次数，0 表示不计算置信区间")
+    parser.add_argument("--confidence", type=float, default=0.95, help="置信度")
+    parser.add_argument("--seed", type=int, default=0, help="bootstrap 随机种子")
+    parser.add_argument("--export", metavar="DIR", help="把每张表导出为 CSV")
+    parser.add_argument("--no-cache", action="store_true", help="不使用列数据缓存（<索引>_columns.npz）")
+    args = parser.parse_args()
+
+    tables = args.tables.split(",") if args.tables else list(TABLES)
+    unknown = [name for name in tables if name not in TABLES]
+    if unknown:
+        parser.error(f"未知的表: {', '.join(unknown)}")
+
+    started = time.perf_counter()
+    cols = load_columns(connect(args.db), None if args.no_cache else default_cache_path(args.db))
+    loaded = time.perf_counter()
+    if cols.num_games == 0:
+        print("索引中没有已结束的对局，请先运行 python log_index.py index")
+        return
+    result = compute_tables(cols, args.reps, args.confidence, args.seed, tables)
+    computed = time.perf_counter()
+
+    for name, (columns, rows) in result.items():
+        print(format_table(name, columns, rows))
+        print()
+    print(f"{cols.num_games} 局，载入 {loaded - started:.2f}s，计算 {computed - loaded:.2f}s（{args.reps} 次重抽样）")
+    if args.export:
+        paths = export_tables(result, args.export)
+        print(f"已导出 {len(paths)} 张表至: {os.path.abspath(args.export)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+# werewolf_game/benchmark.py
+"""
+端到端基准测试：用本地模拟服务器（mock_server.py）跑完整局游戏，
+统计引擎本身的吞吐和各阶段开销，用于在上线前发现引擎的性能退化
+（例如 O(n^2) 的历史扫描、日志写入开销等）。
+
+报告的指标：
+- games_per_min：每分钟完成的局数
+- phases.<阶段>.wall_ms：每局该阶段的平均墙钟耗时
+- phases.<阶段>.cpu_ms：每局该阶段在主线程上消耗的 CPU 时间
+  （模拟的模型延迟是 sleep，不计入 CPU；模拟服务器和日志线程也不计入）
+- engine_cpu_ms：每局主线程 CPU 总耗时
+- peak_rss_mb：进程峰值内存
+- log_bytes：每局写入的日志字节数
+
+使用方法：
+    python benchmark.py --games 5 --save-baseline      # 生成基线 benchmark_baseline.json
+    python benchmark.py --games 5                      # 与基线对比，退化超过阈值时返回非零退出码
+    python benchmark.py --games 3 --latency 0.2        # 模拟模型延迟
+    python benchmark.py --games 10 --memory            # 同时开启内存增长分析（会明显变慢）
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import platform
+from typing import Dict, List, Optional
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+# 参与统计的 span 名称（见 agents/game_master.py 中的 @traced）
+PHASES = ["night", "day_discussion", "vote_phase", "werewolf_action", "collect_vote",
+          "last_words", "memory_summary", "model_call"]
+
+# 数值越大越好的指标，其余指标越小越好
+HIGHER_IS_BETTER = {"games_per_min"}
+
+
+def peak_rss_mb() -> Optional[float]:
+    """返回进程峰值 RSS（MB）；平台不支持时返回 None。"""
+    try:
+        import resource
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 单位为 KB，macOS 为字节
+        return round(usage / (1024 * 1024) if sys.platform == "darwin" else usage / 1024, 1)
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return round(getattr(info, "peak_wset", info.rss) / (1024 * 1024), 1)
+    except ImportError:
+        return None
+
+
+async def run_one_game(seed: int, base_url: str, model_names: List[str], num_players: int = 9):
+    """用模拟服务器跑一局全 AI 的游戏，返回裁判 Agent。"""
+    from agents.agent_pool import agent_pool
+    from agents.game_master import GameMasterAgent
+    from table_setup import generate_game_setup, roles_list
+
+    rng = random.Random(seed)
+    roles = roles_list(generate_game_setup(num_players))
+    rng.shuffle(roles)
+
+    players, identities = [], {}
+    for i, role in enumerate(roles):
+        agent = agent_pool.acquire(
+            role=role,
+            model_config={"model_name": model_names[i % len(model_names)], "api_key": "mock", "base_url": base_url},
+            agent_id=i,
+        )
+        agent.name = f"Player_{i}"
+        setattr(agent, "role", role)
+        setattr(agent, "is_user", False)
+        players.append(agent)
+        identities[agent.name] = role
+
+    gm_model = agent_pool.create_model({"model_name": model_names[0], "api_key": "mock", "base_url": base_url})
+    game_master = GameMasterAgent(players=players, player_identities=identities,
+                                  model=gm_model, summary_model=gm_model, seed=seed, rng=rng)
+    await game_master.notify_werewolves_of_teammates()
+    await game_master.run_game()
+    agent_pool.release(players)
+    return game_master
+
+
+def collect_phase_times(events: List[Dict]) -> Dict[str, Dict[str, float]]:
+    """把一局的 span 汇总为各阶段的墙钟和 CPU 耗时（毫秒）。"""
+    totals = {name: {"wall_ms": 0.0, "cpu_ms": 0.0, "count": 0} for name in PHASES}
+    for event in events:
+        if event.get("ph") != "X" or event["name"] not in totals:
+            continue
+        total = totals[event["name"]]
+        total["wall_ms"] += event["dur"] / 1000
+        total["cpu_ms"] += event.get("tdur", 0) / 1000
+        total["count"] += 1
+    return totals
+
+
+async def run_benchmark(games: int, seed: int, latency: float, tokens_per_second: float, num_players: int = 9) -> Dict:
+    """运行基准测试并返回结果字典。"""
+    import tracing
+    import ratings
+    from mock_server import MockChatServer
+    from logger import log_writer
+    from agents.agent_pool import agent_pool
+
+    # 基准测试需要 span 数据，但不导出 trace 文件
+    tracing.TRACING.update({"enabled": True, "export_at_game_end": False})
+    # 模拟服务器上的对局不计入模型评分
+    ratings.RATINGS.update({"enabled": False})
+
+    try:
+        from configs import MODEL_LIST
+        model_names = list(MODEL_LIST.values()) or ["mock-model"]
+    except ImportError:
+        model_names = ["mock-model"]
+
+    server = MockChatServer({
+        "port": 0,
+        "seed": seed,
+        "latency": {"dist": "fixed", "value": latency},
+        "tokens_per_second": tokens_per_second,
+        "faults": {"rate_limit": 0.0, "timeout": 0.0, "malformed": 0.0},
+    })
+    base_url = server.start_in_thread()
+
+    per_game = []
+    bytes_before = log_writer.bytes_written
+    wall_start = time.perf_counter()
+    try:
+        for index in range(games):
+            game_wall = time.perf_counter()
+            game_cpu = time.thread_time()
+            game_master = await run_one_game(seed + index, base_url, model_names, num_players)
+            log_writer.flush()
+            per_game.append({
+                "wall_ms": (time.perf_counter() - game_wall) * 1000,
+                "cpu_ms": (time.thread_time() - game_cpu) * 1000,
+                "days": game_master.game_state["day"],
+                "phases": collect_phase_times(tracing.tracer.events),
+            })
+            print(f"  第 {index + 1}/{games} 局: {per_game[-1]['wall_ms']:.0f} ms, "
+                  f"{game_master.game_state['day']} 天, 胜者 {game_master.game_state['winner']}")
+    finally:
+        await agent_pool.aclose()
+        server.stop_thread()
+    wall_total = time.perf_counter() - wall_start
+
+    phases = {}
+    for name in PHASES:
+        phases[name] = {
+            "wall_ms": round(sum(g["phases"][name]["wall_ms"] for g in per_game) / games, 2),
+            "cpu_ms": round(sum(g["phases"][name]["cpu_ms"] for g in per_game) / games, 2),
+            "count": round(sum(g["phases"][name]["count"] for g in per_game) / games, 1),
+        }
+
+    return {
+        "meta": {
+            "games": games,
+            "num_players": num_players,
+            "seed": seed,
+            "latency": latency,
+            "tokens_per_second": tokens_per_second,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        "metrics": {
+            "games_per_min": round(games / wall_total * 60, 2),
+            "game_wall_ms": round(sum(g["wall_ms"] for g in per_game) / games, 2),
+            "engine_cpu_ms": round(sum(g["cpu_ms"] for g in per_game) / games, 2),
+            "days_per_game": round(sum(g["days"] for g in per_game) / games, 2),
+            "peak_rss_mb": peak_rss_mb(),
+            "log_bytes": int((log_writer.bytes_written - bytes_before) / games),
+        },
+        "phases": phases,
+        "request_stats": dict(server.stats),
+    }
+
+
+def flatten_metrics(result: Dict) -> Dict[str, float]:
+    """把结果展开为 {"metrics.games_per_min": ..., "phases.night.cpu_ms": ...}，便于逐项对比。"""
+    flat = {f"metrics.{k}": v for k, v in result["metrics"].items() if isinstance(v, (int, float))}
+    for name, values in result["phases"].items():
+        for key in ("wall_ms", "cpu_ms"):
+            flat[f"phases.{name}.{key}"] = values[key]
+    return flat
+
+
+def compare(result: Dict, baseline: Dict, tolerance: float, min_delta_ms: float = 5.0) -> List[str]:
+    """
+    与基线逐项对比，打印对比表并返回退化的指标名称列表。
+
+    Args:
+        tolerance (float): 允许的相对变化，如 0.25 表示 25%
+        min_delta_ms (float): 耗时类指标的绝对变化小于该值时不视为退化，避免小数值的噪声
+    """
+    current, previous = flatten_metrics(result), flatten_metrics(baseline)
+    regressions = []
+    print(f"\n{'指标':<36}{'基线':>12}{'本次':>12}{'变化':>10}")
+    for key in sorted(current):
+        if key not in previous or previous[key] in (None, 0) or current[key] is None:
+            continue
+        old, new = previous[key], current[key]
+        change = (new - old) / old
+        worse = -change if key.split(".")[-1] in HIGHER_IS_BETTER else change
+        regressed = worse > tolerance and not (key.endswith("_ms") and abs(new - old) < min_delta_ms)
+        if regressed:
+            regressions.append(key)
+        flag = "  <-- 退化" if regressed else ""
+        print(f"{key:<36}{old:>12.2f}{new:>12.2f}{change:>+10.1%}{flag}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="狼人杀引擎端到端基准测试")
+    parser.add_argument("--games", type=int, default=5, help="运行的局数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--players", type=int, default=9, help="座位数（9/12/15/18，见 table_setup.py）")
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟的模型延迟（秒）")
+    parser.add_argument("--tps", type=float, default=0, help="模拟的输出速率（token/秒），0 表示一次性输出")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="基线文件路径")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument("--output", help="把本次结果另存为 JSON 文件")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="允许的相对退化比例")
+    parser.add_argument("--memory", action="store_true", help="开启内存增长分析模式（见 mem_profiler.py）")
+    parser.add_argument("--keep-logs", action="store_true", help="把游戏日志写到当前目录的 logs/，默认写到临时目录")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    baseline_path = os.path.abspath(args.baseline)
+    output_path = os.path.abspath(args.output) if args.output else None
+    if not args.keep_logs:
+        os.chdir(tempfile.mkdtemp(prefix="werewolf_bench_"))
+
+    if args.memory:
+        from mem_profiler import memory_profiler
+        memory_profiler.enable()
+        memory_profiler.start()
+
+    print(f"运行 {args.games} 局基准测试（模拟延迟 {args.latency}s）...")
+    result = asyncio.run(run_benchmark(args.games, args.seed, args.latency, args.tps, args.players))
+
+    print(json.dumps(result["metrics"], ensure_ascii=False, indent=2))
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"基线已保存至: {baseline_path}")
+        return
+
+    if not os.path.exists(baseline_path):
+        print(f"未找到基线文件 {baseline_path}，使用 --save-baseline 生成")
+        return
+
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(result, baseline, args.tolerance)
+    if regressions:
+        print(f"\n发现 {len(regressions)} 项性能退化: {', '.join(regressions)}")
+        sys.exit(1)
+    print("\n未发现性能退化")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+# werewolf_game/call_metrics.py
+"""
+模型调用指标统计。
+
+GameMasterAgent._get_silent_reply 的每一次模型调用都会记录一条 CallRecord：
+调用点（发言、投票、狼人讨论、记忆总结…）、座位、模型 key、耗时、
+prompt/completion token、重试次数和结果。记录按模型、阶段、调用点聚合为
+直方图，可在进程内查询，游戏结束时导出为 JSON 和 Prometheus 文本格式。
+
+token 数为本地估算值（见 prompt_budget.count_tokens），因为 agent.reply
+不会返回模型的 usage 信息。
+"""
+import os
+import json
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from game_context import game_local
+
+try:
+    from configs import CALL_METRICS
+except ImportError:
+    CALL_METRICS = {}
+
+try:
+    from configs import MODEL_LIST
+except ImportError:
+    MODEL_LIST = {}
+
+# 默认配置，configs.py 中的 CALL_METRICS 会覆盖同名字段
+DEFAULT_METRICS_CONFIG = {
+    "enabled": True,
+    # 游戏结束时导出 metrics_*.json 和 metrics_*.prom
+    "dump_at_game_end": True,
+    # 每千 token 的价格，按模型 key 配置：{"glm": {"prompt": 0.005, "completion": 0.005}}
+    "prices": {},
+}
+
+# 耗时直方图的分桶上界（秒）
+LATENCY_BUCKETS = [0.5, 1, 2, 5, 10, 20, 30, 60]
+# token 直方图的分桶上界
+TOKEN_BUCKETS = [250, 500, 1000, 2000, 4000, 8000, 16000]
+
+# 调用结果
+OUTCOME_OK = "ok"                  # 正常返回
+OUTCOME_RECOVERED = "recovered"    # 抛出异常，但从异常中提取到了回复
+OUTCOME_ERROR = "error"            # 抛出异常且没有可用回复
+OUTCOME_TIMEOUT = "timeout"        # 调用方超时取消
+
+
+def get_metrics_config() -> Dict:
+    """合并默认配置与 configs.py 中的 CALL_METRICS。"""
+    config = dict(DEFAULT_METRICS_CONFIG)
+    config.update(CALL_METRICS)
+    return config
+
+
+def resolve_model_key(model_name: Optional[str]) -> str:
+    """把模型ID转换为 MODEL_LIST 中的 key，找不到时返回模型ID本身。"""
+    if not model_name:
+        return "unknown"
+    for key, model_id in MODEL_LIST.items():
+        if model_id == model_name:
+            return key
+    return model_name
+
+
+def _bucketize(value: float, edges: List[float]) -> List[int]:
+    """返回累积分桶计数（Prometheus 风格，最后一项为 +Inf）。"""
+    counts = [0] * (len(edges) + 1)
+    for i, edge in enumerate(edges):
+        if value <= edge:
+            counts[i] += 1
+    counts[-1] += 1
+    return counts
+
+
+class _Histogram:
+    """累积直方图，同时记录总和与次数。"""
+
+    def __init__(self, edges: List[float]) -> None:
+        self.edges = edges
+        self.counts = [0] * (len(edges) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, inc in enumerate(_bucketize(value, self.edges)):
+            self.counts[i] += inc
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self) -> Dict:
+        buckets = {str(edge): count for edge, count in zip(self.edges, self.counts)}
+        buckets["+Inf"] = self.counts[-1]
+        return {"buckets": buckets, "sum": round(self.sum, 3), "count": self.count}
+
+
+class CallMetrics:
+    """
+    模型调用指标的收集器。
+
+    进程内查询：
+        call_metrics.records                      # 原始记录列表
+        call_metrics.summary("model")             # 按模型聚合
+        call_metrics.histograms("phase")          # 按阶段的耗时/token 直方图
+    """
+
+    def __init__(self) -> None:
+        self.records: List[Dict] = []
+        self.game_id = ""
+
+    def reset(self, game_id: Optional[str] = None) -> None:
+        self.records = []
+        self.game_id = game_id or ""
+
+    def record(self, call_site: str, seat: str, model_name: Optional[str], phase: str, day: int,
+               latency: float, prompt_tokens: int, completion_tokens: int,
+               retries: int, outcome: str) -> Optional[Dict]:
+        """
+        记录一次模型调用。
+
+        Args:
+            call_site (str): 调用点，如 "speech"、"vote"、"wolf_discussion"
+            seat (str): 玩家名称
+            model_name (str, optional): 模型ID
+            phase (str): 当前阶段
+            day (int): 当前天数
+            latency (float): 耗时（秒），包含重试
+            prompt_tokens (int): prompt 的 token 数
+            completion_tokens (int): 回复的 token 数
+            retries (int): 重试次数
+            outcome (str): 调用结果，见 OUTCOME_* 常量
+        """
+        config = get_metrics_config()
+        if not config.get("enabled"):
+            return None
+        model_key = resolve_model_key(model_name)
+        price = config.get("prices", {}).get(model_key, {})
+        cost = (prompt_tokens * price.get("prompt", 0) + completion_tokens * price.get("completion", 0)) / 1000
+        record = {
+            "ts": round(time.time(), 3),
+            "call_site": call_site,
+            "seat": seat,
+            "model": model_key,
+            "phase": phase,
+            "day": day,
+            "latency": round(latency, 3),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "retries": retries,
+            "outcome": outcome,
+            "cost": round(cost, 6),
+        }
+        self.records.append(record)
+        return record
+
+    def summary(self, group_by: str = "model") -> Dict[str, Dict]:
+        """
+        按字段聚合调用次数、耗时分位数、token 和成本。
+
+        Args:
+            group_by (str): 聚合字段，如 "model"、"phase"、"call_site"、"seat"
+        """
+        groups: Dict[str, List[Dict]] = defaultdict(list)
+        for record in self.records:
+            groups[str(record[group_by])].append(record)
+        result = {}
+        for key in sorted(groups):
+            items = groups[key]
+            latencies = sorted(r["latency"] for r in items)
+            outcomes = defaultdict(int)
+            for r in items:
+                outcomes[r["outcome"]] += 1
+            result[key] = {
+                "calls": len(items),
+                "latency_p50": latencies[len(latencies) // 2],
+                "latency_p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                "latency_max": latencies[-1],
+                "latency_total": round(sum(latencies), 3),
+                "prompt_tokens": sum(r["prompt_tokens"] for r in items),
+                "completion_tokens": sum(r["completion_tokens"] for r in items),
+                "retries": sum(r["retries"] for r in items),
+                "outcomes": dict(outcomes),
+                "cost": round(sum(r["cost"] for r in items), 6),
+            }
+        return result
+
+    def histograms(self, group_by: str = "model") -> Dict[str, Dict]:
+        """按字段分组，返回耗时和 token 的累积直方图。"""
+        groups: Dict[str, Dict[str, _Histogram]] = {}
+        for record in self.records:
+            key = str(record[group_by])
+            if key not in groups:
+                groups[key] = {
+                    "latency": _Histogram(LATENCY_BUCKETS),
+                    "prompt_tokens": _Histogram(TOKEN_BUCKETS),
+                    "completion_tokens": _Histogram(TOKEN_BUCKETS),
+                }
+            groups[key]["latency"].observe(record["latency"])
+            groups[key]["prompt_tokens"].observe(record["prompt_tokens"])
+            groups[key]["completion_tokens"].observe(record["completion_tokens"])
+        return {key: {name: hist.to_dict() for name, hist in hists.items()} for key, hists in sorted(groups.items())}
+
+    def to_json(self) -> Dict:
+        """导出完整的指标快照。"""
+        return {
+            "game_id": self.game_id,
+            "total_calls": len(self.records),
+            "by_model": self.summary("model"),
+            "by_phase": self.summary("phase"),
+            "by_call_site": self.summary("call_site"),
+            "histograms": {
+                "by_model": self.histograms("model"),
+                "by_phase": self.histograms("phase"),
+            },
+            "records": self.records,
+        }
+
+    def to_prometheus(self) -> str:
+        """导出 Prometheus 文本格式（按模型和阶段打标签）。"""
+        lines = []
+        series: Dict[tuple, Dict[str, _Histogram]] = {}
+        counters: Dict[tuple, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        for record in self.records:
+            labels = (record["model"], record["phase"])
+            if labels not in series:
+                series[labels] = {"latency": _Histogram(LATENCY_BUCKETS)}
+            series[labels]["latency"].observe(record["latency"])
+            counter = counters[labels + (record["outcome"],)]
+            counter["calls"] += 1
+            counter["prompt_tokens"] += record["prompt_tokens"]
+            counter["completion_tokens"] += record["completion_tokens"]
+            counter["retries"] += record["retries"]
+            counter["cost"] += record["cost"]
+
+        lines.append("# HELP werewolf_model_call_latency_seconds Model call latency including retries.")
+        lines.append("# TYPE werewolf_model_call_latency_seconds histogram")
+        for (model, phase), hists in sorted(series.items()):
+            hist = hists["latency"]
+            base = f'model="{model}",phase="{phase}"'
+            for edge, count in zip(hist.edges, hist.counts):
+                lines.append(f'werewolf_model_call_latency_seconds_bucket{{{base},le="{edge}"}} {count}')
+            lines.append(f'werewolf_model_call_latency_seconds_bucket{{{base},le="+Inf"}} {hist.counts[-1]}')
+            lines.append(f"werewolf_model_call_latency_seconds_sum{{{base}}} {round(hist.sum, 3)}")
+            lines.append(f"werewolf_model_call_latency_seconds_count{{{base}}} {hist.count}")
+
+        for name, help_text in [
+            ("calls", "Model calls by outcome."),
+            ("prompt_tokens", "Estimated prompt tokens."),
+            ("completion_tokens", "Estimated completion tokens."),
+            ("retries", "Retries after failed calls."),
+            ("cost", "Estimated cost from CALL_METRICS prices."),
+        ]:
+            metric = f"werewolf_model_{name}_total"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for (model, phase, outcome), values in sorted(counters.items()):
+                value = values[name]
+                value = round(value, 6) if name == "cost" else int(value)
+                lines.append(f'{metric}{{model="{model}",phase="{phase}",outcome="{outcome}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def report(self) -> str:
+        """生成写入 game_log 的可读摘要。"""
+        if not self.records:
+            return "[模型调用统计]: 暂无记录"
+        lines = ["[模型调用统计]"]
+        for group_by, title in [("model", "按模型"), ("phase", "按阶段")]:
+            lines.append(f"{title}:")
+            for key, stats in self.summary(group_by).items():
+                lines.append(
+                    f"- {key}: 调用 {stats['calls']} 次, p50={stats['latency_p50']}s, "
+                    f"p95={stats['latency_p95']}s, 总耗时 {stats['latency_total']}s, "
+                    f"token {stats['prompt_tokens']}+{stats['completion_tokens']}, "
+                    f"重试 {stats['retries']} 次, 结果 {stats['outcomes']}"
+                )
+        return "\n".join(lines)
+
+    def dump(self, log_dir: str = "logs") -> List[str]:
+        """
+        把指标写入 metrics_{game_id}.json 和 metrics_{game_id}.prom，返回写入的文件路径。
+        文件已存在时（从检查点恢复的对局）合并原有的调用记录，而不是覆盖。
+        """
+        os.makedirs(log_dir, exist_ok=True)
+        suffix = self.game_id or time.strftime("%Y%m%d_%H%M%S")
+        json_path = os.path.join(log_dir, f"metrics_{suffix}.json")
+        prom_path = os.path.join(log_dir, f"metrics_{suffix}.prom")
+        merged = self
+        if self.game_id and os.path.exists(json_path):
+            try:
+                with open(json_path, encoding="utf-8") as f:
+                    previous = json.load(f)["records"]
+            except (OSError, ValueError, KeyError) as e:
+                print(f"[调用指标] 读取原有指标失败，将覆盖: {json_path} - {e}")
+                previous = []
+            merged = CallMetrics()
+            merged.reset(self.game_id)
+            merged.records = previous + self.records
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(merged.to_json(), f, ensure_ascii=False, indent=2)
+        with open(prom_path, "w", encoding="utf-8") as f:
+            f.write(merged.to_prometheus())
+        return [json_path, prom_path]
+
+
+# 创建一个全局的统计实例，方便在其他模块中导入和使用
+call_metrics = game_local(CallMetrics)
@@ -0,0 +1,111 @@
+# werewolf_game/checkpoint.py
+"""
+游戏检查点：每个阶段（夜晚、白天发言、投票）开始前把整局状态写入
+checkpoints/checkpoint_<game_id>.json，进程中断后可以从最近的检查点继续：
+
+    python main.py --resume                # 从最近的检查点继续
+    python main.py --resume <检查点路径>
+
+保存的内容：游戏状态（存活情况、历史记录、记忆摘要、药剂、夜晚信息）、
+每个AI玩家的对话记忆和当前使用的模型、本局的随机种子和随机数状态，以及本局的日志文件名
+（恢复后继续追加到同一份游戏日志和事件日志）。不保存 API Key，
+恢复时按 base_url 在 API_PROVIDERS 中找回对应的服务商。
+
+写入是原子的：先写同目录下的临时文件，再用 os.replace 替换，
+进程在任何时刻被杀都只会留下完整的旧检查点或新检查点。
+"""
+import os
+import json
+import glob
+import random
+from typing import Any, Dict, List, Optional
+
+try:
+    from configs import CHECKPOINT
+except ImportError:
+    CHECKPOINT = {}
+
+# 默认配置，configs.py 中的 CHECKPOINT 会覆盖同名字段
+DEFAULT_CHECKPOINT_CONFIG = {
+    "enabled": True,
+    "dir": "checkpoints",
+    # 游戏正常结束后是否保留检查点
+    "keep_after_game": False,
+    # 每次写入后是否 fsync（断电也不丢最新的检查点，但每个阶段多几毫秒）
+    "fsync": False,
+}
+
+CHECKPOINT_VERSION = 1
+
+# 检查点之间的阶段顺序
+PHASE_ORDER = ("NIGHT", "DAY_DISCUSSION", "VOTE")
+
+
+def get_checkpoint_config() -> Dict:
+    """合并默认配置与 configs.py 中的 CHECKPOINT。"""
+    config = dict(DEFAULT_CHECKPOINT_CONFIG)
+    config.update(CHECKPOINT)
+    return config
+
+
+def checkpoint_path(game_id: str) -> str:
+    """某局游戏的检查点文件路径。"""
+    return os.path.join(get_checkpoint_config()["dir"], f"checkpoint_{game_id}.json")
+
+
+def rng_state(rng: random.Random) -> List[Any]:
+    """把本局随机数生成器的状态转换为可 JSON 序列化的列表。"""
+    version, internal, gauss = rng.getstate()
+    return [version, list(internal), gauss]
+
+
+def restore_rng_state(state: List[Any], rng: random.Random) -> None:
+    version, internal, gauss = state
+    rng.setstate((version, tuple(internal), gauss))
+
+
+def write_checkpoint(path: str, data: Dict, fsync: bool = False) -> int:
+    """
+    原子地写入检查点，返回写入的字节数。
+
+    Args:
+        path (str): 检查点文件路径
+        data (Dict): 检查点内容
+        fsync (bool): 替换前是否把临时文件同步到磁盘
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(payload)
+
+
+def read_checkpoint(path: str) -> Dict:
+    """读取检查点；版本不兼容时抛出 ValueError。"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"不支持的检查点版本: {data.get('version')}（当前为 {CHECKPOINT_VERSION}）")
+    return data
+
+
+def latest_checkpoint(directory: Optional[str] = None) -> Optional[str]:
+    """返回目录中最近写入的检查点路径；没有时返回 None。"""
+    directory = directory or get_checkpoint_config()["dir"]
+    paths = glob.glob(os.path.join(directory, "checkpoint_*.json"))
+    return max(paths, key=os.path.getmtime) if paths else None
+
+
+def remove_checkpoint(path: str) -> None:
+    """删除检查点（游戏正常结束后调用）。"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -18,6 +18,12 @@ API_PROVIDERS = {
     "another_provider": {
         "api_key": "YOUR_OTHER_API_KEY",
         "base_url": "https://api.another-provider.com/v1"
+    },
+    # 本地模拟服务器（python mock_server.py），用于离线压测；
+    # 把 modelscope 的 base_url 也改成这个地址即可让裁判和摘要模型一起走本地
+    "mock": {
+        "api_key": "mock",
+        "base_url": "http://127.0.0.1:8765/v1"
     }
 }
 
@@ -92,6 +98,245 @@ AGENT_CONFIG = [
     }
 ]
 
+# ====================================
+# 大桌配置：设置 num_players（9/12/15/18）后按角色预设自动生成 GAME_SETUP 和 AGENT_CONFIG，
+# AI 玩家轮流分配到 models 中的模型（None 表示 MODEL_LIST 中的全部模型）
+# num_players 为 None 时使用上面手写的配置
+# ====================================
+TABLE_SETUP = {
+    "num_players": None,
+    "models": None,
+    "provider": "modelscope",
+}
+
+# ====================================
+# Prompt 长度预算（按调用点，单位：token）
+# 超出预算时：先压缩较早的发言记录，再截断记忆摘要和私密信息
+# ====================================
+PROMPT_BUDGET = {
+    "enabled": True,
+    "budgets": {
+        "speech": 6000,      # 白天发言
+        "vote": 4000,        # 投票
+        "last_words": 4000,  # 遗言
+    },
+    "model_budgets": {},     # 按模型 key 设置上限，例如 {"MiMo": 3000}
+    "keep_recent": 6,        # 完整保留的最新发言条数
+    "compress_chars": 60,    # 较早发言压缩后保留的字符数
+    "memory_messages": 24,   # AI 玩家对话记忆保留的最近消息条数（每次调用都会整体发送），None 不限制
+}
+
+# ====================================
+# 模型生成 token 预算
+# max_tokens: 每种决策的生成上限；per_seat / per_game / per_model: 整局累计预算（None 表示不限制）
+# 用量超过 brief_ratio 后缩短输出，用完后切换到 fallback_model（MODEL_LIST 中的 key）
+# ====================================
+TOKEN_BUDGET = {
+    "enabled": True,
+    "max_tokens": {
+        "vote": 256,
+        "witch_save": 128,
+        "witch_poison": 256,
+        "seer_check": 256,
+        "hunter_shot": 256,
+        "wolf_kill": 512,
+        "wolf_discussion": 768,
+        "speech": 1024,
+        "last_words": 768,
+        "summary": 1024,
+    },
+    # 按模型覆盖生成上限；推理模型先输出很长的思考过程，None 表示不限制，避免在 <think> 中途被截断
+    "model_max_tokens": {
+        "dsR1": None,
+        # "qwen": {"speech": 512},
+    },
+    "per_seat": None,
+    "per_game": None,
+    "per_model": {
+        # "dsR1": 150000,
+    },
+    "brief_ratio": 0.8,
+    "fallback_model": "MiMo",
+}
+
+# ====================================
+# 结构化决策模式：投票、击杀、查验、用药、开枪要求模型按 JSON Schema 回复并在本地校验
+# mode: "json_schema"（按 schema 约束生成）或 "json_object"（只要求 JSON，兼容更多服务商）
+# models: 使用结构化输出的模型 key，None 表示全部尝试；服务商不支持时自动回退到自由文本解析
+# ====================================
+STRUCTURED_OUTPUT = {
+    "enabled": False,
+    "mode": "json_schema",
+    "models": None,
+}
+
+# ====================================
+# 日志写入：后台线程批量写入，避免阻塞游戏流程
+# ====================================
+LOG_WRITER = {
+    "enabled": True,            # 关闭后退回逐条同步写入
+    "max_queue": 10000,         # 队列上限（条）
+    "overflow": "drop",         # 队列写满时："drop" 丢弃并计数（不阻塞事件循环），"block" 调用方等待
+    "flush_interval": 0.5,      # 批量写入的时间间隔（秒）
+    "max_batch_bytes": 262144,  # 单批累计达到该字节数时立即写入
+}
+
+# ====================================
+# 结构化事件日志（logs/events_*.jsonl，每行一个 JSON 事件）
+# 游戏结束后压缩已关闭的日志文件，并按大小/时间轮转 logs/ 目录
+# ====================================
+EVENT_LOG = {
+    "enabled": True,
+    "compression": "gzip",       # "gzip" / "zstd"（需安装 zstandard）/ None 表示不压缩
+    "compress_text_logs": False, # 同时压缩以往游戏的 .txt 日志
+    "compress_grace_seconds": 3600,  # 最近修改过的文件不压缩（其他进程可能仍在写入）
+    "max_total_mb": 1024,        # 压缩文件总大小上限，超出时删除最旧的
+    "max_age_days": 30,          # 压缩文件最长保留天数
+}
+
+# ====================================
+# Prompt 日志存储方式
+# "dedup": 差分 + 内容寻址去重存储（默认），用 prompt_reader.py 还原完整 prompt
+# "text":  旧版纯文本格式，每条 prompt 完整写入
+# ====================================
+PROMPT_LOG = {
+    "mode": "dedup",
+}
+
+# ====================================
+# 模型调用指标
+# 每次模型调用记录耗时、token、重试和结果，游戏结束时导出
+# logs/metrics_*.json 和 logs/metrics_*.prom（Prometheus 文本格式）
+# ====================================
+CALL_METRICS = {
+    "enabled": True,
+    "dump_at_game_end": True,
+    # 每千 token 的价格（按 MODEL_LIST 中的 key），用于估算成本
+    "prices": {
+        # "glm": {"prompt": 0.005, "completion": 0.005},
+    },
+}
+
+# ====================================
+# 阶段追踪
+# 开启后为每个阶段、子步骤和模型调用记录 span，游戏结束时导出
+# logs/trace_*.json（Chrome trace 格式），可在 chrome://tracing 或 ui.perfetto.dev 打开
+# ====================================
+TRACING = {
+    "enabled": False,
+    "export_at_game_end": True,
+}
+
+# ====================================
+# 内存增长分析（排查长时间运行的进程内存增长，会明显拖慢游戏）
+# 开启后在每天开始和每局结束时拍摄 tracemalloc 快照，报告写入 logs/memory_profile_*.txt
+# ====================================
+MEMORY_PROFILE = {
+    "enabled": False,
+    "top_n": 15,          # 报告中列出的分配位置数量
+    "growth_games": 5,    # 连续多少局持续增长时给出警告
+}
+
+# ====================================
+# 本地模拟服务器（mock_server.py）
+# 完整字段见 mock_server.DEFAULT_MOCK_CONFIG
+# ====================================
+MOCK_SERVER = {
+    "port": 8765,
+    "seed": 0,
+    "latency": {"dist": "lognormal", "median": 0.8, "sigma": 0.4},
+    "tokens_per_second": 60,
+    "think_ratio": 0.3,
+    "faults": {
+        "rate_limit": 0.0,
+        "timeout": 0.0,
+        "malformed": 0.0,
+    },
+}
+
+# ====================================
+# 人类输入与AI调用重叠：投票时人类玩家的提示立即显示，与AI投票同时收集；
+# 夜晚预言家查验与狼人行动同时进行。人类思考时间与模型延迟重叠，而不是相加
+# ====================================
+INPUT_OVERLAP = {
+    "enabled": False,
+    "vote": True,
+    "night": True,
+}
+
+# ====================================
+# 多桌游戏服务器（python game_server.py）：每个连接的玩家开一张人机对局的桌子，
+# 所有桌子在同一个事件循环中运行；人类输入超时或掉线时自动回复 timeout_reply
+# ====================================
+GAME_SERVER = {
+    "host": "127.0.0.1",
+    "port": 8770,
+    "max_tables": 32,
+    "input_timeout": 120.0,
+    "timeout_reply": "弃票",
+}
+
+# ====================================
+# 检查点：每个阶段开始前把整局状态写入 dir，进程中断后用
+# python main.py --resume [检查点路径] 继续（不保存 API Key）
+# ====================================
+CHECKPOINT = {
+    "enabled": True,
+    "dir": "checkpoints",
+    "keep_after_game": False,  # 游戏正常结束后是否保留检查点
+    "fsync": False,            # 每次写入后 fsync（断电也不丢，但每个阶段多几毫秒）
+}
+
+# ====================================
+# 反事实分支（python counterfactual.py <检查点> --override vote_out=Player_3）：
+# 从检查点分叉出多个分支，替换某个决定后并发跑完，统计结局分布
+# ====================================
+COUNTERFACTUAL = {
+    "branches": 4,
+    "max_concurrency": 8,   # 同时运行的最大分支数
+    "quiet": True,          # 隐藏各分支的控制台输出（日志文件照常写入）
+}
+
+# ====================================
+# 开局模型探测：第一晚之前并发探测本局用到的每个模型（座位、裁判、摘要），
+# 预热首次调用、测量基线延迟，把座位从限流/报错/超时的模型换到健康的模型
+# ====================================
+MODEL_PROBE = {
+    "enabled": True,
+    "timeout": 20.0,        # 单个模型的探测超时（秒）
+    "max_latency": None,    # 基线延迟超过该值（秒）视为不健康；None 表示不按延迟判断
+    "reassign": True,       # 把不健康模型上的座位换到健康的模型
+}
+
+# ====================================
+# Agent 与客户端复用：游戏结束后收回AI玩家，下一局原地重置（清空记忆、换角色提示），
+# 同一服务地址的模型共用一个 HTTP 客户端（连接池），连续多局不再重复创建
+# ====================================
+AGENT_POOL = {
+    "enabled": True,
+    "max_idle": 64,         # 最多保留的空闲 Agent 数
+}
+
+# ====================================
+# 模型评分（python ratings.py show / run）：每局结束后增量更新每个模型、每个（模型, 角色）的
+# TrueSkill 评分（保存在 logs/ratings.db），批量评测在置信区间足够窄时提前停止
+# ====================================
+RATINGS = {
+    "enabled": True,
+    "confidence": 0.95,         # 置信区间的置信度
+    "min_games": 10,            # 提前停止：每个评分至少参与的局数
+    "target_half_width": 2.0,   # 提前停止：所有置信区间半宽不超过该值（初始评分 25 ± 8.3）
+    "stop_on_separation": True, # 提前停止：第一名的区间下界高于其余所有评分的上界
+}
+
+# ====================================
+# 随机种子（python main.py --seed 42）：每局使用自己的随机数生成器（分配角色、429 换模型、
+# 裁判随机选人），种子写入日志和检查点；为 None 时每局随机，设置后整串对局都可以复现
+# ====================================
+SEEDING = {
+    "seed": None,
+}
+
 # ====================================
 """
 1. 复制本文件并重命名为 configs.py
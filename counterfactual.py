@@ -0,0 +1,213 @@
+# werewolf_game/counterfactual.py
+"""
+反事实分支：从检查点分叉出 K 个独立的分支，在分支中替换某个决定后并发跑完，
+统计结局分布。例如"如果女巫当晚救了人"或"如果 Player_3 被投出"：
+
+    python counterfactual.py checkpoints/checkpoint_<game_id>.json --branches 8 --override witch_save=true
+    python counterfactual.py <检查点> --override vote_out=Player_3
+    python counterfactual.py <检查点>                      # 不替换决定，作为对照组
+
+分支点之前的模型调用全部复用（检查点中保存了所有 AI 的对话记忆和记忆摘要），
+只有分支点之后的部分需要重新调用模型，不需要从头重放整局。
+内存中的游戏可以用 game_master.snapshot(next_phase) 得到同样的检查点字典。
+
+可替换的决定（在分支点之后第一次出现时替换一次）：
+    wolf_kill=<玩家>       狼人击杀目标
+    witch_save=true|false  女巫是否使用解药
+    witch_poison=<玩家>|none  女巫毒药目标
+    vote_out=<玩家>|none   本轮被投票出局的玩家
+
+各分支在自己的桌子上下文中运行（见 game_context.py），日志、调用指标和控制台输出互不干扰；
+检查点中的人类座位在分支中由 AI（裁判模型）代替。
+"""
+import io
+import copy
+import time
+import asyncio
+import argparse
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from checkpoint import read_checkpoint, latest_checkpoint
+from game_context import table_scope
+from seeding import derive_seed
+
+try:
+    from configs import COUNTERFACTUAL
+except ImportError:
+    COUNTERFACTUAL = {}
+
+# 默认配置，configs.py 中的 COUNTERFACTUAL 会覆盖同名字段
+DEFAULT_COUNTERFACTUAL_CONFIG = {
+    "branches": 4,
+    # 同时运行的最大分支数
+    "max_concurrency": 8,
+    # 是否隐藏各分支的控制台输出（日志文件照常写入）
+    "quiet": True,
+}
+
+OVERRIDE_KINDS = ("wolf_kill", "witch_save", "witch_poison", "vote_out")
+
+
+def get_counterfactual_config() -> Dict:
+    """合并默认配置与 configs.py 中的 COUNTERFACTUAL。"""
+    config = dict(DEFAULT_COUNTERFACTUAL_CONFIG)
+    config.update(COUNTERFACTUAL)
+    return config
+
+
+def parse_override(text: str) -> Tuple[str, Any]:
+    """
+    解析命令行中的 "类型=值"，如 "witch_save=true"、"vote_out=Player_3"、"witch_poison=none"。
+
+    Raises:
+        ValueError: 类型未知或格式错误
+    """
+    kind, sep, value = text.partition("=")
+    kind, value = kind.strip(), value.strip()
+    if not sep or kind not in OVERRIDE_KINDS:
+        raise ValueError(f"无效的决定覆盖: {text}（可选类型: {', '.join(OVERRIDE_KINDS)}）")
+    if kind == "witch_save":
+        return kind, value.lower() in ("true", "yes", "y", "1")
+    return kind, None if value.lower() in ("", "none") else value
+
+
+async def run_branch(checkpoint: Dict, index: int, overrides: Dict[str, Any], quiet: bool = True,
+                     fork_id: str = "") -> Dict:
+    """
+    在独立的桌子上下文中从检查点跑完一个分支。
+
+    Args:
+        fork_id (str): 本次分叉的标识，用于区分多次分叉同一检查点时各分支的事件日志
+
+    Returns:
+        Dict: {"branch", "seed", "winner", "days", "alive", "calls", "wall_ms", "unused_overrides"}
+    """
+    from main import restore_game, release_players
+    from call_metrics import call_metrics
+
+    data = copy.deepcopy(checkpoint)
+    # 分支序号紧跟分叉时间戳（log_index.py 据此识别并默认跳过分支日志），后接原对局 ID
+    data["game_id"] = f"{fork_id}b{index}_{checkpoint['game_id']}"
+    data["logs"] = {}  # 分支写入自己的游戏日志，不追加到原来的日志
+    started = time.perf_counter()
+    with table_scope(f"b{index}", output=io.StringIO() if quiet else None):
+        # 创建模型客户端较慢，放到线程中，不阻塞其他分支
+        game_master = await asyncio.to_thread(restore_game, data)
+        game_master.checkpoint_path = None  # 分支不保存检查点
+        game_master.decision_overrides = dict(overrides)
+        game_master.record_ratings = False  # 分支不是真实对局，不计入模型评分
+        # 从检查点恢复的随机数状态各分支都相同，按分支序号重新播种
+        game_master.reseed(derive_seed(checkpoint.get("seed", checkpoint["game_id"]), "branch", index))
+        try:
+            await game_master.run_game()
+        finally:
+            release_players(game_master)
+        calls = len(call_metrics.records)
+    return {
+        "branch": index,
+        "seed": game_master.seed,
+        "winner": game_master.game_state["winner"],
+        "days": game_master.game_state["day"],
+        "alive": [name for name, data in game_master.game_state["players"].items() if data["status"] == "alive"],
+        "calls": calls,
+        "wall_ms": round((time.perf_counter() - started) * 1000, 1),
+        # 分支结束前都没有出现的决定（如女巫已死），这些分支实际上没有被替换
+        "unused_overrides": sorted(game_master.decision_overrides),
+    }
+
+
+async def run_counterfactual(source: Union[str, Dict], overrides: Optional[Dict[str, Any]] = None,
+                             branches: Optional[int] = None, config: Optional[Dict] = None) -> Dict:
+    """
+    从检查点分叉出若干分支并发跑完，返回结局分布。
+
+    Args:
+        source (Union[str, Dict]): 检查点路径，或检查点字典（如 game_master.snapshot("VOTE")）
+        overrides (Dict[str, Any], optional): 分支中替换的决定，见 OVERRIDE_KINDS
+        branches (int, optional): 分支数，默认取配置
+        config (Dict, optional): 覆盖 COUNTERFACTUAL 配置
+
+    Returns:
+        Dict: {"source", "overrides", "branches": [每个分支的结果], "winners": {阵营: 分支数}}
+    """
+    config = config or get_counterfactual_config()
+    checkpoint = read_checkpoint(source) if isinstance(source, str) else source
+    overrides = dict(overrides or {})
+    branches = branches or config["branches"]
+    semaphore = asyncio.Semaphore(max(1, config["max_concurrency"]))
+    fork_id = time.strftime("%Y%m%d_%H%M%S_")
+
+    async def limited(index: int) -> Dict:
+        async with semaphore:
+            return await run_branch(checkpoint, index, overrides, quiet=config["quiet"], fork_id=fork_id)
+
+    results = await asyncio.gather(*(limited(index) for index in range(branches)), return_exceptions=True)
+    finished = []
+    for index, result in enumerate(results):
+        if isinstance(result, Exception):
+            print(f"[反事实分支] 分支 {index} 出错: {result}")
+            continue
+        finished.append(result)
+    return {
+        "source": {"game_id": checkpoint["game_id"], "day": checkpoint["game_state"]["day"],
+                   "next_phase": checkpoint["next_phase"]},
+        "overrides": overrides,
+        "branches": finished,
+        "winners": dict(Counter(result["winner"] for result in finished)),
+    }
+
+
+async def _run_and_close(path: str, overrides: Dict[str, Any], branches: Optional[int], config: Dict) -> Dict:
+    """命令行入口：跑完后在事件循环结束前关闭 Agent 池的 HTTP 连接。"""
+    from agents.agent_pool import agent_pool
+    try:
+        return await run_counterfactual(path, overrides, branches, config)
+    finally:
+        await agent_pool.aclose()
+
+
+def format_report(report: Dict) -> str:
+    """把 run_counterfactual 的结果格式化为文本。"""
+    source = report["source"]
+    total = len(report["branches"])
+    overrides = ", ".join(f"{kind}={value}" for kind, value in report["overrides"].items()) or "无（对照组）"
+    lines = [
+        f"反事实分支：{source['game_id']} 第 {source['day']} 天 {source['next_phase']} 之前分叉，替换决定: {overrides}",
+        f"完成分支: {total}",
+    ]
+    for winner, count in sorted(report["winners"].items(), key=lambda item: -item[1]):
+        lines.append(f"  {winner}: {count} ({count / total:.0%})")
+    for result in report["branches"]:
+        note = f"，未触发: {', '.join(result['unused_overrides'])}" if result["unused_overrides"] else ""
+        lines.append(f"  分支 {result['branch']}（种子 {result['seed']}）: {result['winner']}，{result['days']} 天，"
+                     f"{result['calls']} 次调用，{result['wall_ms']:.0f} ms{note}")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="从检查点分叉反事实分支")
+    parser.add_argument("checkpoint", nargs="?", help="检查点路径（默认使用最近的检查点）")
+    parser.add_argument("--branches", type=int, help="分支数")
+    parser.add_argument("--override", action="append", default=[], metavar="KIND=VALUE",
+                        help=f"替换的决定，可重复（{', '.join(OVERRIDE_KINDS)}）")
+    parser.add_argument("--verbose", action="store_true", help="显示各分支的控制台输出")
+    args = parser.parse_args()
+
+    path = args.checkpoint or latest_checkpoint()
+    if path is None:
+        parser.error("没有找到检查点")
+    try:
+        overrides = dict(parse_override(text) for text in args.override)
+    except ValueError as e:
+        parser.error(str(e))
+
+    config = get_counterfactual_config()
+    if args.verbose:
+        config["quiet"] = False
+    report = asyncio.run(_run_and_close(path, overrides, args.branches, config))
+    print(format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# werewolf_game/game_client.py
+"""
+游戏服务器（game_server.py）的终端客户端：连接后自动开一张桌子，
+在终端中显示桌上的输出，需要输入时读取一行发送给服务器。
+
+运行：python game_client.py [--host 127.0.0.1] [--port 8770]
+"""
+import sys
+import json
+import asyncio
+import argparse
+
+from game_server import get_game_server_config
+
+
+async def play(host: str, port: int) -> None:
+    reader, writer = await asyncio.open_connection(host, port)
+    input_task = None
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        message = json.loads(line)
+        kind, text = message.get("type"), message.get("text", "")
+        if kind == "welcome":
+            print(f"已连接，桌号 {message['table']}，每次输入限时 {message['timeout']:.0f} 秒。")
+        elif kind == "output":
+            print(text)
+        elif kind == "private":
+            print(f"\n[私密提示]: {text}")
+        elif kind == "prompt":
+            print(f"\n{text}")
+            if input_task is not None:
+                input_task.cancel()
+            input_task = asyncio.create_task(_send_input(writer))
+        elif kind == "game_over":
+            print(f"\n游戏结束，胜利者: {message.get('winner')}")
+        else:
+            print(f"[{kind}]: {text}")
+        sys.stdout.flush()
+    writer.close()
+
+
+async def _send_input(writer: asyncio.StreamWriter) -> None:
+    user_input = await asyncio.to_thread(input, "User Input: ")
+    writer.write((json.dumps({"type": "input", "text": user_input}, ensure_ascii=False) + "\n").encode("utf-8"))
+    await writer.drain()
+
+
+if __name__ == "__main__":
+    config = get_game_server_config()
+    parser = argparse.ArgumentParser(description="狼人杀游戏服务器客户端")
+    parser.add_argument("--host", default=config["host"])
+    parser.add_argument("--port", type=int, default=config["port"])
+    args = parser.parse_args()
+    try:
+        asyncio.run(play(args.host, args.port))
+    except (ConnectionError, KeyboardInterrupt):
+        print("\n连接已断开。")
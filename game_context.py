@@ -0,0 +1,157 @@
+# werewolf_game/game_context.py
+"""
+按桌隔离的游戏运行上下文。
+
+引擎中的日志记录器、调用指标、token 预算、追踪器等都是模块级的全局实例，
+单局游戏（main.py、benchmark.py）时一次只有一局在用它们；游戏服务器在同一个
+事件循环中同时运行多张桌子，这些实例和控制台输出都需要按桌隔离：
+
+- game_local(Factory)：创建一个全局实例的代理。在某张桌子的上下文中访问时，
+  转发给这张桌子自己的实例（首次访问时创建）；不在任何桌子中时转发给默认实例，
+  因此单局模式的行为不变
+- table_scope(table_id, output)：在当前 Task 中进入一张桌子，之后创建的子 Task
+  （asyncio.gather、asyncio.to_thread 等）都继承这张桌子
+- print 输出按桌路由：桌子中的输出写入该桌的 output（如人类玩家的连接），
+  capture_output() 只收集当前 Task 的输出，不会像 contextlib.redirect_stdout
+  那样替换整个进程的 sys.stdout
+"""
+import io
+import sys
+import contextlib
+import contextvars
+from typing import Any, Callable, Dict, Iterator, List, Optional, TextIO
+
+_current_table: contextvars.ContextVar = contextvars.ContextVar("werewolf_table", default=None)
+_current_capture: contextvars.ContextVar = contextvars.ContextVar("werewolf_capture", default=None)
+
+# 正在运行的桌子（用于日志轮转时避开其他桌子仍在写入的文件）
+_live_tables: Dict[str, "TableScope"] = {}
+
+
+class TableScope:
+    """一张桌子的上下文：桌号、控制台输出去向，以及各全局实例在这张桌子上的副本。"""
+
+    def __init__(self, table_id: str, output: Optional[TextIO] = None) -> None:
+        self.table_id = table_id
+        self.output = output
+        self.instances: Dict["GameLocal", Any] = {}
+
+
+class GameLocal:
+    """
+    按桌隔离的全局实例代理，属性访问转发给当前桌子的实例。
+
+    用法（在定义全局实例的模块中）：
+        game_logger = game_local(GameLogger)
+    """
+
+    __slots__ = ("_factory", "_default")
+
+    def __init__(self, factory: Callable[[], Any]) -> None:
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_default", factory())
+
+    def _target(self) -> Any:
+        table = _current_table.get()
+        if table is None:
+            return self._default
+        instance = table.instances.get(self)
+        if instance is None:
+            instance = table.instances[self] = self._factory()
+        return instance
+
+    def all_instances(self) -> List[Any]:
+        """默认实例以及所有运行中桌子上已创建的实例。"""
+        return [self._default] + [table.instances[self] for table in list(_live_tables.values())
+                                  if self in table.instances]
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._target(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._target(), name, value)
+
+    def __repr__(self) -> str:
+        return f"<game_local {self._target()!r}>"
+
+
+def game_local(factory: Callable[[], Any]) -> GameLocal:
+    """创建一个按桌隔离的全局实例。"""
+    return GameLocal(factory)
+
+
+def current_table() -> Optional[TableScope]:
+    """返回当前上下文所在的桌子；单局模式下为 None。"""
+    return _current_table.get()
+
+
+def log_suffix() -> str:
+    """日志文件名后缀：桌子中为 "_<桌号>"，避免同一秒开局的多张桌子写入同一个文件。"""
+    table = _current_table.get()
+    return f"_{table.table_id}" if table is not None else ""
+
+
+@contextlib.contextmanager
+def table_scope(table_id: str, output: Optional[TextIO] = None) -> Iterator[TableScope]:
+    """
+    在当前 Task 中进入一张桌子（应在该桌游戏 Task 的开头使用）。
+
+    Args:
+        table_id (str): 桌号，用于日志文件名
+        output (TextIO, optional): 这张桌子的控制台输出去向；为空时输出到进程的标准输出
+    """
+    install_output_router()
+    table = TableScope(table_id, output)
+    token = _current_table.set(table)
+    _live_tables[table_id] = table
+    try:
+        yield table
+    finally:
+        _live_tables.pop(table_id, None)
+        _current_table.reset(token)
+
+
+class _RoutedStream:
+    """替换 sys.stdout / sys.stderr，按当前上下文把输出写到捕获缓冲区、桌子输出或原始流。"""
+
+    def __init__(self, stream: TextIO) -> None:
+        self._stream = stream
+
+    def _target(self) -> TextIO:
+        capture = _current_capture.get()
+        if capture is not None:
+            return capture
+        table = _current_table.get()
+        if table is not None and table.output is not None:
+            return table.output
+        return self._stream
+
+    def write(self, text: str) -> int:
+        self._target().write(text)
+        return len(text)
+
+    def flush(self) -> None:
+        self._target().flush()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._stream, name)
+
+
+def install_output_router() -> None:
+    """把 sys.stdout / sys.stderr 换成按上下文路由的流（只安装一次）。"""
+    if not isinstance(sys.stdout, _RoutedStream):
+        sys.stdout = _RoutedStream(sys.stdout)
+    if not isinstance(sys.stderr, _RoutedStream):
+        sys.stderr = _RoutedStream(sys.stderr)
+
+
+@contextlib.contextmanager
+def capture_output() -> Iterator[io.StringIO]:
+    """收集当前 Task（及其子 Task）的 print 输出，不影响其他并发的 Task 和桌子。"""
+    install_output_router()
+    buffer = io.StringIO()
+    token = _current_capture.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _current_capture.reset(token)
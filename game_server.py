@@ -0,0 +1,266 @@
+# werewolf_game/game_server.py
+"""
+本地多桌游戏服务器：在同一个事件循环中同时运行多张人机对局的桌子。
+
+每个人类玩家通过 TCP 连接到服务器，服务器为其开一张新桌子（1 名人类 + AI 玩家）。
+人类座位是 RemoteUserAgent：等待输入时只挂起一个 Future，不占用线程，
+每次决策都有超时，超时或掉线后自动回复 timeout_reply，桌子不会卡住。
+各桌的日志、调用指标、token 预算和控制台输出按桌隔离（见 game_context.py）。
+
+协议（每行一个 UTF-8 JSON 对象）：
+    服务器 -> 客户端
+        {"type": "welcome", "table": "t1", "timeout": 120}
+        {"type": "output", "text": "..."}             桌上的公开输出（与终端模式看到的一致）
+        {"type": "private", "text": "..."}            私密提示
+        {"type": "prompt", "text": "...", "timeout": 120}  需要玩家输入
+        {"type": "notice", "text": "..."}             提示（如输入超时、当前不需要输入）
+        {"type": "game_over", "winner": "..."}
+        {"type": "error", "text": "..."}
+    客户端 -> 服务器
+        {"type": "input", "text": "Player_3"}
+        也可以直接发送一行纯文本（便于用 nc 调试）
+
+运行：
+    python game_server.py [--host 127.0.0.1] [--port 8770]
+    python game_client.py [--host 127.0.0.1] [--port 8770]
+"""
+import json
+import asyncio
+import argparse
+from typing import Dict, Optional
+
+from game_context import table_scope
+from logger import log_writer
+
+try:
+    from configs import GAME_SERVER
+except ImportError:
+    GAME_SERVER = {}
+
+# 默认配置，configs.py 中的 GAME_SERVER 会覆盖同名字段
+DEFAULT_GAME_SERVER_CONFIG = {
+    "host": "127.0.0.1",
+    "port": 8770,
+    # 同时运行的最大桌数，超出时拒绝新连接
+    "max_tables": 32,
+    # 每次等待人类输入的超时（秒）
+    "input_timeout": 120.0,
+    # 超时或掉线时代替玩家回复的内容；投票、开枪、用药等决策都会视为放弃
+    "timeout_reply": "弃票",
+}
+
+
+def get_game_server_config() -> Dict:
+    """合并默认配置与 configs.py 中的 GAME_SERVER。"""
+    config = dict(DEFAULT_GAME_SERVER_CONFIG)
+    config.update(GAME_SERVER)
+    return config
+
+
+class HumanSeat:
+    """
+    一个人类座位的连接。
+
+    同时作为这张桌子的控制台输出流：桌子中的 print 按行转发给玩家。
+    写入只放进传输层的缓冲区，不会阻塞事件循环。
+    """
+
+    def __init__(self, writer: asyncio.StreamWriter) -> None:
+        self.writer = writer
+        self.closed = False
+        self._pending: Optional[asyncio.Future] = None
+        self._buffer = ""
+
+    def _write_message(self, message: Dict) -> None:
+        if self.closed or self.writer.is_closing():
+            return
+        self.writer.write((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    async def send(self, kind: str, text: str = "", **fields) -> None:
+        """发送一条消息给玩家。"""
+        self.flush()
+        self._write_message({"type": kind, "text": text, **fields})
+        try:
+            await self.writer.drain()
+        except ConnectionError:
+            self.close()
+
+    async def ask(self, prompt: str, timeout: float) -> Optional[str]:
+        """
+        发送提示并等待玩家输入。
+
+        Returns:
+            Optional[str]: 玩家的输入；超时或已掉线时返回 None
+        """
+        if self.closed:
+            return None
+        self._pending = asyncio.get_running_loop().create_future()
+        try:
+            await self.send("prompt", prompt, timeout=timeout)
+            return await asyncio.wait_for(self._pending, timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._pending = None
+
+    def feed(self, line: str) -> None:
+        """处理客户端发来的一行。"""
+        text = line.strip()
+        if text.startswith("{"):
+            try:
+                message = json.loads(text)
+                text = str(message.get("text", "")) if message.get("type") == "input" else None
+            except ValueError:
+                pass
+        if text is None:
+            return
+        if self._pending is not None and not self._pending.done():
+            self._pending.set_result(text)
+        else:
+            self._write_message({"type": "notice", "text": "当前不需要输入。"})
+
+    def close(self) -> None:
+        """标记掉线：正在等待的输入立即按超时处理。"""
+        self.closed = True
+        if self._pending is not None and not self._pending.done():
+            self._pending.set_result(None)
+
+    # --- 作为桌子的控制台输出流 ---
+    def write(self, text: str) -> int:
+        self._buffer += text
+        if "\n" in self._buffer:
+            complete, _, self._buffer = self._buffer.rpartition("\n")
+            self._write_message({"type": "output", "text": complete})
+        return len(text)
+
+    def flush(self) -> None:
+        if self._buffer:
+            self._write_message({"type": "output", "text": self._buffer})
+            self._buffer = ""
+
+
+class GameServer:
+    """
+    在一个事件循环中托管多张桌子。
+
+    用法：
+        server = GameServer()
+        await server.start()
+        await server.serve_forever()
+    """
+
+    def __init__(self, config: Optional[Dict] = None) -> None:
+        self.config = config or get_game_server_config()
+        self.tables: Dict[str, asyncio.Task] = {}
+        self.games_finished = 0
+        self._table_counter = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> int:
+        """开始监听，返回实际端口（port 为 0 时由系统分配）。"""
+        # 先导入引擎（agentscope 等需要数秒）和 openai 的接口模块（首次调用模型时才导入，约 1 秒），
+        # 避免第一张桌子开局时在事件循环中导入、卡住其他桌子
+        import main  # noqa: F401
+        import agents.game_master  # noqa: F401
+        import agents.player_agent  # noqa: F401
+        import agents.user_agent  # noqa: F401
+        import openai.resources.chat  # noqa: F401
+        self._server = await asyncio.start_server(self._handle_connection, self.config["host"], self.config["port"])
+        port = self._server.sockets[0].getsockname()[1]
+        print(f"[游戏服务器] 监听 {self.config['host']}:{port}，最多 {self.config['max_tables']} 张桌子")
+        return port
+
+    async def serve_forever(self) -> None:
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self) -> None:
+        """停止接受新连接，并等待进行中的桌子结束。"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self.tables:
+            await asyncio.gather(*self.tables.values(), return_exceptions=True)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        seat = HumanSeat(writer)
+        if len(self.tables) >= self.config["max_tables"]:
+            await seat.send("error", "服务器桌子已满，请稍后再试。")
+            writer.close()
+            return
+
+        self._table_counter += 1
+        table_id = f"t{self._table_counter}"
+        task = asyncio.create_task(self._run_table(table_id, seat), name=f"table-{table_id}")
+        self.tables[table_id] = task
+        task.add_done_callback(lambda _: self.tables.pop(table_id, None))
+        await seat.send("welcome", table=table_id, timeout=self.config["input_timeout"])
+
+        try:
+            while not task.done():
+                line = await reader.readline()
+                if not line:
+                    break
+                seat.feed(line.decode("utf-8", errors="replace"))
+        except ConnectionError:
+            pass
+        finally:
+            seat.close()
+
+    async def _run_table(self, table_id: str, seat: HumanSeat) -> None:
+        """运行一张桌子的一局游戏。"""
+        from main import create_game, release_players
+        from agents.user_agent import create_remote_user_agent
+
+        print(f"[游戏服务器] 桌子 {table_id} 开局（进行中 {len(self.tables)} 张）")
+        winner = None
+        game_master = None
+        with table_scope(table_id, output=seat):
+            try:
+                user_agent = create_remote_user_agent(seat, input_timeout=self.config["input_timeout"],
+                                                      timeout_reply=self.config["timeout_reply"])
+                # 创建十来个模型客户端需要约 0.4 秒（主要是 SSL 上下文），放到线程中，不阻塞其他桌子；
+                # 线程继承当前上下文，日志和输出仍归属这张桌子
+                game_master = await asyncio.to_thread(create_game, user_agent)
+                if game_master is not None:
+                    await game_master.notify_werewolves_of_teammates()
+                    await game_master.run_game()
+                    winner = game_master.game_state["winner"]
+            except Exception as e:
+                print(f"\n游戏运行出现异常: {e}")
+                import traceback
+                traceback.print_exc()
+            finally:
+                # 落盘可能等待数秒，放到线程中，避免阻塞其他桌子
+                await asyncio.to_thread(log_writer.flush, True)
+                if game_master is not None:
+                    release_players(game_master)
+        self.games_finished += 1
+        print(f"[游戏服务器] 桌子 {table_id} 结束，胜利者: {winner}")
+        await seat.send("game_over", winner=winner)
+        seat.writer.close()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="狼人杀多桌游戏服务器")
+    parser.add_argument("--host", help="监听地址")
+    parser.add_argument("--port", type=int, help="监听端口")
+    args = parser.parse_args()
+
+    config = get_game_server_config()
+    if args.host:
+        config["host"] = args.host
+    if args.port is not None:
+        config["port"] = args.port
+
+    server = GameServer(config)
+    await server.start()
+    from agents.agent_pool import agent_pool
+    try:
+        await server.serve_forever()
+    finally:
+        await agent_pool.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,370 @@
+# werewolf_game/log_index.py
+"""
+把 logs/ 目录下的游戏日志增量索引到本地 SQLite 数据库，并提供常用的聚合查询。
+
+索引按文件记录已解析到的字节偏移量：已经完整索引过的文件不会被重新读取，
+仍在写入中的文件只解析到最后一个完整的行，下次从该位置继续。
+压缩后的日志（.gz / .zst）与原始 .txt 视为同一个文件，偏移量继续有效。
+
+用法:
+    python log_index.py index                    # 索引 logs/ 下的所有游戏日志
+    python log_index.py index --watch 10         # 每10秒增量索引一次新内容
+    python log_index.py query winrate-by-model   # 按模型统计胜率
+    python log_index.py query winrate-by-role    # 按（模型, 角色）统计胜率
+    python log_index.py query seer-night1-death  # 预言家首夜死亡的比例
+    python log_index.py query abstain-by-model   # 按模型统计弃票率
+    python log_index.py query summary            # 游戏总数与阵营胜率
+"""
+import os
+import re
+import time
+import sqlite3
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+from logger import LOG_DIR, open_log_file
+
+DEFAULT_DB_PATH = os.path.join(LOG_DIR, "index.db")
+
+# game_log_<时间戳>[_<后缀>...].txt：后缀如游戏服务器的桌号（_t3），对局 ID 为时间戳加后缀
+_GAME_LOG_PATTERN = re.compile(r"^game_log_(\d{8}_\d{6}(?:_[A-Za-z0-9]+)*)\.txt(?:\.gz|\.zst)?$")
+# 反事实分支（counterfactual.py，桌号 _b<序号>）是从检查点分叉出的假设结果，
+# 计入统计会重复计算分叉前的对局并改变胜率，默认不索引
+_BRANCH_PATTERN = re.compile(r"^\d{8}_\d{6}_b\d+(?:_|$)")
+
+# 日志行的解析规则：(事件类型, 正则)，正则的第一组为行动者，第二组为目标
+_LINE_PATTERNS = [
+    ("wolf_kill", re.compile(r"^狼人团队决定淘汰: (Player_\d+)")),
+    ("wolf_kill", re.compile(r"^狼人代表未能提供有效目标，裁判随机选择淘汰: (Player_\d+)")),
+    ("seer_check", re.compile(r"^预言家 ?(Player_\d+)? ?查验了 (Player_\d+)，结果是【(.+?)】")),
+    ("witch_save", re.compile(r"^女巫使用了【解药】救了 (Player_\d+)")),
+    ("witch_poison", re.compile(r"^女巫使用了【毒药】，目标是 (Player_\d+)")),
+    ("vote", re.compile(r"^\[(Player_\d+) 投票给\]: (Player_\d+|None)")),
+    ("abstain", re.compile(r"^\[(Player_\d+) 弃票")),
+    ("vote_out", re.compile(r"^投票结果：玩家 (Player_\d+) 被淘汰")),
+    ("hunter_shot", re.compile(r"^猎人 (Player_\d+) 开枪带走了 (Player_\d+)")),
+    ("hunter_shot", re.compile(r"^猎人 (Player_\d+) 未能提供有效目标，裁判随机选择了 (Player_\d+)")),
+]
+_NIGHT_PATTERN = re.compile(r"^--- 第 (\d+) 天 - 夜晚 ---")
+_SPEECH_PATTERN = re.compile(r"^\[(Player_\d+) 发言 - ")
+_MODEL_PATTERN = re.compile(r"^\[(Player_\d+) [^\]\n]*? - ([^\]\n]+)\]:")
+_WINNER_PATTERN = re.compile(r"游戏结束！胜利者是: (\S+?) =====")
+_IDENTITY_HEADER = "===== 游戏结束 - 最终身份揭晓 ====="
+_IDENTITY_PATTERN = re.compile(r"^- (Player_\d+): (\w+)$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,      -- 去掉压缩后缀的文件名
+    game_id TEXT,
+    offset INTEGER,             -- 已解析到的（解压后）字节偏移
+    size INTEGER,
+    mtime REAL,
+    day INTEGER,                -- 解析状态：当前天数
+    phase TEXT,                 -- 解析状态：当前阶段
+    in_identities INTEGER,      -- 解析状态：是否位于最终身份揭晓段落
+    complete INTEGER            -- 是否已读到游戏结束
+);
+CREATE TABLE IF NOT EXISTS games (
+    game_id TEXT PRIMARY KEY,
+    winner TEXT,
+    days INTEGER,
+    complete INTEGER
+);
+CREATE TABLE IF NOT EXISTS players (
+    game_id TEXT,
+    name TEXT,
+    role TEXT,
+    model TEXT,
+    PRIMARY KEY (game_id, name)
+);
+CREATE TABLE IF NOT EXISTS events (
+    game_id TEXT,
+    day INTEGER,
+    phase TEXT,
+    kind TEXT,
+    actor TEXT,
+    target TEXT,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_events_game ON events (game_id, kind);
+"""
+
+
+def connect(db_path: str = DEFAULT_DB_PATH) -> sqlite3.Connection:
+    """打开（必要时创建）索引数据库。"""
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _model_key(model_info: str) -> str:
+    """把日志中的 "deepseek(deepseek-ai/DeepSeek-V3.2)" 转成模型 key "deepseek"。"""
+    return model_info.split("(", 1)[0].strip() or model_info
+
+
+class _FileState:
+    """一个日志文件的增量解析状态。"""
+
+    def __init__(self, row: Optional[Tuple] = None) -> None:
+        if row is None:
+            self.offset, self.day, self.phase, self.in_identities, self.complete = 0, 0, "", False, False
+        else:
+            self.offset, self.day, self.phase, self.in_identities, self.complete = row
+            self.in_identities = bool(self.in_identities)
+            self.complete = bool(self.complete)
+
+
+def _parse_lines(game_id: str, lines: List[str], state: _FileState, conn: sqlite3.Connection) -> None:
+    """解析一批完整的日志行，把结果写入数据库（不提交事务）。"""
+    events = []
+    models: Dict[str, str] = {}
+    identities: Dict[str, str] = {}
+    winner = None
+
+    for line in lines:
+        if state.in_identities:
+            match = _IDENTITY_PATTERN.match(line)
+            if match:
+                identities[match.group(1)] = match.group(2)
+            elif line.startswith("====="):
+                state.in_identities = False
+                state.complete = True
+            continue
+
+        if line.strip() == _IDENTITY_HEADER:
+            state.in_identities = True
+            continue
+
+        match = _NIGHT_PATTERN.match(line)
+        if match:
+            state.day, state.phase = int(match.group(1)), "NIGHT"
+            continue
+
+        match = _WINNER_PATTERN.search(line)
+        if match:
+            winner = match.group(1)
+            continue
+
+        match = _MODEL_PATTERN.match(line)
+        if match:
+            models[match.group(1)] = _model_key(match.group(2))
+
+        if _SPEECH_PATTERN.match(line):
+            state.phase = "DAY_DISCUSSION"
+            events.append((game_id, state.day, state.phase, "speech", _SPEECH_PATTERN.match(line).group(1), None, None))
+            continue
+
+        for kind, pattern in _LINE_PATTERNS:
+            match = pattern.match(line)
+            if not match:
+                continue
+            if kind in ("vote", "abstain", "vote_out"):
+                state.phase = "VOTE"
+            groups = match.groups()
+            if kind == "seer_check":
+                actor, target, detail = groups
+            elif kind in ("wolf_kill", "witch_save", "witch_poison", "vote_out"):
+                actor, target, detail = None, groups[0], None
+            elif kind == "abstain":
+                actor, target, detail = groups[0], None, None
+            else:
+                actor, target, detail = groups[0], groups[1], None
+            if kind == "vote" and target == "None":
+                kind, target = "abstain", None
+            events.append((game_id, state.day, state.phase, kind, actor, target, detail))
+            break
+
+    if events:
+        conn.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?)", events)
+    for name, model in models.items():
+        conn.execute(
+            "INSERT INTO players (game_id, name, model) VALUES (?, ?, ?) "
+            "ON CONFLICT (game_id, name) DO UPDATE SET model = excluded.model",
+            (game_id, name, model),
+        )
+    for name, role in identities.items():
+        conn.execute(
+            "INSERT INTO players (game_id, name, role) VALUES (?, ?, ?) "
+            "ON CONFLICT (game_id, name) DO UPDATE SET role = excluded.role",
+            (game_id, name, role),
+        )
+    conn.execute(
+        "INSERT INTO games (game_id, winner, days, complete) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT (game_id) DO UPDATE SET winner = COALESCE(excluded.winner, games.winner), "
+        "days = excluded.days, complete = excluded.complete",
+        (game_id, winner, state.day, int(state.complete)),
+    )
+
+
+def index_file(conn: sqlite3.Connection, path: str, include_branches: bool = False) -> bool:
+    """
+    增量索引单个游戏日志文件。
+
+    Args:
+        include_branches (bool): 是否索引反事实分支的日志
+
+    Returns:
+        bool: 本次是否读取了新内容
+    """
+    filename = os.path.basename(path)
+    match = _GAME_LOG_PATTERN.match(filename)
+    if not match:
+        return False
+    game_id = match.group(1)
+    if not include_branches and _BRANCH_PATTERN.match(game_id):
+        return False
+    name = f"game_log_{game_id}.txt"
+    stat = os.stat(path)
+
+    row = conn.execute(
+        "SELECT offset, day, phase, in_identities, complete, size, mtime FROM files WHERE name = ?", (name,)
+    ).fetchone()
+    if row is not None:
+        if row[4]:
+            return False  # 已经完整索引过
+        if row[5] == stat.st_size and row[6] == stat.st_mtime:
+            return False  # 自上次索引以来没有变化
+    state = _FileState(row[:5] if row else None)
+
+    with open_log_file(path, binary=True) as f:
+        f.seek(state.offset)
+        data = f.read()
+
+    # 只处理完整的行，最后一行可能还在写入中
+    end = data.rfind(b"\n")
+    if end < 0:
+        return False
+    chunk = data[: end + 1]
+    lines = chunk.decode("utf-8", errors="replace").splitlines()
+    _parse_lines(game_id, lines, state, conn)
+    state.offset += len(chunk)
+
+    conn.execute(
+        "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (name, game_id, state.offset, stat.st_size, stat.st_mtime, state.day, state.phase,
+         int(state.in_identities), int(state.complete)),
+    )
+    conn.commit()
+    return True
+
+
+def index_logs(conn: sqlite3.Connection, log_dir: str = LOG_DIR, include_branches: bool = False) -> int:
+    """
+    索引目录下的所有游戏日志。
+
+    Args:
+        include_branches (bool): 是否索引反事实分支的日志
+
+    Returns:
+        int: 读取了新内容的文件数
+    """
+    if not os.path.isdir(log_dir):
+        return 0
+    updated = 0
+    for filename in sorted(os.listdir(log_dir)):
+        if _GAME_LOG_PATTERN.match(filename):
+            if index_file(conn, os.path.join(log_dir, filename), include_branches):
+                updated += 1
+    return updated
+
+
+# ===== 聚合查询 =====
+# 阵营判定：狼人属于狼人阵营，其余角色属于好人阵营
+_WIN_CASE = (
+    "CASE WHEN (p.role = 'werewolf' AND g.winner = '狼人阵营') "
+    "OR (p.role != 'werewolf' AND g.winner = '好人阵营') THEN 1 ELSE 0 END"
+)
+
+QUERIES = {
+    "summary": (
+        "SELECT COUNT(*) AS games, "
+        "SUM(winner = '好人阵营') AS good_wins, "
+        "SUM(winner = '狼人阵营') AS wolf_wins, "
+        "ROUND(AVG(days), 2) AS avg_days "
+        "FROM games WHERE complete = 1"
+    ),
+    "winrate-by-model": (
+        f"SELECT p.model, COUNT(*) AS seats, SUM({_WIN_CASE}) AS wins, "
+        f"ROUND(1.0 * SUM({_WIN_CASE}) / COUNT(*), 3) AS win_rate "
+        "FROM players p JOIN games g ON g.game_id = p.game_id "
+        "WHERE g.complete = 1 AND p.role IS NOT NULL AND p.model IS NOT NULL "
+        "GROUP BY p.model ORDER BY win_rate DESC"
+    ),
+    "winrate-by-role": (
+        f"SELECT p.model, p.role, COUNT(*) AS seats, SUM({_WIN_CASE}) AS wins, "
+        f"ROUND(1.0 * SUM({_WIN_CASE}) / COUNT(*), 3) AS win_rate "
+        "FROM players p JOIN games g ON g.game_id = p.game_id "
+        "WHERE g.complete = 1 AND p.role IS NOT NULL AND p.model IS NOT NULL "
+        "GROUP BY p.model, p.role ORDER BY p.role, win_rate DESC"
+    ),
+    "seer-night1-death": (
+        "SELECT COUNT(*) AS games, SUM(died) AS seer_died_night1, "
+        "ROUND(1.0 * SUM(died) / COUNT(*), 3) AS rate FROM ("
+        "  SELECT g.game_id, ("
+        "    EXISTS (SELECT 1 FROM events k WHERE k.game_id = g.game_id AND k.day = 1 "
+        "            AND k.kind = 'wolf_kill' AND k.target = s.name "
+        "            AND NOT EXISTS (SELECT 1 FROM events w WHERE w.game_id = g.game_id AND w.day = 1 "
+        "                            AND w.kind = 'witch_save' AND w.target = s.name))"
+        "    OR EXISTS (SELECT 1 FROM events p WHERE p.game_id = g.game_id AND p.day = 1 "
+        "               AND p.kind = 'witch_poison' AND p.target = s.name)"
+        "  ) AS died "
+        "  FROM games g JOIN players s ON s.game_id = g.game_id AND s.role = 'seer' "
+        "  WHERE g.complete = 1)"
+    ),
+    "abstain-by-model": (
+        "SELECT p.model, COUNT(*) AS votes, SUM(e.kind = 'abstain') AS abstains, "
+        "ROUND(1.0 * SUM(e.kind = 'abstain') / COUNT(*), 3) AS abstain_rate "
+        "FROM events e JOIN players p ON p.game_id = e.game_id AND p.name = e.actor "
+        "WHERE e.kind IN ('vote', 'abstain') AND p.model IS NOT NULL "
+        "GROUP BY p.model ORDER BY abstain_rate DESC"
+    ),
+}
+
+
+def run_query(conn: sqlite3.Connection, name: str) -> Tuple[List[str], List[Tuple]]:
+    """执行一个预定义的聚合查询，返回 (列名, 行)。"""
+    cursor = conn.execute(QUERIES[name])
+    columns = [col[0] for col in cursor.description]
+    return columns, cursor.fetchall()
+
+
+def _print_table(columns: List[str], rows: List[Tuple]) -> None:
+    widths = [max(len(str(col)), *(len(str(row[i])) for row in rows)) if rows else len(str(col))
+              for i, col in enumerate(columns)]
+    print("  ".join(str(col).ljust(w) for col, w in zip(columns, widths)))
+    print("  ".join("-" * w for w in widths))
+    for row in rows:
+        print("  ".join(str(value).ljust(w) for value, w in zip(row, widths)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="游戏日志索引与查询工具")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="索引数据库路径")
+    parser.add_argument("--logs", default=LOG_DIR, help="日志目录")
+    sub = parser.add_subparsers(dest="command", required=True)
+    index_parser = sub.add_parser("index", help="增量索引日志")
+    index_parser.add_argument("--watch", type=float, default=0, help="每隔N秒重复索引，0表示只运行一次")
+    index_parser.add_argument("--include-branches", action="store_true", help="同时索引反事实分支（_b<序号>）的日志")
+    query_parser = sub.add_parser("query", help="运行聚合查询")
+    query_parser.add_argument("name", choices=sorted(QUERIES))
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    if args.command == "index":
+        while True:
+            start = time.perf_counter()
+            updated = index_logs(conn, args.logs, args.include_branches)
+            print(f"已索引 {updated} 个有新内容的日志文件，耗时 {time.perf_counter() - start:.2f}s")
+            if not args.watch:
+                break
+            time.sleep(args.watch)
+    else:
+        columns, rows = run_query(conn, args.name)
+        _print_table(columns, rows)
+
+
+if __name__ == "__main__":
+    main()
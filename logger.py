@@ -1,16 +1,199 @@
+import io
 import os
+import re
+import sys
+import gzip
+import json
+import difflib
+import hashlib
+import time
+import uuid
+import queue
+import asyncio
+import shutil
+import atexit
 import datetime
-from typing import Dict, List
+import threading
+from typing import Any, Dict, List, Optional
+
+from game_context import game_local, log_suffix
+
+try:
+    from configs import LOG_WRITER
+except ImportError:
+    LOG_WRITER = {}
+
+try:
+    from configs import EVENT_LOG
+except ImportError:
+    EVENT_LOG = {}
+
+try:
+    from configs import PROMPT_LOG
+except ImportError:
+    PROMPT_LOG = {}
+
+LOG_DIR = "logs"
+
+
+def new_game_id() -> str:
+    """
+    新一局的对局 ID，也用于本局的日志、检查点文件名：<时间戳>[_<桌号>]_<8位随机十六进制>。
+    多个进程（批量评测、游戏服务器）共用 logs/ 和评分数据库时可能在同一秒开局，随机部分避免对局 ID 重复。
+    """
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"{timestamp}{log_suffix()}_{uuid.uuid4().hex[:8]}"
+
+
+class LogWriter:
+    """
+    后台批量日志写入器。
+
+    各个日志记录器只把 (文件路径, 文本) 放进一个有界队列，
+    由后台线程按时间间隔或累计字节数批量合并写入，避免在事件循环上
+    为每条日志执行 exists/makedirs/open/close 等阻塞系统调用。
+    队列满时按 overflow 处理："drop" 丢弃该条并计入 dropped（不阻塞事件循环），
+    "block" 让写入方等待队列腾出空间。
+    """
+    def __init__(self, max_queue: int = 10000, flush_interval: float = 0.5,
+                 max_batch_bytes: int = 256 * 1024, enabled: bool = True, overflow: str = "drop") -> None:
+        self.max_queue = max_queue
+        self.flush_interval = flush_interval
+        self.max_batch_bytes = max_batch_bytes
+        self.enabled = enabled
+        self.overflow = overflow
+        self.bytes_written = 0
+        self.dropped = 0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._known_dirs = set()
+        atexit.register(self.close)
+
+    def write(self, path: str, text: str) -> None:
+        """将一段文本追加写入 path（异步）。"""
+        if not self.enabled:
+            self._write_batch({path: [text]})
+            return
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(("write", path, text))
+        except queue.Full:
+            if self.overflow == "block":
+                self._queue.put(("write", path, text))
+                return
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                print(f"[日志队列已满]: 已丢弃 {self.dropped} 条日志", file=sys.stderr)
+
+    def flush(self, fsync: bool = False, timeout: float = 10.0) -> None:
+        """
+        等待队列中已有的日志全部落盘。
+
+        Args:
+            fsync (bool): 是否对本批涉及的文件执行 fsync（游戏结束时使用）
+            timeout (float): 最长等待秒数
+        """
+        if not self.enabled or self._thread is None or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(("flush", done, fsync))
+        done.wait(timeout)
+
+    async def aflush(self, fsync: bool = False, timeout: float = 10.0) -> None:
+        """flush 的异步版本：在线程中等待落盘，不阻塞事件循环。"""
+        await asyncio.to_thread(self.flush, fsync, timeout)
+
+    def close(self) -> None:
+        """落盘所有日志并停止后台线程（进程退出时自动调用）。"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(("stop", done, True))
+        done.wait(10.0)
+        self._thread = None
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="LogWriter", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        """后台线程主循环：收集一批日志后统一写入。"""
+        pending_paths = set()
+        while True:
+            item = self._queue.get()
+            batch: Dict[str, List[str]] = {}
+            batch_bytes = 0
+            control = None
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item[0] == "write":
+                    _, path, text = item
+                    batch.setdefault(path, []).append(text)
+                    batch_bytes += len(text)
+                else:
+                    control = item
+                    break
+                if batch_bytes >= self.max_batch_bytes:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            self._write_batch(batch)
+            pending_paths.update(batch)
+
+            if control is not None:
+                kind, done, fsync = control
+                if fsync:
+                    self._fsync_paths(pending_paths)
+                    pending_paths.clear()
+                done.set()
+                if kind == "stop":
+                    return
+
+    def _write_batch(self, batch: Dict[str, List[str]]) -> None:
+        for path, texts in batch.items():
+            try:
+                directory = os.path.dirname(path)
+                if directory and directory not in self._known_dirs:
+                    os.makedirs(directory, exist_ok=True)
+                    self._known_dirs.add(directory)
+                data = "".join(texts)
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write(data)
+                self.bytes_written += len(data.encode("utf-8"))
+            except OSError as e:
+                print(f"[日志写入失败]: {path} - {e}", file=sys.stderr)
+
+    def _fsync_paths(self, paths) -> None:
+        for path in paths:
+            try:
+                with open(path, "a", encoding="utf-8") as f:
+                    os.fsync(f.fileno())
+            except OSError as e:
+                print(f"[日志同步失败]: {path} - {e}", file=sys.stderr)
+
+# 创建一个全局的日志写入器实例，所有日志记录器共用
+log_writer = LogWriter(**LOG_WRITER)
+
 
 class GameLogger:
     def __init__(self) -> None:
         self.log_entries = []
         self.log_filename = ""
 
-    def start_game(self, identities: Dict[str, str]):
+    def start_game(self, identities: Dict[str, str], game_id: Optional[str] = None):
         self.log_entries = []
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.log_filename = f"game_log_{timestamp}.txt"
+        self.log_filename = f"game_log_{game_id or new_game_id()}.txt"
         
         self.log_entries.append("===== 游戏开始 =====")
         self.log_entries.append("角色分配 (上帝视角):")
@@ -25,12 +208,8 @@ class GameLogger:
         self._flush_entry(entry)
 
     def _flush_entry(self, entry: str):
-        log_dir = "logs"
-        if not os.path.exists(log_dir):
-            os.makedirs(log_dir)
-        
-        with open(os.path.join(log_dir, self.log_filename), "a", encoding="utf-8") as f:
-            f.write(entry + "\n\n")  # 每条日志后加空行
+        # 交给后台写入器批量落盘，每条日志后加空行
+        log_writer.write(os.path.join(LOG_DIR, self.log_filename), entry + "\n\n")
 
     def log_identities_at_end(self, identities: Dict[str, str]):
         """在游戏结束时记录所有玩家的最终身份。"""
@@ -39,12 +218,13 @@ class GameLogger:
             self.add_entry(f"- {name}: {role}")
         self.add_entry("====================================\n")
 
-    def save_log(self):
-        # 这个方法可以保留，以防万一有最终保存的需求，或者简单地pass掉
+    async def save_log(self):
+        # 游戏结束时确保所有日志（包括prompt和记忆日志）已写入磁盘
+        await log_writer.aflush(fsync=True)
         print(f"\n游戏日志已保存至: logs/{self.log_filename}")
 
-# 创建一个全局的logger实例，方便在其他模块中导入和使用
-game_logger = GameLogger()
+# 创建一个全局的logger实例，方便在其他模块中导入和使用（游戏服务器中按桌隔离）
+game_logger = game_local(GameLogger)
 
 
 class MemoryLogger:
@@ -52,15 +232,9 @@ class MemoryLogger:
     def __init__(self) -> None:
         self.log_filename = ""
 
-    def start_logging(self) -> None:
-        """初始化日志文件."""
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.log_filename = f"prompt_night_{timestamp}.txt"
-        
-        # 确保logs目录存在
-        log_dir = "logs"
-        if not os.path.exists(log_dir):
-            os.makedirs(log_dir)
+    def start_logging(self, game_id: Optional[str] = None) -> None:
+        """初始化日志文件（game_id 为本局的对局 ID，文件名与游戏日志对应）。"""
+        self.log_filename = f"prompt_night_{game_id or new_game_id()}.txt"
 
     def add_memory_update(self, player_name: str, prompt: str, summary: str) -> None:
         """
@@ -74,7 +248,6 @@ class MemoryLogger:
         if not self.log_filename:
             self.start_logging()
             
-        log_dir = "logs"
         log_entry = (
             f"===== 为 {player_name} 更新记忆摘要 =====\n"
             f"【提示词】\n{prompt}\n\n"
@@ -82,27 +255,53 @@ class MemoryLogger:
             f"===== END =====\n\n"
         )
         
-        with open(os.path.join(log_dir, self.log_filename), "a", encoding="utf-8") as f:
-            f.write(log_entry)
+        log_writer.write(os.path.join(LOG_DIR, self.log_filename), log_entry)
 
 # 创建一个全局的memory logger实例
-memory_logger = MemoryLogger()
+memory_logger = game_local(MemoryLogger)
+
+
+# 内容寻址存储中，短于该长度的行直接内联，不单独存储
+_PROMPT_INLINE_CHARS = 12
+
+# 计算 prompt 类型时去掉玩家名和数字，使同一调用点的 prompt 互为差分基准
+_PROMPT_KIND_PATTERN = re.compile(r"Player_\d+|\d+")
+
+
+def prompt_chunk_hash(text: str) -> str:
+    """计算一个 prompt 分块的内容哈希（16位十六进制）。"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
 
 
 class PromptLogger:
-    """一个专门用于记录发送给AI的Prompt的日志记录器。"""
+    """
+    一个专门用于记录发送给AI的Prompt的日志记录器。
+
+    默认使用内容寻址的去重存储（PROMPT_LOG["mode"] = "dedup"）：
+    每条 prompt 与同类型的上一条 prompt 做按行差分，相同的行段只记录区间；
+    新出现的行按内容哈希写入 prompt_chunks_*.jsonl，每个不同的行只写一次。
+    使用 prompt_reader.py 可以还原完整的 prompt。
+    """
     def __init__(self) -> None:
         self.log_filename = ""
+        self.chunk_filename = ""
+        self.mode = PROMPT_LOG.get("mode", "dedup")
+        self._seen_chunks = set()
+        self._bases: Dict[str, tuple] = {}
+        self._count = 0
 
-    def start_logging(self) -> None:
-        """初始化日志文件。"""
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.log_filename = f"prompt_log_{timestamp}.txt"
-        
-        # 确保logs目录存在
-        log_dir = "logs"
-        if not os.path.exists(log_dir):
-            os.makedirs(log_dir)
+    def start_logging(self, game_id: Optional[str] = None) -> None:
+        """初始化日志文件（game_id 为本局的对局 ID，文件名与游戏日志对应）。"""
+        timestamp = game_id or new_game_id()
+        self._seen_chunks = set()
+        self._bases = {}
+        self._count = 0
+        if self.mode == "dedup":
+            self.log_filename = f"prompt_log_{timestamp}.jsonl"
+            self.chunk_filename = f"prompt_chunks_{timestamp}.jsonl"
+        else:
+            self.log_filename = f"prompt_log_{timestamp}.txt"
+            self.chunk_filename = ""
 
     def add_prompt(self, title: str, prompt: str) -> None:
         """
@@ -114,16 +313,262 @@ class PromptLogger:
         """
         if not self.log_filename:
             self.start_logging()
+
+        if self.mode == "dedup":
+            self._add_prompt_dedup(title, prompt)
+            return
             
-        log_dir = "logs"
         log_entry = (
             f"===== {title} =====\n"
             f"{prompt}\n"
             f"===== END =====\n\n"
         )
         
-        with open(os.path.join(log_dir, self.log_filename), "a", encoding="utf-8") as f:
-            f.write(log_entry)
+        log_writer.write(os.path.join(LOG_DIR, self.log_filename), log_entry)
+
+    def _add_prompt_dedup(self, title: str, prompt: str) -> None:
+        """
+        以差分 + 内容寻址的方式记录 prompt。
+
+        记录格式: {"ts", "title", "base", "parts"}
+        - base: 作为差分基准的记录序号（同类型的上一条 prompt），没有时为 null
+        - parts: 依次拼接即得到完整 prompt，元素为：
+            [i, j]      复制基准 prompt 的第 i 到 j-1 行
+            "@<hash>"   引用分块文件中的行
+            其他字符串   内联的短行（以 "@" 开头的行写成 "@@..."）
+        """
+        lines = prompt.splitlines(keepends=True)
+        kind = _PROMPT_KIND_PATTERN.sub("#", title)
+        base_index, base_lines = self._bases.get(kind, (None, []))
+
+        parts = []
+        new_chunks = []
+        matcher = difflib.SequenceMatcher(None, base_lines, lines, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                parts.append([i1, i2])
+                continue
+            for line in lines[j1:j2]:
+                if len(line) < _PROMPT_INLINE_CHARS:
+                    parts.append("@" + line if line.startswith("@") else line)
+                    continue
+                chunk_hash = prompt_chunk_hash(line)
+                if chunk_hash not in self._seen_chunks:
+                    self._seen_chunks.add(chunk_hash)
+                    new_chunks.append(json.dumps({"h": chunk_hash, "t": line}, ensure_ascii=False, separators=(",", ":")) + "\n")
+                parts.append("@" + chunk_hash)
+
+        if new_chunks:
+            log_writer.write(os.path.join(LOG_DIR, self.chunk_filename), "".join(new_chunks))
+        record = {"ts": round(time.time(), 3), "title": title, "base": base_index, "parts": parts}
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+        log_writer.write(os.path.join(LOG_DIR, self.log_filename), line + "\n")
+
+        self._bases[kind] = (self._count, lines)
+        self._count += 1
 
 # 创建一个全局的prompt logger实例
-prompt_logger = PromptLogger()
+prompt_logger = game_local(PromptLogger)
+
+
+# 结构化事件日志的默认配置，configs.py 中的 EVENT_LOG 会覆盖同名字段
+DEFAULT_EVENT_LOG_CONFIG = {
+    "enabled": True,
+    "compression": "gzip",       # 已关闭文件的压缩方式: "gzip" / "zstd" / None
+    "compress_text_logs": False, # 是否同时压缩以往游戏的 .txt 日志（游戏日志可能随仓库分发，默认保留原文件）
+    "compress_grace_seconds": 3600,  # 最近这段时间内修改过的文件不压缩（可能是其他进程仍在写入的日志）
+    "max_total_mb": 1024,        # logs/ 目录中压缩文件的总大小上限
+    "max_age_days": 30,          # 压缩文件的最长保留天数
+}
+
+# 本引擎写入的、每局一个的日志文件；轮转只压缩和淘汰这些文件（及其压缩包），其他文件不动
+_ROTATED_LOG_PATTERN = re.compile(r"^(?:game_log|prompt_log|prompt_chunks|prompt_night|events)_.+\.(?:txt|jsonl)$")
+
+
+def _compress_file(path: str, compression: str) -> Optional[str]:
+    """
+    压缩一个已关闭的日志文件并删除原文件。
+    压缩文件已存在时（从检查点恢复的对局）追加一个新的压缩帧，gzip/zstd 都能连续解压。
+
+    Returns:
+        Optional[str]: 压缩后的文件路径；压缩失败时返回 None
+    """
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            compression = "gzip"  # 没有安装 zstandard 时退回 gzip
+    try:
+        if compression == "zstd":
+            target = path + ".zst"
+            with open(path, "rb") as src, open(target, "ab") as dst:
+                zstandard.ZstdCompressor().copy_stream(src, dst)
+        else:
+            target = path + ".gz"
+            with open(path, "rb") as src, gzip.open(target, "ab") as dst:
+                shutil.copyfileobj(src, dst)
+        stat = os.stat(path)
+        os.utime(target, (stat.st_atime, stat.st_mtime))  # 保留原始修改时间，便于按时间轮转
+        os.remove(path)
+        return target
+    except OSError as e:
+        print(f"[日志压缩失败]: {path} - {e}", file=sys.stderr)
+        return None
+
+
+def open_log_file(path: str, binary: bool = False):
+    """打开日志文件用于读取，自动识别 .gz / .zst 压缩格式。binary 为 True 时返回字节流。"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb") if binary else gzip.open(path, "rt", encoding="utf-8")
+    if path.endswith(".zst"):
+        import zstandard
+        stream = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True, read_across_frames=True)
+        return stream if binary else io.TextIOWrapper(stream, encoding="utf-8")
+    return open(path, "rb") if binary else open(path, "r", encoding="utf-8")
+
+
+# 其他模块登记的、跨局持续写入的日志文件名（如内存分析报告），轮转时不会被压缩
+_long_lived_logs = set()
+
+
+def register_long_lived_log(filename: str) -> None:
+    """登记一个跨局持续写入的日志文件，避免在每局结束的轮转中被压缩。"""
+    _long_lived_logs.add(filename)
+
+
+def rotate_logs(log_dir: str = LOG_DIR, active_files: Optional[List[str]] = None,
+                closed_files: Optional[List[str]] = None) -> None:
+    """
+    整理 logs/ 目录：压缩已关闭的日志文件，并按大小和时间淘汰最旧的压缩文件。
+
+    同一个 logs/ 可能有多个进程（游戏服务器、批量评测、另一个 main.py）同时写入，
+    本进程无法知道它们正在写哪些文件：只处理本引擎的每局日志（见 _ROTATED_LOG_PATTERN），
+    并跳过 compress_grace_seconds 内修改过的文件。
+
+    Args:
+        log_dir (str): 日志目录
+        active_files (List[str], optional): 仍在写入中的文件名，不做处理
+        closed_files (List[str], optional): 确定已写完的文件名（如刚结束的本局事件日志），不受修改时间限制
+    """
+    config = dict(DEFAULT_EVENT_LOG_CONFIG)
+    config.update(EVENT_LOG)
+    if not os.path.isdir(log_dir):
+        return
+    active = set(active_files or []) | _long_lived_logs
+    closed = set(closed_files or []) - active
+    compression = config.get("compression")
+    grace = config.get("compress_grace_seconds") or 0
+    now = time.time()
+
+    # 1. 压缩已关闭的文件
+    if compression:
+        for name in os.listdir(log_dir):
+            if name in active or not _ROTATED_LOG_PATTERN.match(name):
+                continue
+            if name.endswith(".txt") and not config.get("compress_text_logs"):
+                continue
+            path = os.path.join(log_dir, name)
+            if name not in closed:
+                try:
+                    if now - os.stat(path).st_mtime < grace:
+                        continue
+                except OSError:
+                    continue  # 已被其他进程压缩或删除
+            _compress_file(path, compression)
+
+    # 2. 淘汰过期或超出总大小的压缩文件（从最旧的开始）
+    archives = []
+    for name in os.listdir(log_dir):
+        if name.endswith((".gz", ".zst")) and _ROTATED_LOG_PATTERN.match(name.rsplit(".", 1)[0]):
+            path = os.path.join(log_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            archives.append((stat.st_mtime, stat.st_size, path))
+    archives.sort()
+    max_age = config.get("max_age_days")
+    max_total = config.get("max_total_mb")
+    total = sum(size for _, size, _ in archives)
+    for mtime, size, path in archives:
+        too_old = max_age is not None and now - mtime > max_age * 86400
+        too_big = max_total is not None and total > max_total * 1024 * 1024
+        if not (too_old or too_big):
+            continue
+        try:
+            os.remove(path)
+            total -= size
+        except OSError as e:
+            print(f"[日志清理失败]: {path} - {e}", file=sys.stderr)
+
+
+class EventLogger:
+    """
+    结构化的游戏事件日志记录器。
+
+    每个事件写为 events_*.jsonl 中的一行 JSON，字段包括：
+    ts, game_id, day, phase, actor, type, payload, model, latency, tokens。
+    游戏结束后文件会被压缩，并按配置对 logs/ 目录进行轮转。
+    """
+    def __init__(self) -> None:
+        self.config = dict(DEFAULT_EVENT_LOG_CONFIG)
+        self.config.update(EVENT_LOG)
+        self.game_id = ""
+        self.log_filename = ""
+
+    def start_game(self, game_id: Optional[str] = None) -> None:
+        """为新游戏创建事件日志文件。"""
+        self.game_id = game_id or new_game_id()
+        self.log_filename = f"events_{self.game_id}.jsonl"
+
+    def log_event(self, event_type: str, day: int = 0, phase: str = "", actor: Optional[str] = None,
+                  payload: Optional[Dict[str, Any]] = None, model: Optional[str] = None,
+                  latency: Optional[float] = None, tokens: Optional[Dict[str, int]] = None) -> None:
+        """
+        记录一个游戏事件。
+
+        Args:
+            event_type (str): 事件类型 (e.g., "speech", "vote", "death").
+            day (int): 当前天数
+            phase (str): 当前阶段 (NIGHT / DAY_DISCUSSION / VOTE / END)
+            actor (str, optional): 事件发起者，通常是玩家名
+            payload (dict, optional): 事件的具体内容
+            model (str, optional): 相关的模型信息
+            latency (float, optional): 模型调用耗时（秒）
+            tokens (dict, optional): token 用量，如 {"prompt": 100, "completion": 20}
+        """
+        if not self.config.get("enabled") or not self.log_filename:
+            return
+        record = {
+            "ts": time.time(),
+            "game_id": self.game_id,
+            "day": day,
+            "phase": phase,
+            "actor": actor,
+            "type": event_type,
+            "payload": payload or {},
+            "model": model,
+            "latency": latency,
+            "tokens": tokens,
+        }
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str)
+        log_writer.write(os.path.join(LOG_DIR, self.log_filename), line + "\n")
+
+    async def end_game(self) -> None:
+        """
+        游戏结束：压缩本局事件日志，并轮转 logs/ 目录。
+        调用前须已落盘（GameLogger.save_log）；压缩和轮转在线程中进行，不阻塞事件循环。
+        """
+        if not self.config.get("enabled") or not self.log_filename:
+            return
+        # 本局和其他仍在运行的桌子正在写入的文件都不做处理
+        active = set()
+        for logger in (game_logger, prompt_logger, memory_logger, event_logger):
+            for instance in logger.all_instances():
+                active.update((instance.log_filename, getattr(instance, "chunk_filename", "")))
+        active.discard(self.log_filename)
+        await asyncio.to_thread(rotate_logs, LOG_DIR, [name for name in active if name], [self.log_filename])
+        self.log_filename = ""
+
+# 创建一个全局的event logger实例
+event_logger = game_local(EventLogger)
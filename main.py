@@ -2,12 +2,14 @@
 
 import asyncio
 import random
-from agentscope.message import Msg
-from configs import API_PROVIDERS, MODEL_LIST, GAME_SETUP, AGENT_CONFIG
-from agents.player_agent import create_player_agent
-from agents.user_agent import create_user_agent
-from agents.game_master import GameMasterAgent
-from agentscope.model import OpenAIChatModel
+import argparse
+from typing import Dict, Optional
+from configs import API_PROVIDERS, MODEL_LIST
+from table_setup import load_table_config, roles_list
+from checkpoint import read_checkpoint, latest_checkpoint
+from logger import log_writer
+from mem_profiler import memory_profiler
+from seeding import SEEDING, next_game_seed
 
 # 角色中英文映射
 ROLE_CN_MAP = {
@@ -18,34 +20,55 @@ ROLE_CN_MAP = {
     "villager": "村民"
 }
 
-async def setup_and_run_game():
-    """封装一局游戏的设置和运行"""
-    print("\n\n===== 正在准备新的一局游戏... =====")
+# agentscope 在包初始化时导入全部子模块（mcp、dashscope、sqlalchemy 等），冷启动需要 1 秒以上；
+# 依赖它的 agents 模块在创建游戏时才导入，参数解析和配置检查不必等待（见 startup_profile.py）
 
-    # 从 GAME_SETUP 生成角色列表
-    ROLES = []
-    for role, count in GAME_SETUP["roles"].items():
-        ROLES.extend([role] * count)
+def create_game(user_agent) -> Optional["GameMasterAgent"]:
+    """
+    按配置创建一局游戏：为人类玩家和AI玩家分配角色，返回裁判Agent；配置有误时返回 None。
+    终端模式和游戏服务器（game_server.py）共用；user_agent 为空时（如 ratings.py 的批量评测）
+    Player_0 也由 AI 担任，使用裁判模型。
+    """
+    from agents.agent_pool import agent_pool
+    from agents.game_master import GameMasterAgent
+
+    # 从 GAME_SETUP 生成角色列表（设置了 TABLE_SETUP 时按座位数自动生成）
+    GAME_SETUP, AGENT_CONFIG = load_table_config()
+    ROLES = roles_list(GAME_SETUP)
     
     if len(ROLES) != GAME_SETUP["num_players"]:
         print(f"错误：configs.py 中定义的角色数量 ({len(ROLES)}) 与玩家数量 ({GAME_SETUP['num_players']}) 不匹配！")
-        return
+        return None
+    if len(AGENT_CONFIG) < len(ROLES) - 1:
+        print(f"错误：AGENT_CONFIG 只配置了 {len(AGENT_CONFIG)} 个AI玩家，{GAME_SETUP['num_players']} 人局需要 {len(ROLES) - 1} 个！")
+        return None
         
-    random.shuffle(ROLES)
+    # 本局的随机数生成器（见 seeding.py）：分配角色后交给裁判继续使用
+    seed = next_game_seed()
+    rng = random.Random(seed)
+    rng.shuffle(ROLES)
 
     players = []
     player_identities = {}
     
     # 1. 创建人类玩家并分配角色
     user_role = ROLES.pop(0)
-    user_agent = create_user_agent()
-    # 【重要】为UserAgent添加特殊标记
-    setattr(user_agent, 'is_user', True)
+    if user_agent is None:
+        provider_config = API_PROVIDERS["modelscope"]
+        user_agent = agent_pool.acquire(role=user_role, model_config={
+            "model_name": MODEL_LIST["qwen_vl"],
+            "api_key": provider_config["api_key"],
+            "base_url": provider_config["base_url"],
+        }, agent_id=0)
+        setattr(user_agent, 'is_user', False)
+    else:
+        # 【重要】为UserAgent添加特殊标记
+        setattr(user_agent, 'is_user', True)
+        print(f"你的身份是: 【{ROLE_CN_MAP.get(user_role, user_role)}】")
     user_agent.name = "Player_0"
     setattr(user_agent, 'role', user_role)
     players.append(user_agent)
     player_identities[user_agent.name] = user_role
-    print(f"你的身份是: 【{ROLE_CN_MAP.get(user_role, user_role)}】")
 
     # 2. 创建AI玩家并分配角色
     for i, role in enumerate(ROLES):
@@ -58,7 +81,8 @@ async def setup_and_run_game():
             "base_url": provider_config["base_url"],
         }
         
-        ai_agent = create_player_agent(
+        # 从 Agent 池中取出上一局的 Agent 原地重置，没有时新建（见 agents/agent_pool.py）
+        ai_agent = agent_pool.acquire(
             role=role, model_config=model_config, agent_id=player_id
         )
         ai_agent.name = f"Player_{player_id}"
@@ -68,6 +92,22 @@ async def setup_and_run_game():
         player_identities[ai_agent.name] = role
 
     # 3. 创建裁判Agent
+    qwen_model, summary_model = create_referee_models()
+    game_master = GameMasterAgent(
+        players=players, 
+        player_identities=player_identities, 
+        model=qwen_model,
+        summary_model=summary_model,  # 传入专门的摘要模型
+        seed=seed,
+        rng=rng,
+    )
+    return game_master
+
+
+def create_referee_models():
+    """创建裁判的主模型和记忆摘要模型"""
+    from agents.agent_pool import agent_pool
+
     # 裁判主模型使用 qwen_vl（功能强大，用于裁判逻辑）
     qwen_provider_config = API_PROVIDERS["modelscope"]
     qwen_config = {
@@ -75,11 +115,7 @@ async def setup_and_run_game():
         "api_key": qwen_provider_config["api_key"],
         "base_url": qwen_provider_config["base_url"],
     }
-    qwen_model = OpenAIChatModel(
-        model_name=qwen_config["model_name"],
-        api_key=qwen_config["api_key"],
-        client_args={"base_url": qwen_config["base_url"]},
-    )
+    qwen_model = agent_pool.create_model(qwen_config)
     
     # 创建专门用于生成记忆摘要的轻量级模型（deepseek）
     summary_provider_config = API_PROVIDERS["modelscope"]
@@ -89,21 +125,86 @@ async def setup_and_run_game():
         "api_key": summary_provider_config["api_key"],
         "base_url": summary_provider_config["base_url"],
     }
-    summary_model = OpenAIChatModel(
-        model_name=summary_config["model_name"],
-        api_key=summary_config["api_key"],
-        client_args={"base_url": summary_config["base_url"]},
-    )
-    
-    game_master = GameMasterAgent(
-        players=players, 
-        player_identities=player_identities, 
+    summary_model = agent_pool.create_model(summary_config)
+    return qwen_model, summary_model
+
+
+def release_players(game_master: "GameMasterAgent") -> None:
+    """游戏结束后把AI玩家归还 Agent 池，下一局复用（人类玩家会被跳过）"""
+    from agents.agent_pool import agent_pool
+
+    agent_pool.release(data["agent"] for data in game_master.game_state["players"].values())
+
+
+def resume_game(path: str, user_agent) -> "GameMasterAgent":
+    """
+    从检查点文件重建所有玩家（角色、当前模型）和裁判Agent，返回的裁判会从保存的阶段继续游戏。
+    """
+    return restore_game(read_checkpoint(path), user_agent)
+
+
+def restore_game(checkpoint: Dict, user_agent=None) -> "GameMasterAgent":
+    """
+    用检查点字典重建一局游戏；user_agent 为空时（如反事实分支）人类座位由 AI 代替，使用裁判模型。
+    """
+    from agents.agent_pool import agent_pool
+    from agents.game_master import GameMasterAgent
+
+    identities = checkpoint["game_state"]["identities"]
+
+    players = []
+    for name, saved in checkpoint["agents"].items():
+        role = identities[name]
+        if saved["is_user"] and user_agent is not None:
+            agent = user_agent
+            setattr(agent, 'is_user', True)
+            print(f"你的身份是: 【{ROLE_CN_MAP.get(role, role)}】")
+        else:
+            if saved["is_user"]:
+                provider_config = API_PROVIDERS["modelscope"]
+                saved = {"model_name": MODEL_LIST["qwen_vl"], "base_url": provider_config["base_url"]}
+            # 检查点中不保存 API Key，按 base_url 找回服务商
+            base_url = saved["base_url"].rstrip("/")
+            provider_config = next((p for p in API_PROVIDERS.values() if p.get("base_url", "").rstrip("/") == base_url),
+                                   API_PROVIDERS["modelscope"])
+            model_config = {
+                "model_name": saved["model_name"],
+                "api_key": provider_config["api_key"],
+                "base_url": base_url or provider_config["base_url"],
+            }
+            agent = agent_pool.acquire(role=role, model_config=model_config, agent_id=int(name.rsplit("_", 1)[1]))
+            setattr(agent, 'is_user', False)
+        agent.name = name
+        setattr(agent, 'role', role)
+        players.append(agent)
+
+    qwen_model, summary_model = create_referee_models()
+    return GameMasterAgent(
+        players=players,
+        player_identities=identities,
         model=qwen_model,
-        summary_model=summary_model  # 传入专门的摘要模型
+        summary_model=summary_model,
+        checkpoint=checkpoint,
     )
 
-    # 4. 在游戏开始前，向所有狼人（包括AI）通知队友
-    await game_master.notify_werewolves_of_teammates()
+
+async def setup_and_run_game(resume_path: Optional[str] = None):
+    """封装一局游戏的设置和运行；指定 resume_path 时从该检查点继续"""
+    from agents.user_agent import create_user_agent
+
+    if resume_path:
+        print(f"\n\n===== 正在从检查点恢复游戏: {resume_path} =====")
+        game_master = resume_game(resume_path, create_user_agent())
+        # AI 的对话记忆中已有队友信息，只需重新告知人类玩家
+        await game_master.notify_werewolves_of_teammates(users_only=True)
+    else:
+        print("\n\n===== 正在准备新的一局游戏... =====")
+        game_master = create_game(create_user_agent())
+        if game_master is None:
+            return
+
+        # 4. 在游戏开始前，向所有狼人（包括AI）通知队友
+        await game_master.notify_werewolves_of_teammates()
 
     # 5. 启动游戏
     try:
@@ -112,12 +213,19 @@ async def setup_and_run_game():
         print(f"\n游戏运行出现异常: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        # 无论游戏是否异常结束，都确保已排队的日志落盘
+        await log_writer.aflush(fsync=True)
+        release_players(game_master)
 
-async def main() -> None:
-    """游戏主循环，包含重玩逻辑"""
+async def main(resume: Optional[str] = None) -> None:
+    """游戏主循环，包含重玩逻辑；resume 为检查点路径时第一局从检查点继续"""
+    memory_profiler.start() # 仅在 MEMORY_PROFILE 开启时生效
     while True:
+        # 只有第一局从检查点继续；检查点损坏或恢复的对局出错时，重玩也开始新的一局而不是反复恢复
+        resume_path, resume = resume, None
         try:
-            await setup_and_run_game()
+            await setup_and_run_game(resume_path)
         except Exception as e:
             print(f"\n游戏设置或运行期间发生严重错误: {e}")
             import traceback
@@ -127,6 +235,21 @@ async def main() -> None:
         if play_again.lower().strip() != 'y':
             print("感谢游玩，再见！")
             break
+    from agents.agent_pool import agent_pool
+    await agent_pool.aclose()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="狼人杀")
+    parser.add_argument("--resume", nargs="?", const="latest", metavar="CHECKPOINT",
+                        help="从检查点继续上一局（不指定路径时使用最近的检查点）")
+    parser.add_argument("--seed", type=int, help="随机种子：第一局使用该种子，之后各局由它派生（见 seeding.py）")
+    args = parser.parse_args()
+    if args.seed is not None:
+        SEEDING.update({"seed": args.seed})
+
+    resume = args.resume
+    if resume == "latest":
+        resume = latest_checkpoint()
+        if resume is None:
+            print("没有找到检查点，开始新的一局。")
+    asyncio.run(main(resume))
@@ -0,0 +1,252 @@
+# werewolf_game/mem_profiler.py
+"""
+内存增长分析模式。
+
+开启后（MEMORY_PROFILE["enabled"] = True），在每天开始和每局结束时用 tracemalloc
+拍摄快照，报告：
+- 与上一个快照相比新增内存最多的分配位置
+- 各个数据结构的大小（Agent 记忆、历史记录、日志缓冲、统计记录等）
+- 跨局的单调增长：某项指标在连续若干局结束时持续增长时给出警告
+
+报告写入 logs/memory_profile_*.txt，游戏边界的摘要同时打印到控制台。
+分析模式会让游戏明显变慢，只用于排查长时间运行的进程内存增长问题。
+"""
+import gc
+import os
+import sys
+import datetime
+import tracemalloc
+from typing import Dict, List, Optional
+
+from logger import LOG_DIR, log_writer, register_long_lived_log
+
+try:
+    from configs import MEMORY_PROFILE
+except ImportError:
+    MEMORY_PROFILE = {}
+
+# 默认配置，configs.py 中的 MEMORY_PROFILE 会覆盖同名字段
+DEFAULT_MEMORY_PROFILE_CONFIG = {
+    "enabled": False,
+    # 报告中列出的分配位置数量
+    "top_n": 15,
+    # tracemalloc 保存的调用栈深度，越深越慢
+    "frames": 1,
+    # 连续多少局结束时持续增长才视为单调增长（每局数据本身有波动，过小容易误报）
+    "growth_games": 5,
+}
+
+# 计算单个结构大小时最多遍历的对象数，避免误入模型客户端等庞大的对象图
+_MAX_OBJECTS = 200000
+
+
+def get_memory_profile_config() -> Dict:
+    """合并默认配置与 configs.py 中的 MEMORY_PROFILE。"""
+    config = dict(DEFAULT_MEMORY_PROFILE_CONFIG)
+    config.update(MEMORY_PROFILE)
+    return config
+
+
+def deep_sizeof(obj, seen: Optional[set] = None) -> int:
+    """
+    递归估算对象及其引用对象占用的字节数。
+
+    会遍历容器和普通对象的 __dict__ / __slots__，跳过模块、类和函数；
+    同一个对象只计算一次。
+    """
+    if seen is None:
+        seen = set()
+    size = 0
+    stack = [obj]
+    while stack and len(seen) < _MAX_OBJECTS:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, (type, type(sys), type(deep_sizeof))):
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current, 0)
+        if isinstance(current, (str, bytes, int, float, bool, type(None))):
+            continue
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        else:
+            if hasattr(current, "__dict__"):
+                stack.append(current.__dict__)
+            for slot in getattr(type(current), "__slots__", ()):
+                if hasattr(current, slot):
+                    stack.append(getattr(current, slot))
+    return size
+
+
+def _group_by_line(snapshot: tracemalloc.Snapshot) -> Dict[str, tuple]:
+    """
+    按分配位置汇总快照，返回 {位置: (字节数, 分配次数)}。
+
+    去掉 tracemalloc 自身和导入机制的分配。汇总结果会被缓存下来，
+    与下一个快照对比时不必重新分组（Snapshot.compare_to 每次都会重新分组两个快照）。
+    """
+    grouped = {}
+    for stat in snapshot.statistics("lineno"):
+        frame = stat.traceback[0]
+        if frame.filename == tracemalloc.__file__ or frame.filename.startswith("<frozen importlib"):
+            continue
+        grouped[f"{frame.filename}:{frame.lineno}"] = (stat.size, stat.count)
+    return grouped
+
+
+def _diff_top(current: Dict[str, tuple], previous: Dict[str, tuple], limit: int) -> List[tuple]:
+    """返回变化最大的 limit 个位置：[(位置, 字节变化, 次数变化), ...]。"""
+    diffs = []
+    for key in current.keys() | previous.keys():
+        size, count = current.get(key, (0, 0))
+        old_size, old_count = previous.get(key, (0, 0))
+        if size != old_size:
+            diffs.append((key, size - old_size, count - old_count))
+    diffs.sort(key=lambda item: -abs(item[1]))
+    return diffs[:limit]
+
+
+class MemoryProfiler:
+    """
+    tracemalloc 快照与结构大小的收集器。
+
+    用法：
+        memory_profiler.snapshot("第 2 天", game_master)   # 每天开始时
+        memory_profiler.game_boundary(game_master)         # 每局结束时
+    """
+
+    def __init__(self) -> None:
+        self.config = get_memory_profile_config()
+        self.enabled = self.config.get("enabled", False)
+        self.log_filename = ""
+        self.games = 0
+        self.history: List[Dict[str, int]] = []
+        self._last_stats: Optional[Dict[str, tuple]] = None
+        self._game_stats: Optional[Dict[str, tuple]] = None
+
+    def enable(self, enabled: bool = True) -> None:
+        """在运行时开启或关闭分析模式（如基准测试的 --memory 参数）。"""
+        self.enabled = enabled
+
+    def start(self) -> None:
+        """开始跟踪内存分配；未开启分析模式时不做任何事。"""
+        if not self.enabled or tracemalloc.is_tracing():
+            return
+        tracemalloc.start(self.config.get("frames", 1))
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.log_filename = f"memory_profile_{timestamp}.txt"
+        register_long_lived_log(self.log_filename)
+
+    def structure_sizes(self, game_master=None) -> Dict[str, int]:
+        """计算各个受关注数据结构的大小（字节）。"""
+        from logger import game_logger, prompt_logger
+        from call_metrics import call_metrics
+        from prompt_budget import prompt_stats
+        from tracing import tracer
+
+        sizes = {
+            "game_logger.log_entries": deep_sizeof(game_logger.log_entries),
+            "prompt_logger.dedup_state": deep_sizeof([prompt_logger._seen_chunks, prompt_logger._bases]),
+            "call_metrics.records": deep_sizeof(call_metrics.records),
+            "prompt_stats.records": deep_sizeof(prompt_stats.records),
+            "tracer.events": deep_sizeof(tracer.events),
+        }
+        if game_master is not None:
+            state = game_master.game_state
+            agents = [info["agent"] for info in state["players"].values()]
+            sizes["agent_memory"] = sum(deep_sizeof(getattr(agent, "memory", None)) for agent in agents)
+            sizes["game_master.memory"] = deep_sizeof(getattr(game_master, "memory", None))
+            sizes["full_history"] = deep_sizeof(state["full_history"])
+            sizes["discussion_history"] = deep_sizeof(state["discussion_history"])
+            sizes["memory_summaries"] = sum(deep_sizeof(info["memory_summary"]) for info in state["players"].values())
+        return sizes
+
+    def snapshot(self, label: str, game_master=None) -> Optional[str]:
+        """
+        拍摄一次快照并写入报告。
+
+        Args:
+            label (str): 快照标签，如 "第 3 天"
+            game_master (GameMasterAgent, optional): 当前的裁判，用于统计游戏内的数据结构
+
+        Returns:
+            Optional[str]: 报告文本；未开启分析模式时返回 None
+        """
+        if not self.enabled:
+            return None
+        self.start()
+        current = _group_by_line(tracemalloc.take_snapshot())
+        traced, peak = tracemalloc.get_traced_memory()
+        lines = [f"===== 内存快照: {label} =====",
+                 f"tracemalloc 当前 {traced / 1024 / 1024:.2f} MB, 峰值 {peak / 1024 / 1024:.2f} MB"]
+
+        lines.append("[数据结构大小]")
+        for name, size in sorted(self.structure_sizes(game_master).items(), key=lambda item: -item[1]):
+            lines.append(f"  {name:<28} {size / 1024:>10.1f} KB")
+
+        top_n = self.config.get("top_n", 15)
+        if self._last_stats is not None:
+            lines.append(f"[相比上一个快照变化最大的 {top_n} 个分配位置]")
+            for location, size_diff, count_diff in _diff_top(current, self._last_stats, top_n):
+                lines.append(f"  {size_diff / 1024:>+10.1f} KB  {count_diff:>+7} 个  {location}")
+        else:
+            lines.append(f"[占用最多的 {top_n} 个分配位置]")
+            for location, (size, count) in sorted(current.items(), key=lambda item: -item[1][0])[:top_n]:
+                lines.append(f"  {size / 1024:>10.1f} KB  {count:>7} 个  {location}")
+        self._last_stats = current
+
+        report = "\n".join(lines)
+        log_writer.write(os.path.join(LOG_DIR, self.log_filename), report + "\n\n")
+        return report
+
+    def game_boundary(self, game_master=None) -> Optional[str]:
+        """
+        在一局结束时调用：回收垃圾后拍摄快照，并检查跨局的单调增长。
+
+        Returns:
+            Optional[str]: 游戏边界的摘要；未开启分析模式时返回 None
+        """
+        if not self.enabled:
+            return None
+        gc.collect()
+        self.games += 1
+        self.snapshot(f"第 {self.games} 局结束", game_master)
+
+        from agentscope.model import ChatModelBase
+        traced, _ = tracemalloc.get_traced_memory()
+        record = {"tracemalloc_total": traced}
+        record.update(self.structure_sizes())  # 跨局持续存在的全局结构
+        record["live_model_clients"] = sum(1 for obj in gc.get_objects() if isinstance(obj, ChatModelBase))
+        self.history.append(record)
+
+        summary = [f"[内存分析] 第 {self.games} 局结束: tracemalloc {traced / 1024 / 1024:.2f} MB, "
+                   f"存活模型客户端 {record['live_model_clients']} 个"]
+        if self._game_stats is not None:
+            summary.append("  与上一局结束时相比变化最大的分配位置:")
+            for location, size_diff, _ in _diff_top(self._last_stats, self._game_stats, 5):
+                summary.append(f"    {size_diff / 1024:>+10.1f} KB  {location}")
+        self._game_stats = self._last_stats
+
+        for name in self.growing_metrics():
+            values = [record[name] for record in self.history[-self.config.get("growth_games", 5):]]
+            summary.append(f"  ⚠️ {name} 在最近 {len(values)} 局中持续增长: {values}")
+
+        text = "\n".join(summary)
+        print(text)
+        log_writer.write(os.path.join(LOG_DIR, self.log_filename), text + "\n\n")
+        return text
+
+    def growing_metrics(self) -> List[str]:
+        """返回在最近 growth_games 局结束时严格单调增长的指标。"""
+        window = self.config.get("growth_games", 5)
+        if len(self.history) < window:
+            return []
+        recent = self.history[-window:]
+        return [name for name in recent[-1]
+                if all(recent[i][name] < recent[i + 1][name] for i in range(window - 1))]
+
+
+# 创建一个全局的分析器实例，方便在其他模块中导入和使用
+memory_profiler = MemoryProfiler()
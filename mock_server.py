@@ -0,0 +1,489 @@
+# werewolf_game/mock_server.py
+"""
+本地的 OpenAI 兼容模拟服务器，用于无网络、可复现的压测和基准测试。
+
+实现了 OpenAIChatModel 使用的 /v1/chat/completions 接口（含流式 SSE 输出）
+和 /v1/models。回复按 prompt 中的任务格式自动生成合法答案（投票、查验、
+用药、开枪、发言、记忆总结），也可以用正则脚本指定回复；延迟分布、
+输出速率、<think> 块比例，以及 429 限流、超时和格式错误输出都可以配置注入。
+
+使用方法：
+    python mock_server.py --port 8765
+然后在 configs.py 中把 API_PROVIDERS 的 base_url 指向 http://127.0.0.1:8765/v1
+（或直接使用 AGENT_CONFIG 中 provider 为 "mock" 的配置）。
+
+只依赖标准库 asyncio，单进程即可承载数百局并发游戏的请求。
+"""
+import re
+import sys
+import json
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+import threading
+from http import HTTPStatus
+from typing import Dict, List, Optional, Tuple
+
+from prompt_budget import count_tokens
+
+try:
+    from configs import MOCK_SERVER
+except ImportError:
+    MOCK_SERVER = {}
+
+# 默认配置，configs.py 中的 MOCK_SERVER 会覆盖同名字段
+DEFAULT_MOCK_CONFIG = {
+    "host": "127.0.0.1",
+    "port": 8765,
+    # 随机种子：同样的请求内容总是得到同样的回复和延迟，与并发顺序无关
+    "seed": 0,
+    # 首个 token 之前的延迟分布（秒）
+    # fixed: {"value"}；uniform: {"low", "high"}；lognormal: {"median", "sigma"}；normal: {"mean", "std"}
+    "latency": {"dist": "lognormal", "median": 0.8, "sigma": 0.4},
+    # 输出速率（token/秒），0 表示一次性输出
+    "tokens_per_second": 60,
+    # 回复前附带 <think> 块的概率
+    "think_ratio": 0.3,
+    # 投票时弃票的概率
+    "abstain_ratio": 0.05,
+    # 故障注入概率
+    "faults": {
+        "rate_limit": 0.0,   # 返回 HTTP 429
+        "timeout": 0.0,      # 挂起 timeout_seconds 秒后才返回
+        "malformed": 0.0,    # 返回不符合任务格式的内容（未闭合的 <think>、缺少答案行等）
+    },
+    "timeout_seconds": 120,
+    # 是否支持 response_format（结构化输出）；False 时对带 response_format 的请求返回 HTTP 400
+    "structured_output": True,
+    # 脚本回复：按顺序匹配最后一条用户消息，命中时使用 reply（可用 {target} 代表随机候选玩家）
+    # 例如 [{"match": "我查验", "reply": "我查验: Player_3"}]
+    "script": [],
+    # 按模型ID覆盖以上任意字段，例如 {"deepseek-ai/DeepSeek-R1-0528": {"think_ratio": 1.0}}
+    "models": {},
+}
+
+_PLAYER_PATTERN = re.compile(r"Player_\d+")
+_SELF_PATTERN = re.compile(r"你是\s*(Player_\d+)")
+
+
+def get_mock_config(overrides: Optional[Dict] = None) -> Dict:
+    """合并默认配置、configs.py 中的 MOCK_SERVER 和调用方传入的覆盖项。"""
+    config = dict(DEFAULT_MOCK_CONFIG)
+    config.update(MOCK_SERVER)
+    if overrides:
+        config.update(overrides)
+    config["faults"] = {**DEFAULT_MOCK_CONFIG["faults"], **config.get("faults", {})}
+    return config
+
+
+def _model_config(config: Dict, model: str) -> Dict:
+    """取出某个模型生效的配置。"""
+    override = config.get("models", {}).get(model)
+    if not override:
+        return config
+    merged = dict(config)
+    merged.update(override)
+    merged["faults"] = {**config["faults"], **override.get("faults", {})}
+    return merged
+
+
+def sample_latency(spec: Dict, rng: random.Random) -> float:
+    """按配置的分布采样一次延迟（秒）。"""
+    dist = spec.get("dist", "fixed")
+    if dist == "uniform":
+        value = rng.uniform(spec.get("low", 0.0), spec.get("high", 1.0))
+    elif dist == "lognormal":
+        import math
+        value = rng.lognormvariate(math.log(max(spec.get("median", 1.0), 1e-6)), spec.get("sigma", 0.5))
+    elif dist == "normal":
+        value = rng.gauss(spec.get("mean", 1.0), spec.get("std", 0.2))
+    else:
+        value = spec.get("value", 0.0)
+    return max(value, 0.0)
+
+
+def _message_text(message: Dict) -> str:
+    """把 OpenAI 消息的 content（字符串或内容块列表）转为文本。"""
+    content = message.get("content")
+    if isinstance(content, list):
+        return "\n".join(block.get("text", "") for block in content if isinstance(block, dict))
+    return str(content or "")
+
+
+# 要求回复的部分的标题；女巫救人的 prompt 没有"你的任务"，以"当前情况"结尾
+_TASK_HEADERS = ("=== 你的任务 ===", "=== 当前情况 ===")
+
+
+def _task_section(prompt: str) -> Optional[str]:
+    """prompt 最后一个任务标题之后的部分；没有任务标题（如记忆摘要）时为 None。"""
+    position = max(prompt.rfind(header) for header in _TASK_HEADERS)
+    return prompt[position:] if position >= 0 else None
+
+
+def _candidates(prompt: str) -> Tuple[Optional[str], List[str]]:
+    """从 prompt 的任务部分提取候选玩家，排除自己。"""
+    self_match = _SELF_PATTERN.search(prompt)
+    self_name = self_match.group(1) if self_match else None
+    task = _task_section(prompt) or prompt
+    names = list(dict.fromkeys(_PLAYER_PATTERN.findall(task))) or list(dict.fromkeys(_PLAYER_PATTERN.findall(prompt)))
+    return self_name, [name for name in names if name != self_name] or names
+
+
+def classify_prompt(prompt: str) -> str:
+    """
+    根据 prompt 中要求的回复格式判断决策类型。只看任务部分：
+    记忆摘要和发言回顾中引用的其他决策（如狼人遗言里的击杀记录）不影响判断。
+    """
+    task = _task_section(prompt)
+    if task is None:
+        return "summary" if "总结" in prompt or "摘要" in prompt else "speech"
+    if "我们决定淘汰" in task:
+        return "wolf_kill"
+    if "我查验" in task:
+        return "seer_check"
+    if "使用解药" in task:
+        return "witch_save"
+    if "我毒杀" in task:
+        return "witch_poison"
+    if "我投票给" in task:
+        return "vote"
+    if "我开枪带走" in task:
+        return "hunter_shot"
+    if "击杀目标" in task:
+        return "wolf_discussion"
+    if "遗言" in task or "最后一段发言" in task:
+        return "last_words"
+    if "总结" in task or "摘要" in task:
+        return "summary"
+    return "speech"
+
+
+def rule_based_answer(prompt: str, rng: random.Random, config: Dict) -> str:
+    """为每种决策类型生成一个合法回复。"""
+    self_name, names = _candidates(prompt)
+    target = rng.choice(names) if names else "Player_1"
+    kind = classify_prompt(prompt)
+    if kind == "wolf_kill":
+        return f"我们决定淘汰: {target}"
+    if kind == "seer_check":
+        return f"我查验: {target}"
+    if kind == "witch_save":
+        return rng.choice(["使用解药", "不使用解药"])
+    if kind == "witch_poison":
+        return f"我毒杀: {target}" if rng.random() < 0.3 else "不使用"
+    if kind == "vote":
+        return "弃票" if rng.random() < config.get("abstain_ratio", 0.0) else f"我投票给: {target}"
+    if kind == "hunter_shot":
+        return f"我开枪带走: {target}"
+    if kind == "wolf_discussion":
+        return f"我建议今晚击杀 {target}，他白天的发言很像神职。"
+    if kind == "last_words":
+        return f"我是好人，请大家重点关注 {target}。"
+    if kind == "summary":
+        return f"目前局势：{target} 的发言前后矛盾，值得怀疑；其余玩家暂无明显破绽。"
+    return f"我是 {self_name or '好人'}。我觉得 {target} 的发言有些可疑，建议大家多关注一下。"
+
+
+def structured_answer(prompt: str, response_format: Dict, rng: random.Random, config: Dict) -> str:
+    """按 response_format 生成 JSON 回复；json_schema 模式下目标取自 schema 中的候选。"""
+    kind = classify_prompt(prompt)
+    schema = (response_format.get("json_schema") or {}).get("schema") or {}
+    properties = schema.get("properties", {})
+    actions = properties.get("action", {}).get("enum") or [kind]
+    if "use" in properties or kind == "witch_save":
+        return json.dumps({"action": actions[0], "use": rng.random() < 0.5})
+    names = [name for name in properties.get("target", {}).get("enum", []) if name] or _candidates(prompt)[1]
+    target = rng.choice(names) if names else "Player_1"
+    if kind == "vote" and rng.random() < config.get("abstain_ratio", 0.0):
+        target = None
+    if kind == "witch_poison" and rng.random() >= 0.3:
+        target = None
+    return json.dumps({"action": actions[0], "target": target}, ensure_ascii=False)
+
+
+def malformed_answer(prompt: str, rng: random.Random) -> str:
+    """生成不符合任务格式的回复，用于测试解析的健壮性。"""
+    _, names = _candidates(prompt)
+    target = rng.choice(names) if names else "Player_1"
+    return rng.choice([
+        f"<think>我需要好好想想，{target} 很可疑，但是",
+        f"{target}(thinking): 让我分析一下局势……",
+        f"<think><think>{target}</think> 我的答案是 {target[-1]} 号",
+        "嗯……这个问题比较复杂，我暂时无法决定。",
+        json.dumps({"speak": f"{target}?", "thought": "unsure"}, ensure_ascii=False),
+    ])
+
+
+class MockChatServer:
+    """
+    OpenAI 兼容的模拟服务器。
+
+    用法：
+        server = MockChatServer({"latency": {"dist": "fixed", "value": 0}})
+        await server.start()          # 在当前事件循环中运行
+        ...
+        await server.stop()
+
+        server.start_in_thread()      # 或在后台线程中运行（供同步代码和基准测试使用）
+    """
+
+    def __init__(self, overrides: Optional[Dict] = None) -> None:
+        self.config = get_mock_config(overrides)
+        self.stats: Dict[str, int] = {"requests": 0, "rate_limited": 0, "timeouts": 0, "malformed": 0, "streamed": 0, "structured": 0}
+        self._server: Optional[asyncio.base_events.Server] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._writers = set()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.config['host']}:{self.config['port']}/v1"
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_connection, self.config["host"], self.config["port"])
+        # 端口为 0 时使用系统分配的端口
+        self.config["port"] = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            # 关闭空闲的 keep-alive 连接，否则 wait_closed 会一直等待
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def start_in_thread(self) -> str:
+        """在后台线程的独立事件循环中启动，返回 base_url。"""
+        ready = threading.Event()
+
+        def run() -> None:
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.start())
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="mock-chat-server", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self.base_url
+
+    def stop_thread(self) -> None:
+        """停止 start_in_thread 启动的服务器。"""
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
+
+    # ---------------- HTTP 处理 ----------------
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """处理一个 HTTP/1.1 连接，支持 keep-alive。"""
+        self._writers.add(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0) or 0))
+                path = path.split("?", 1)[0]
+
+                if method == "GET" and path.rstrip("/").endswith("/models"):
+                    await self._send_json(writer, 200, self._models_payload())
+                elif method == "POST" and path.rstrip("/").endswith("/chat/completions"):
+                    await self._handle_chat(writer, json.loads(body or b"{}"))
+                else:
+                    await self._send_json(writer, 404, {"error": {"message": f"Unknown path {path}", "type": "not_found"}})
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, asyncio.CancelledError, ConnectionError, ValueError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    def _models_payload(self) -> Dict:
+        try:
+            from configs import MODEL_LIST
+        except ImportError:
+            MODEL_LIST = {}
+        models = list(MODEL_LIST.values()) or ["mock-model"]
+        return {"object": "list", "data": [{"id": m, "object": "model", "owned_by": "mock"} for m in models]}
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, payload: Dict) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        try:
+            reason = HTTPStatus(status).phrase
+        except ValueError:
+            reason = "Error"
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\nConnection: keep-alive\r\n\r\n".encode("latin-1") + data
+        )
+        await writer.drain()
+
+    async def _send_chunk(self, writer: asyncio.StreamWriter, text: str) -> None:
+        data = text.encode("utf-8")
+        writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+        await writer.drain()
+
+    async def _handle_chat(self, writer: asyncio.StreamWriter, request: Dict) -> None:
+        model = request.get("model", "mock-model")
+        messages = request.get("messages", [])
+        config = _model_config(self.config, model)
+        prompt = next((_message_text(m) for m in reversed(messages) if m.get("role") == "user"), "")
+        # 以请求内容为种子，保证回复与并发顺序无关
+        digest = hashlib.blake2b(json.dumps(messages, ensure_ascii=False, sort_keys=True).encode("utf-8"), digest_size=8).hexdigest()
+        rng = random.Random(f"{config['seed']}:{model}:{digest}")
+        self.stats["requests"] += 1
+
+        faults = config["faults"]
+        roll = rng.random()
+        if roll < faults.get("rate_limit", 0.0):
+            self.stats["rate_limited"] += 1
+            await self._send_json(writer, 429, {"error": {
+                "message": "Rate limit exceeded (429), please retry later.",
+                "type": "rate_limit_error", "code": "429",
+            }})
+            return
+        roll -= faults.get("rate_limit", 0.0)
+        if roll < faults.get("timeout", 0.0):
+            self.stats["timeouts"] += 1
+            await asyncio.sleep(config.get("timeout_seconds", 120))
+        roll -= faults.get("timeout", 0.0)
+
+        response_format = request.get("response_format")
+        if response_format and not config.get("structured_output", True):
+            await self._send_json(writer, 400, {"error": {
+                "message": f"response_format is not supported by model {model}",
+                "type": "invalid_request_error", "code": "400",
+            }})
+            return
+
+        if roll < faults.get("malformed", 0.0):
+            self.stats["malformed"] += 1
+            answer = malformed_answer(prompt, rng)
+        elif response_format:
+            self.stats["structured"] += 1
+            answer = structured_answer(prompt, response_format, rng, config)
+        else:
+            answer = self._scripted_answer(prompt, rng, config) or rule_based_answer(prompt, rng, config)
+            if rng.random() < config.get("think_ratio", 0.0):
+                answer = f"<think>先回顾一下场上的信息，再给出答案。</think>{answer}"
+
+        await asyncio.sleep(sample_latency(config.get("latency", {}), rng))
+
+        usage = {
+            "prompt_tokens": sum(count_tokens(_message_text(m)) for m in messages),
+            "completion_tokens": count_tokens(answer),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        completion_id = f"chatcmpl-mock-{digest}"
+        created = int(time.time())
+
+        if not request.get("stream"):
+            await self._send_json(writer, 200, {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        self.stats["streamed"] += 1
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Transfer-Encoding: chunked\r\nConnection: keep-alive\r\n\r\n")
+
+        def event(delta: Dict, finish_reason: Optional[str] = None, extra: Optional[Dict] = None) -> str:
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            if extra:
+                chunk.update(extra)
+            return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+
+        await self._send_chunk(writer, event({"role": "assistant", "content": ""}))
+        tokens_per_second = config.get("tokens_per_second", 0)
+        pieces = self._split_tokens(answer, 4 if tokens_per_second else len(answer) or 1)
+        for piece in pieces:
+            if tokens_per_second:
+                await asyncio.sleep(count_tokens(piece) / tokens_per_second)
+            await self._send_chunk(writer, event({"content": piece}))
+        await self._send_chunk(writer, event({}, finish_reason="stop"))
+        if (request.get("stream_options") or {}).get("include_usage"):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                     "model": model, "choices": [], "usage": usage}
+            await self._send_chunk(writer, f"data: {json.dumps(chunk)}\n\n")
+        await self._send_chunk(writer, "data: [DONE]\n\n")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    def _scripted_answer(self, prompt: str, rng: random.Random, config: Dict) -> Optional[str]:
+        for rule in config.get("script", []):
+            if re.search(rule["match"], prompt):
+                _, names = _candidates(prompt)
+                return rule["reply"].replace("{target}", rng.choice(names) if names else "Player_1")
+        return None
+
+    @staticmethod
+    def _split_tokens(text: str, size: int) -> List[str]:
+        """按字符把回复切成流式输出的小块。"""
+        return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容模拟服务器")
+    parser.add_argument("--host", help="监听地址")
+    parser.add_argument("--port", type=int, help="监听端口")
+    parser.add_argument("--seed", type=int, help="随机种子")
+    parser.add_argument("--latency", type=float, help="固定延迟（秒），覆盖配置中的延迟分布")
+    parser.add_argument("--tps", type=float, help="流式输出速率（token/秒）")
+    parser.add_argument("--rate-limit", type=float, help="429 注入概率")
+    parser.add_argument("--timeout", type=float, help="超时注入概率")
+    parser.add_argument("--malformed", type=float, help="格式错误输出注入概率")
+    args = parser.parse_args()
+
+    overrides: Dict = {}
+    for key, value in [("host", args.host), ("port", args.port), ("seed", args.seed), ("tokens_per_second", args.tps)]:
+        if value is not None:
+            overrides[key] = value
+    if args.latency is not None:
+        overrides["latency"] = {"dist": "fixed", "value": args.latency}
+    faults = {k: v for k, v in [("rate_limit", args.rate_limit), ("timeout", args.timeout), ("malformed", args.malformed)] if v is not None}
+    if faults:
+        overrides["faults"] = faults
+
+    server = MockChatServer(overrides)
+
+    async def serve() -> None:
+        await server.start()
+        print(f"模拟服务器已启动: {server.base_url}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await server.stop()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print(f"\n已停止。请求统计: {server.stats}")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# werewolf_game/model_probe.py
+"""
+开局前的模型探测：在第一晚之前，对本局用到的每个不同的模型（座位、裁判、摘要模型）
+并发发送一个极短的请求：
+
+- 预热：首次调用的开销（导入 openai 的接口模块、建立连接）不再落在夜晚的关键路径上
+- 测量基线延迟，写入游戏日志和事件日志（model_probe 事件）
+- 发现限流（429）、报错、超时或过慢的模型，开局前就把座位换到健康的模型上，
+  避免游戏中途才触发切换；游戏中遇到 429 切换模型时也会避开这些模型
+
+同一个模型（模型ID + 服务地址）只探测一次，用第一个使用它的座位的模型实例。
+"""
+import time
+import asyncio
+from typing import Any, Dict, List, Tuple
+
+try:
+    from configs import MODEL_PROBE
+except ImportError:
+    MODEL_PROBE = {}
+
+# 默认配置，configs.py 中的 MODEL_PROBE 会覆盖同名字段
+DEFAULT_MODEL_PROBE_CONFIG = {
+    "enabled": True,
+    # 单个模型的探测超时（秒），超时视为不健康
+    "timeout": 20.0,
+    # 基线延迟超过该值（秒）时视为不健康；None 表示不按延迟判断
+    "max_latency": None,
+    # 是否把不健康模型上的座位换到健康的模型
+    "reassign": True,
+    "prompt": "ping",
+    "max_tokens": 1,
+}
+
+STATUS_OK = "ok"
+STATUS_RATE_LIMITED = "rate_limited"
+STATUS_ERROR = "error"
+STATUS_TIMEOUT = "timeout"
+STATUS_SLOW = "slow"
+
+
+def get_model_probe_config() -> Dict:
+    """合并默认配置与 configs.py 中的 MODEL_PROBE。"""
+    config = dict(DEFAULT_MODEL_PROBE_CONFIG)
+    config.update(MODEL_PROBE)
+    return config
+
+
+def model_identity(model: Any) -> Tuple[str, str]:
+    """模型的标识：(模型ID, 服务地址)。"""
+    client = getattr(model, "client", None)
+    return getattr(model, "model_name", "") or "", str(getattr(client, "base_url", "") or "")
+
+
+async def _send_probe(model: Any, config: Dict) -> None:
+    response = await model([{"role": "user", "content": config["prompt"]}], max_tokens=config["max_tokens"])
+    # 流式模式返回异步生成器，读完才算完成一次请求
+    if hasattr(response, "__aiter__"):
+        async for _ in response:
+            pass
+
+
+async def probe_model(model: Any, config: Dict) -> Dict:
+    """
+    探测一个模型。
+
+    Returns:
+        Dict: {"model", "base_url", "status", "latency", "error"}，latency 单位为秒
+    """
+    model_name, base_url = model_identity(model)
+    result = {"model": model_name, "base_url": base_url, "status": STATUS_OK, "latency": None, "error": None}
+    # 探测时不让 SDK 自动重试（429 会退避重试数秒），第一次失败就判定；副本共用同一个连接池，预热照样有效
+    client = getattr(model, "client", None)
+    if hasattr(client, "with_options"):
+        model.client = client.with_options(max_retries=0)
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(_send_probe(model, config), timeout=config["timeout"])
+        result["latency"] = round(time.perf_counter() - started, 3)
+        if config.get("max_latency") is not None and result["latency"] > config["max_latency"]:
+            result["status"] = STATUS_SLOW
+    except asyncio.TimeoutError:
+        result["status"] = STATUS_TIMEOUT
+    except Exception as e:
+        error_str = str(e)
+        is_rate_limit = getattr(e, "status_code", None) == 429 or "429" in error_str or "rate limit" in error_str.lower()
+        result["status"] = STATUS_RATE_LIMITED if is_rate_limit else STATUS_ERROR
+        result["error"] = error_str[:300]
+    finally:
+        if client is not None:
+            model.client = client
+    return result
+
+
+async def probe_models(models: List[Any], config: Dict) -> Dict[Tuple[str, str], Dict]:
+    """
+    并发探测一组模型实例，同一模型只探测一次。
+
+    Returns:
+        Dict[Tuple[str, str], Dict]: {model_identity: 探测结果}
+    """
+    unique: Dict[Tuple[str, str], Any] = {}
+    for model in models:
+        if model is not None:
+            unique.setdefault(model_identity(model), model)
+    results = await asyncio.gather(*(probe_model(model, config) for model in unique.values()))
+    return dict(zip(unique.keys(), results))
+
+
+def format_probe_results(results: Dict[Tuple[str, str], Dict]) -> str:
+    """把探测结果格式化为日志文本。"""
+    lines = ["===== 开局模型探测 ====="]
+    for result in sorted(results.values(), key=lambda r: (r["status"] != STATUS_OK, r["latency"] or 0)):
+        latency = f"{result['latency'] * 1000:.0f} ms" if result["latency"] is not None else "-"
+        error = f"，{result['error']}" if result["error"] else ""
+        lines.append(f"- {result['model']}: {result['status']}，{latency}{error}")
+    return "\n".join(lines)
@@ -0,0 +1,318 @@
+# werewolf_game/prompt_budget.py
+"""
+按调用点控制 Prompt 长度的组装工具。
+
+Prompt 由若干片段组成：固定片段（标题、任务说明）永不截断，
+可截断片段按优先级从低到高依次压缩，直到总 token 数落入预算。
+截断是确定性的：发言记录保留最新的若干条完整内容，更早的发言先被压缩，
+再被整体省略。
+
+AI 玩家的对话记忆每次调用都会整体发给模型，只保留最近的若干条（memory_messages），
+更早的内容已经在 prompt 的记忆摘要和发言记录中。
+"""
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from game_context import game_local
+
+try:
+    from configs import PROMPT_BUDGET
+except ImportError:
+    PROMPT_BUDGET = {}
+
+try:
+    from configs import MODEL_LIST
+except ImportError:
+    MODEL_LIST = {}
+
+# 默认配置，configs.py 中的 PROMPT_BUDGET 会覆盖同名字段
+DEFAULT_BUDGET_CONFIG = {
+    "enabled": True,
+    # 每个调用点的 token 预算
+    "budgets": {
+        "speech": 6000,
+        "vote": 4000,
+        "last_words": 4000,
+    },
+    # 按模型 key（MODEL_LIST 中的键）设置的上限，与调用点预算取较小值
+    "model_budgets": {},
+    # 发言记录中完整保留的最新条数
+    "keep_recent": 6,
+    # 较早发言压缩后保留的字符数
+    "compress_chars": 60,
+    # AI 玩家对话记忆保留的最近消息条数，None 表示不限制
+    "memory_messages": 24,
+    # 是否尝试使用 tiktoken 精确计数（需要本地已缓存编码文件）
+    "use_tiktoken": False,
+}
+
+# 中日韩字符：主流中文模型的分词器大约一字一 token
+_CJK_PATTERN = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]")
+
+_HISTOGRAM_BUCKETS = [500, 1000, 2000, 4000, 8000, 16000]
+
+_tiktoken_cache: Dict[str, object] = {}
+
+
+def get_budget_config() -> Dict:
+    """合并默认配置与 configs.py 中的 PROMPT_BUDGET。"""
+    config = dict(DEFAULT_BUDGET_CONFIG)
+    config.update(PROMPT_BUDGET)
+    # 只覆盖了部分调用点的预算时，其余调用点仍使用默认值
+    config["budgets"] = {**DEFAULT_BUDGET_CONFIG["budgets"], **PROMPT_BUDGET.get("budgets", {})}
+    return config
+
+
+def _get_tiktoken_encoding(model_name: str):
+    """按模型名获取 tiktoken 编码，失败时缓存 None，避免重复尝试。"""
+    if model_name in _tiktoken_cache:
+        return _tiktoken_cache[model_name]
+    encoding = None
+    try:
+        import tiktoken
+        encoding = tiktoken.encoding_for_model(model_name)
+    except Exception:
+        encoding = None
+    _tiktoken_cache[model_name] = encoding
+    return encoding
+
+
+def count_tokens(text: str, model_name: Optional[str] = None) -> int:
+    """
+    在本地估算文本的 token 数。
+
+    对 tiktoken 认识的模型（且配置开启时）使用精确编码；
+    其余模型按「中文一字一 token、其他字符四个一 token」估算。
+
+    Args:
+        text (str): 待计数的文本
+        model_name (str, optional): 目标模型的模型ID
+
+    Returns:
+        int: token 数
+    """
+    if not text:
+        return 0
+    if model_name and get_budget_config().get("use_tiktoken"):
+        encoding = _get_tiktoken_encoding(model_name)
+        if encoding is not None:
+            return len(encoding.encode(text))
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    return cjk_count + (len(text) - cjk_count + 3) // 4
+
+
+def resolve_budget(call_site: str, model_name: Optional[str] = None) -> Optional[int]:
+    """
+    计算某个调用点在指定模型下的 token 预算。
+
+    Returns:
+        Optional[int]: 预算值；未配置或功能关闭时返回 None
+    """
+    config = get_budget_config()
+    if not config.get("enabled"):
+        return None
+    budget = config.get("budgets", {}).get(call_site)
+    if model_name:
+        for key, model_id in MODEL_LIST.items():
+            if model_id == model_name and key in config.get("model_budgets", {}):
+                model_budget = config["model_budgets"][key]
+                budget = model_budget if budget is None else min(budget, model_budget)
+                break
+    return budget
+
+
+class _Section:
+    """Prompt 中的一个片段。priority 为 None 表示固定片段，不可截断。"""
+
+    def __init__(self, text: str = "", lines: Optional[List[str]] = None,
+                 priority: Optional[int] = None, keep: str = "head", empty_text: str = "") -> None:
+        self.text = text
+        self.lines = lines
+        self.priority = priority
+        self.keep = keep
+        self.empty_text = empty_text
+
+    def render(self) -> str:
+        if self.lines is not None:
+            return "\n".join(self.lines) if self.lines else self.empty_text
+        return self.text
+
+
+class PromptBuilder:
+    """
+    带 token 预算的 Prompt 组装器。
+
+    用法：
+        builder = PromptBuilder("vote", model_name)
+        builder.add_fixed("=== 标题 ===\\n")
+        builder.add_lines(discussion_lines, priority=3, empty_text="暂无发言。")
+        prompt = builder.build()
+
+    priority 数值越大越先被截断。
+    """
+
+    def __init__(self, call_site: str, model_name: Optional[str] = None, budget: Optional[int] = None) -> None:
+        self.call_site = call_site
+        self.model_name = model_name
+        self.budget = budget if budget is not None else resolve_budget(call_site, model_name)
+        self._sections: List[_Section] = []
+
+    def add_fixed(self, text: str) -> "PromptBuilder":
+        """添加不可截断的固定片段（标题、任务说明等）。"""
+        self._sections.append(_Section(text=text))
+        return self
+
+    def add_text(self, text: str, priority: int, keep: str = "head") -> "PromptBuilder":
+        """
+        添加可截断的文本片段。
+
+        Args:
+            text (str): 片段内容
+            priority (int): 截断优先级，越大越先截断
+            keep (str): 截断时保留开头("head")还是结尾("tail")
+        """
+        self._sections.append(_Section(text=text, priority=priority, keep=keep))
+        return self
+
+    def add_lines(self, lines: List[str], priority: int, empty_text: str = "") -> "PromptBuilder":
+        """
+        添加按行组织的记录片段（如发言记录），截断时优先压缩和省略较早的行。
+
+        Args:
+            lines (List[str]): 按时间顺序排列的记录
+            priority (int): 截断优先级，越大越先截断
+            empty_text (str): 没有记录时显示的文本
+        """
+        self._sections.append(_Section(lines=list(lines), priority=priority, empty_text=empty_text))
+        return self
+
+    def build(self) -> str:
+        """按预算截断后拼接出最终 Prompt，并记录 token 统计。"""
+        counts = [count_tokens(s.render(), self.model_name) for s in self._sections]
+        total = sum(counts)
+        truncated = False
+
+        if self.budget is not None and total > self.budget:
+            order = sorted(
+                (i for i, s in enumerate(self._sections) if s.priority is not None),
+                key=lambda i: (-self._sections[i].priority, i),
+            )
+            for index in order:
+                overflow = total - self.budget
+                if overflow <= 0:
+                    break
+                section = self._sections[index]
+                target = max(counts[index] - overflow, 0)
+                self._shrink(section, target)
+                new_count = count_tokens(section.render(), self.model_name)
+                total += new_count - counts[index]
+                counts[index] = new_count
+                truncated = True
+
+        prompt = "".join(s.render() for s in self._sections)
+        prompt_stats.record(self.call_site, total, truncated)
+        return prompt
+
+    def _shrink(self, section: _Section, target: int) -> None:
+        """把片段压缩到不超过 target 个 token。"""
+        if section.lines is not None:
+            self._shrink_lines(section, target)
+        else:
+            section.text = self._truncate_text(section.text, target, section.keep)
+
+    def _shrink_lines(self, section: _Section, target: int) -> None:
+        config = get_budget_config()
+        keep_recent = config.get("keep_recent", 6)
+        compress_chars = config.get("compress_chars", 60)
+        lines = section.lines
+        split = max(len(lines) - keep_recent, 0)
+
+        # 1. 压缩较早的记录，只保留开头若干字符
+        older = [line if len(line) <= compress_chars else line[:compress_chars] + "…" for line in lines[:split]]
+        recent = lines[split:]
+        section.lines = older + recent
+        if count_tokens(section.render(), self.model_name) <= target:
+            return
+
+        # 2. 从最早的记录开始整体省略
+        omitted = 0
+        while older:
+            older.pop(0)
+            omitted += 1
+            section.lines = [f"(更早的 {omitted} 条记录已省略)"] + older + recent
+            if count_tokens(section.render(), self.model_name) <= target:
+                return
+
+        # 3. 仍然超出预算时，保留最新的内容，截掉前面的部分
+        section.lines = [self._truncate_text(section.render(), target, "tail")]
+
+    def _truncate_text(self, text: str, target: int, keep: str) -> str:
+        """二分查找能放进 target 个 token 的最长前缀/后缀。"""
+        if count_tokens(text, self.model_name) <= target:
+            return text
+        low, high = 0, len(text)
+        while low < high:
+            mid = (low + high + 1) // 2
+            piece = text[:mid] + "…" if keep == "head" else "…" + text[-mid:]
+            if count_tokens(piece, self.model_name) <= target:
+                low = mid
+            else:
+                high = mid - 1
+        if low == 0:
+            return ""
+        return text[:low] + "…" if keep == "head" else "…" + text[-low:]
+
+
+class PromptStats:
+    """按调用点统计 Prompt 的 token 分布，用于生成直方图报告。"""
+
+    def __init__(self) -> None:
+        self.records: Dict[str, List[int]] = defaultdict(list)
+        self.truncated: Dict[str, int] = defaultdict(int)
+
+    def reset(self) -> None:
+        self.records.clear()
+        self.truncated.clear()
+
+    def record(self, call_site: str, tokens: int, truncated: bool) -> None:
+        self.records[call_site].append(tokens)
+        if truncated:
+            self.truncated[call_site] += 1
+
+    def histogram(self, call_site: str) -> Dict[str, int]:
+        """返回某个调用点的分桶计数，如 {"<=500": 3, "<=1000": 5, ">16000": 0}。"""
+        buckets = {f"<={edge}": 0 for edge in _HISTOGRAM_BUCKETS}
+        buckets[f">{_HISTOGRAM_BUCKETS[-1]}"] = 0
+        for tokens in self.records.get(call_site, []):
+            for edge in _HISTOGRAM_BUCKETS:
+                if tokens <= edge:
+                    buckets[f"<={edge}"] += 1
+                    break
+            else:
+                buckets[f">{_HISTOGRAM_BUCKETS[-1]}"] += 1
+        return buckets
+
+    def report(self) -> str:
+        """生成可读的直方图报告。"""
+        if not self.records:
+            return "[Prompt Token 统计]: 暂无记录"
+        lines = ["[Prompt Token 统计]"]
+        for call_site in sorted(self.records):
+            values = sorted(self.records[call_site])
+            p50 = values[len(values) // 2]
+            p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+            lines.append(
+                f"- {call_site}: 调用 {len(values)} 次, p50={p50}, p95={p95}, max={values[-1]}, "
+                f"截断 {self.truncated.get(call_site, 0)} 次"
+            )
+            hist = self.histogram(call_site)
+            peak = max(hist.values()) or 1
+            for bucket, count in hist.items():
+                if count:
+                    lines.append(f"    {bucket:>8} | {'#' * max(1, count * 30 // peak)} {count}")
+        return "\n".join(lines)
+
+
+# 创建一个全局的统计实例，方便在其他模块中导入和使用
+prompt_stats = game_local(PromptStats)
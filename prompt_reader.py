@@ -0,0 +1,113 @@
+# werewolf_game/prompt_reader.py
+"""
+还原内容寻址存储的 prompt 日志。
+
+用法:
+    python prompt_reader.py logs/prompt_log_20251224_105205.jsonl            # 列出所有prompt的标题
+    python prompt_reader.py logs/prompt_log_20251224_105205.jsonl -i 12      # 输出第12条prompt
+    python prompt_reader.py logs/prompt_log_20251224_105205.jsonl -t Player_3  # 输出标题包含Player_3的prompt
+    python prompt_reader.py logs/prompt_log_20251224_105205.jsonl --stats    # 统计去重效果
+"""
+import os
+import json
+import argparse
+from typing import Dict, Iterator, List, Tuple
+
+from logger import open_log_file
+
+
+def find_chunk_file(log_path: str) -> str:
+    """根据 prompt_log 文件路径找到对应的分块文件（兼容压缩后的文件名）。"""
+    directory, name = os.path.split(log_path)
+    base = name.replace("prompt_log_", "prompt_chunks_", 1)
+    for suffix in (".gz", ".zst"):
+        if base.endswith(suffix):
+            base = base[: -len(suffix)]
+    for suffix in ("", ".gz", ".zst"):
+        candidate = os.path.join(directory, base + suffix)
+        if os.path.exists(candidate):
+            return candidate
+    raise FileNotFoundError(f"找不到 {log_path} 对应的分块文件: {base}")
+
+
+def load_chunks(chunk_path: str) -> Dict[str, str]:
+    """读取分块文件，返回 {哈希: 行内容}。"""
+    chunks = {}
+    with open_log_file(chunk_path) as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                chunks[item["h"]] = item["t"]
+    return chunks
+
+
+def reconstruct(parts: List, chunks: Dict[str, str], base_lines: List[str]) -> List[str]:
+    """把记录中的 parts 列表还原成 prompt 的行列表。"""
+    lines = []
+    for part in parts:
+        if isinstance(part, list):
+            lines.extend(base_lines[part[0]:part[1]])
+        elif part.startswith("@@"):
+            lines.append(part[1:])
+        elif part.startswith("@"):
+            lines.append(chunks[part[1:]])
+        else:
+            lines.append(part)
+    return lines
+
+
+def iter_prompts(log_path: str) -> Iterator[Tuple[int, str, str]]:
+    """依次产出 (序号, 标题, 完整prompt)。"""
+    chunks = load_chunks(find_chunk_file(log_path))
+    # 只保留仍可能被引用为基准的 prompt（每种类型最新的一条）
+    latest_by_index: Dict[int, List[str]] = {}
+    with open_log_file(log_path) as f:
+        index = 0
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            base = record.get("base")
+            base_lines = latest_by_index.pop(base, []) if base is not None else []
+            lines = reconstruct(record["parts"], chunks, base_lines)
+            latest_by_index[index] = lines
+            yield index, record["title"], "".join(lines)
+            index += 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="还原去重存储的 prompt 日志")
+    parser.add_argument("log_path", help="prompt_log_*.jsonl 文件路径（支持 .gz/.zst）")
+    parser.add_argument("-i", "--index", type=int, help="只输出指定序号的prompt")
+    parser.add_argument("-t", "--title", help="只输出标题包含该文本的prompt")
+    parser.add_argument("--stats", action="store_true", help="输出存储大小与还原后大小的对比")
+    args = parser.parse_args()
+
+    if args.stats:
+        total_chars = 0
+        count = 0
+        for _, _, prompt in iter_prompts(args.log_path):
+            total_chars += len(prompt.encode("utf-8"))
+            count += 1
+        stored = os.path.getsize(args.log_path) + os.path.getsize(find_chunk_file(args.log_path))
+        ratio = total_chars / stored if stored else 0
+        print(f"prompt 数量: {count}")
+        print(f"还原后大小: {total_chars} 字节")
+        print(f"实际存储大小: {stored} 字节 (压缩比 {ratio:.1f}x)")
+        return
+
+    for index, title, prompt in iter_prompts(args.log_path):
+        if args.index is not None:
+            if index == args.index:
+                print(f"===== [{index}] {title} =====\n{prompt}\n===== END =====")
+                return
+            continue
+        if args.title is not None:
+            if args.title in title:
+                print(f"===== [{index}] {title} =====\n{prompt}\n===== END =====\n")
+            continue
+        print(f"[{index}] {title}")
+
+
+if __name__ == "__main__":
+    main()
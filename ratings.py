@@ -0,0 +1,401 @@
+# werewolf_game/ratings.py
+"""
+模型评分：每局结束后增量更新每个模型、每个（模型, 角色）的评分，保存在本地 SQLite 数据库
+（默认 logs/ratings.db），并给出置信区间，批量评测可以在评分足够确定时提前停止。
+
+评分采用 TrueSkill 式的贝叶斯更新：每个评分是正态分布 N(mu, sigma²)，一局游戏是狼人阵营
+与好人阵营两队之间的比赛，队伍表现取各 AI 座位表现的平均值（两队人数不同，按平均而不是求和），
+按胜负更新双方每个座位对应的评分。同一模型占多个座位时，各座位的更新累加到同一个评分上。
+按模型评分的两队中还各有一个"阵营"评分，吸收板子本身对某一方的偏向，不计入模型。
+人类座位不参与评分。
+
+使用方法：
+    python ratings.py show                           # 按模型的评分与置信区间
+    python ratings.py show --kind model_role         # 按（模型, 角色）
+    python ratings.py import-index                   # 从 log_index.py 的索引补录历史对局
+    python ratings.py run --max-games 200            # 全 AI 对局，评分足够确定时提前停止
+"""
+import os
+import math
+import time
+import asyncio
+import sqlite3
+import argparse
+from statistics import NormalDist
+from typing import Dict, List, Optional, Tuple
+
+from logger import LOG_DIR
+
+try:
+    from configs import RATINGS
+except ImportError:
+    RATINGS = {}
+
+# 默认配置，configs.py 中的 RATINGS 会覆盖同名字段
+DEFAULT_RATINGS_CONFIG = {
+    "enabled": True,
+    "db_path": os.path.join(LOG_DIR, "ratings.db"),
+    # 初始评分与不确定度（TrueSkill 的常用取值）
+    "mu": 25.0,
+    "sigma": 25.0 / 3,
+    # 单局表现的随机性；越大单局胜负对评分的影响越小
+    "beta": 25.0 / 6,
+    # 每局加入的不确定度，让评分可以随模型版本变化而漂移
+    "tau": 25.0 / 300,
+    # 置信区间的置信度
+    "confidence": 0.95,
+    # 提前停止：每个评分至少参与的局数
+    "min_games": 10,
+    # 提前停止：所有评分的置信区间半宽都不超过该值
+    "target_half_width": 2.0,
+    # 提前停止：排名第一的评分的区间下界高于其余所有评分的区间上界时也可以停止
+    "stop_on_separation": True,
+}
+
+KIND_MODEL = "model"
+KIND_MODEL_ROLE = "model_role"
+KIND_FACTION = "faction"
+
+WOLF_SIDE = "狼人阵营"
+GOOD_SIDE = "好人阵营"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ratings (
+    kind TEXT,                  -- model / model_role / faction
+    key TEXT,                   -- 模型 key；model_role 为 "模型:角色"；faction 为阵营名
+    mu REAL,
+    sigma REAL,
+    games INTEGER,
+    seats INTEGER,              -- 参与的座位数（同一模型一局可能占多个座位）
+    wins INTEGER,               -- 获胜的座位数
+    updated REAL,
+    PRIMARY KEY (kind, key)
+);
+CREATE TABLE IF NOT EXISTS rated_games (
+    game_id TEXT PRIMARY KEY,   -- 已计入评分的对局，重复提交会被忽略
+    winner TEXT,
+    seats INTEGER,
+    rated_at REAL
+);
+"""
+
+_norm = NormalDist()
+
+
+def get_ratings_config() -> Dict:
+    """合并默认配置与 configs.py 中的 RATINGS。"""
+    config = dict(DEFAULT_RATINGS_CONFIG)
+    config.update(RATINGS)
+    return config
+
+
+def connect(db_path: Optional[str] = None) -> sqlite3.Connection:
+    """打开（必要时创建）评分数据库。"""
+    db_path = db_path or get_ratings_config()["db_path"]
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # 多个进程（游戏服务器、批量评测）可能同时写入，等待锁而不是立即报错
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def side_of(role: str) -> str:
+    """角色所属的阵营。"""
+    return WOLF_SIDE if role == "werewolf" else GOOD_SIDE
+
+
+def _vw(t: float) -> Tuple[float, float]:
+    """无平局时 TrueSkill 的更新系数 v(t)、w(t)。"""
+    cdf = _norm.cdf(t)
+    # t 很小时 pdf/cdf 趋近于 -t，避免除以下溢的 cdf
+    v = _norm.pdf(t) / cdf if cdf > 1e-12 else -t
+    return v, v * (v + t)
+
+
+def team_update(teams: Dict[str, List[Tuple[str, float]]], winner: str,
+                priors: Dict[str, Tuple[float, float]], config: Dict) -> Dict[str, Tuple[float, float]]:
+    """
+    两队一局的评分更新。
+
+    Args:
+        teams (Dict[str, List[Tuple[str, float]]]): {阵营: [(评分 key, 权重)]}，同一 key 可以出现多次
+        winner (str): 获胜阵营
+        priors (Dict[str, Tuple[float, float]]): {评分 key: (mu, sigma)}
+        config (Dict): 评分配置（beta、tau）
+
+    Returns:
+        Dict[str, Tuple[float, float]]: {评分 key: (新 mu, 新 sigma)}
+    """
+    loser = next(side for side in teams if side != winner)
+    beta2 = config["beta"] ** 2
+    # 每局先加入一次动态不确定度
+    variances = {key: sigma ** 2 + config["tau"] ** 2 for key, (_, sigma) in priors.items()}
+
+    def performance(side: str) -> Tuple[float, float]:
+        mean = sum(weight * priors[key][0] for key, weight in teams[side])
+        variance = sum(weight ** 2 * (variances[key] + beta2) for key, weight in teams[side])
+        return mean, variance
+
+    win_mean, win_var = performance(winner)
+    lose_mean, lose_var = performance(loser)
+    c2 = win_var + lose_var
+    c = math.sqrt(c2)
+    v, w = _vw((win_mean - lose_mean) / c)
+
+    delta = {key: 0.0 for key in priors}
+    shrink = {key: 1.0 for key in priors}
+    for side, sign in ((winner, 1.0), (loser, -1.0)):
+        for key, weight in teams[side]:
+            variance = variances[key]
+            delta[key] += sign * weight * variance / c * v
+            shrink[key] *= max(1.0 - weight ** 2 * variance / c2 * w, 1e-4)
+    return {key: (priors[key][0] + delta[key], math.sqrt(variances[key] * shrink[key])) for key in priors}
+
+
+def _load(conn: sqlite3.Connection, kind: str, keys, config: Dict) -> Dict[str, Tuple[float, float]]:
+    priors = {}
+    for key in keys:
+        row = conn.execute("SELECT mu, sigma FROM ratings WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+        priors[key] = row if row else (config["mu"], config["sigma"])
+    return priors
+
+
+def _store(conn: sqlite3.Connection, kind: str, updated: Dict[str, Tuple[float, float]],
+           teams: Dict[str, List[Tuple[str, float]]], winner: str, now: float) -> None:
+    for key, (mu, sigma) in updated.items():
+        seats = sum(member == key for members in teams.values() for member, _ in members)
+        wins = sum(member == key for member, _ in teams[winner])
+        conn.execute(
+            "INSERT INTO ratings VALUES (?, ?, ?, ?, 1, ?, ?, ?) "
+            "ON CONFLICT (kind, key) DO UPDATE SET mu = excluded.mu, sigma = excluded.sigma, "
+            "games = ratings.games + 1, seats = ratings.seats + excluded.seats, "
+            "wins = ratings.wins + excluded.wins, updated = excluded.updated",
+            (kind, key, mu, sigma, seats, wins, now),
+        )
+
+
+def record_game(conn: sqlite3.Connection, game_id: str, winner: str, seats: List[Tuple[str, str]],
+                config: Optional[Dict] = None) -> bool:
+    """
+    把一局已结束的游戏计入评分。
+
+    Args:
+        game_id (str): 对局 ID，已经计入过的对局会被忽略
+        winner (str): 获胜阵营（"狼人阵营" / "好人阵营"）
+        seats (List[Tuple[str, str]]): 每个 AI 座位的 (模型 key, 角色)
+
+    Returns:
+        bool: 是否更新了评分（重复的对局、没有胜负或某一方没有 AI 座位时为 False）
+    """
+    config = config or get_ratings_config()
+    sides = {WOLF_SIDE: [], GOOD_SIDE: []}
+    for model, role in seats:
+        sides[side_of(role)].append((model, role))
+    if winner not in sides or not all(sides.values()):
+        return False
+
+    # BEGIN IMMEDIATE：读取和写回之间其他进程不能写入，多个进程同时结算也不会丢失更新
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        cursor = conn.execute("INSERT OR IGNORE INTO rated_games VALUES (?, ?, ?, ?)",
+                              (game_id, winner, len(seats), time.time()))
+        if cursor.rowcount == 0:
+            conn.rollback()
+            return False
+        now = time.time()
+
+        # 1. 按模型：各座位权重为 1/本方人数，另加一个权重为 1 的阵营评分
+        teams = {side: [(model, 1.0 / len(members)) for model, _ in members] + [(f"@{side}", 1.0)]
+                 for side, members in sides.items()}
+        model_keys = {model for model, _ in seats}
+        priors = _load(conn, KIND_MODEL, model_keys, config)
+        priors.update({f"@{side}": prior for side, prior in _load(conn, KIND_FACTION, sides, config).items()})
+        updated = team_update(teams, winner, priors, config)
+        _store(conn, KIND_MODEL, {key: updated[key] for key in model_keys}, teams, winner, now)
+        factions = {side: [(side, 1.0)] for side in sides}
+        _store(conn, KIND_FACTION, {side: updated[f"@{side}"] for side in sides}, factions, winner, now)
+
+        # 2. 按（模型, 角色）：角色评分本身就区分了阵营，不再加阵营评分
+        teams = {side: [(f"{model}:{role}", 1.0 / len(members)) for model, role in members]
+                 for side, members in sides.items()}
+        role_keys = {f"{model}:{role}" for model, role in seats}
+        updated = team_update(teams, winner, _load(conn, KIND_MODEL_ROLE, role_keys, config), config)
+        _store(conn, KIND_MODEL_ROLE, updated, teams, winner, now)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return True
+
+
+def record_finished_game(game_id: str, winner: str, seats: List[Tuple[str, str]]) -> bool:
+    """游戏结束时由裁判调用：按配置打开评分数据库并计入本局；关闭评分时什么都不做。"""
+    config = get_ratings_config()
+    if not config.get("enabled"):
+        return False
+    conn = connect(config["db_path"])
+    try:
+        return record_game(conn, game_id, winner, seats, config)
+    finally:
+        conn.close()
+
+
+def get_ratings(conn: sqlite3.Connection, kind: str = KIND_MODEL, config: Optional[Dict] = None) -> List[Dict]:
+    """
+    读取某一类评分，按 mu 从高到低排序。
+
+    Returns:
+        List[Dict]: [{"key", "mu", "sigma", "low", "high", "games", "seats", "wins"}]，low/high 为置信区间
+    """
+    config = config or get_ratings_config()
+    z = _norm.inv_cdf(0.5 + config["confidence"] / 2)
+    rows = conn.execute("SELECT key, mu, sigma, games, seats, wins FROM ratings WHERE kind = ? ORDER BY mu DESC",
+                        (kind,)).fetchall()
+    return [{"key": key, "mu": mu, "sigma": sigma, "low": mu - z * sigma, "high": mu + z * sigma,
+             "games": games, "seats": seats, "wins": wins} for key, mu, sigma, games, seats, wins in rows]
+
+
+def confidence_reached(conn: sqlite3.Connection, kind: str = KIND_MODEL,
+                       config: Optional[Dict] = None) -> Tuple[bool, str]:
+    """
+    判断某一类评分是否已经足够确定，批量评测可以停止。
+
+    满足 min_games 之后，以下任一条件成立即可停止：
+    - 所有评分的置信区间半宽都不超过 target_half_width
+    - stop_on_separation 开启，且第一名的区间下界高于其余所有评分的区间上界
+
+    Returns:
+        Tuple[bool, str]: (是否可以停止, 原因)
+    """
+    config = config or get_ratings_config()
+    ratings = get_ratings(conn, kind, config)
+    if len(ratings) < 2:
+        return False, "评分对象不足两个"
+    fewest = min(r["games"] for r in ratings)
+    if fewest < config["min_games"]:
+        return False, f"最少的评分只参与了 {fewest} 局（至少 {config['min_games']} 局）"
+    widest = max(r["high"] - r["mu"] for r in ratings)
+    if widest <= config["target_half_width"]:
+        return True, f"所有置信区间半宽不超过 {config['target_half_width']}（最大 {widest:.2f}）"
+    leader = ratings[0]
+    if config.get("stop_on_separation") and all(leader["low"] > r["high"] for r in ratings[1:]):
+        return True, f"{leader['key']} 的区间下界 {leader['low']:.2f} 高于其余所有评分的上界"
+    return False, f"最大置信区间半宽 {widest:.2f}（目标 {config['target_half_width']}）"
+
+
+def import_index(conn: sqlite3.Connection, index_conn: sqlite3.Connection, config: Optional[Dict] = None) -> int:
+    """
+    从 log_index.py 的索引数据库补录已结束、尚未计入评分的对局（按对局 ID 顺序）。
+
+    Returns:
+        int: 计入评分的对局数
+    """
+    rated = {row[0] for row in conn.execute("SELECT game_id FROM rated_games")}
+    imported = 0
+    games = index_conn.execute("SELECT game_id, winner FROM games WHERE complete = 1 ORDER BY game_id").fetchall()
+    for game_id, winner in games:
+        if game_id in rated:
+            continue
+        seats = index_conn.execute(
+            "SELECT model, role FROM players WHERE game_id = ? AND model IS NOT NULL AND role IS NOT NULL",
+            (game_id,)).fetchall()
+        if record_game(conn, game_id, winner, seats, config):
+            imported += 1
+    return imported
+
+
+def format_ratings(ratings: List[Dict], confidence: float) -> str:
+    """把 get_ratings 的结果格式化为表格文本。"""
+    lines = [f"{'key':<32}{'mu':>8}{'sigma':>8}   {confidence:.0%} 区间{'':<8}{'局数':>6}{'座位胜率':>10}"]
+    for r in ratings:
+        interval = f"[{r['low']:6.2f}, {r['high']:6.2f}]"
+        lines.append(f"{r['key']:<32}{r['mu']:>8.2f}{r['sigma']:>8.2f}   {interval:<20}"
+                     f"{r['games']:>6}{r['wins'] / r['seats']:>10.1%}")
+    return "\n".join(lines)
+
+
+async def run_until_confident(max_games: int, kind: str = KIND_MODEL, config: Optional[Dict] = None) -> int:
+    """
+    连续进行全 AI 对局（座位模型按 AGENT_CONFIG，角色每局随机），每局结束后检查评分是否已足够确定。
+
+    Returns:
+        int: 实际进行的局数
+    """
+    from main import create_game, release_players
+    from logger import log_writer
+
+    config = config or get_ratings_config()
+    for index in range(max_games):
+        game_master = await asyncio.to_thread(create_game, None)
+        if game_master is None:
+            return index
+        try:
+            await game_master.notify_werewolves_of_teammates()
+            await game_master.run_game()
+        finally:
+            await log_writer.aflush()
+            release_players(game_master)
+
+        conn = connect(config["db_path"])
+        try:
+            done, reason = confidence_reached(conn, kind, config)
+        finally:
+            conn.close()
+        print(f"[模型评分] 第 {index + 1}/{max_games} 局结束: {reason}")
+        if done:
+            return index + 1
+    return max_games
+
+
+async def _run_and_close(max_games: int, kind: str, config: Dict) -> int:
+    """命令行入口：跑完后在事件循环结束前关闭 Agent 池的 HTTP 连接。"""
+    from agents.agent_pool import agent_pool
+    try:
+        return await run_until_confident(max_games, kind, config)
+    finally:
+        await agent_pool.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="模型评分（TrueSkill）")
+    parser.add_argument("--db", help="评分数据库路径（默认取 RATINGS 配置）")
+    sub = parser.add_subparsers(dest="command", required=True)
+    show_parser = sub.add_parser("show", help="显示评分与置信区间")
+    show_parser.add_argument("--kind", default=KIND_MODEL, choices=(KIND_MODEL, KIND_MODEL_ROLE, KIND_FACTION))
+    index_parser = sub.add_parser("import-index", help="从日志索引补录历史对局")
+    index_parser.add_argument("--index-db", help="log_index.py 的索引数据库路径")
+    run_parser = sub.add_parser("run", help="全 AI 对局，评分足够确定时提前停止")
+    run_parser.add_argument("--max-games", type=int, default=100, help="最多进行的局数")
+    run_parser.add_argument("--kind", default=KIND_MODEL, choices=(KIND_MODEL, KIND_MODEL_ROLE),
+                            help="按哪一类评分判断是否停止")
+    run_parser.add_argument("--seed", type=int, help="随机种子：各局的种子由它派生，整串对局可以复现（见 seeding.py）")
+    args = parser.parse_args()
+
+    config = get_ratings_config()
+    if args.db:
+        config["db_path"] = args.db
+
+    if args.command == "run":
+        # 以脚本运行时本模块是 __main__，裁判导入的是 ratings 模块，评分配置要写到那一份
+        import ratings
+        ratings.RATINGS.update({"enabled": True, "db_path": config["db_path"]})
+        if args.seed is not None:
+            from seeding import SEEDING
+            SEEDING.update({"seed": args.seed})
+        games = asyncio.run(_run_and_close(args.max_games, args.kind, config))
+        print(f"[模型评分] 共进行 {games} 局")
+
+    conn = connect(config["db_path"])
+    if args.command == "import-index":
+        import log_index
+        index_conn = log_index.connect(args.index_db or log_index.DEFAULT_DB_PATH)
+        imported = import_index(conn, index_conn, config)
+        print(f"已补录 {imported} 局")
+    kind = getattr(args, "kind", KIND_MODEL)
+    print(format_ratings(get_ratings(conn, kind, config), config["confidence"]))
+
+
+if __name__ == "__main__":
+    main()
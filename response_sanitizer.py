@@ -0,0 +1,195 @@
+# werewolf_game/response_sanitizer.py
+"""
+模型回复的清洗：提取纯文本、移除思考过程。
+
+所有正则都在模块加载时预编译，思考标签的移除是一次线性扫描，
+批量（整段回复）和流式（逐个 chunk）共用同一个状态机 ThinkFilter，
+两种路径的结果完全一致。
+
+处理的情况：
+- <think>...</think> / <thinking>...</thinking>，支持多行、嵌套和大小写变体
+- 只有结束标签的回复（如 DeepSeek-R1 省略了开头的 <think>）：结束标签之前的内容都是思考
+- 未闭合的 <think>（如被 max_tokens 截断）：之后的内容都是思考
+- 行首的 "(thinking):"、"Player_X(thinking):" 前缀
+- "思考过程... Player_X: 实际发言" 这类把分析写在发言前面的格式
+- agentscope 1.x 的内容块列表 [{"type": "thinking", ...}, {"type": "text", ...}]
+"""
+import re
+import functools
+from typing import Any, List, Optional
+
+# 思考标签：<think> <thinking> </think> </thinking>，允许标签内有空白
+_TAG_RE = re.compile(r"<(/?)\s*think(?:ing)?\s*>", re.IGNORECASE)
+# 流式输入时可能被切断的标签前缀的最大长度（"</thinking >" 之类）
+_MAX_PARTIAL_TAG = 16
+_PARTIAL_TAG_RE = re.compile(r"<\s*/?\s*(?:t(?:h(?:i(?:n(?:k(?:i(?:n(?:g)?)?)?)?)?)?)?)?\s*$", re.IGNORECASE)
+
+_BLANK_LINES_RE = re.compile(r"\n\s*\n")
+_THINKING_PREFIX_RE = re.compile(r"^\s*(?:player_\d+\s*)?[(（]thinking[)）]\s*[:：]\s*", re.IGNORECASE)
+
+# 判断"发言前面那段是不是思考过程"的关键词
+_THINKING_INDICATOR_RE = re.compile(r"thinking|strategy|策略|分析|我需要|考虑|想法", re.IGNORECASE)
+_THINKING_PARAGRAPH_RE = re.compile(r"thinking|strategy|策略|分析：|我的想法是|我需要考虑|当前局面", re.IGNORECASE)
+
+
+class ThinkFilter:
+    """
+    移除思考标签内容的增量状态机。
+
+    用法（流式）：
+        think_filter = ThinkFilter()
+        for chunk in stream:
+            print(think_filter.feed(chunk), end="")
+            if think_filter.retracted:   # 遇到了没有开始标签的 </think>
+                ...                      # 之前输出的内容其实是思考，用 think_filter.text 重新渲染
+        print(think_filter.flush())
+
+    用法（批量）：
+        ThinkFilter().run(text)
+    """
+
+    __slots__ = ("depth", "retracted", "_pending", "_visible", "_seen_open")
+
+    def __init__(self) -> None:
+        self.depth = 0
+        self.retracted = False
+        self._pending = ""
+        self._visible: List[str] = []
+        self._seen_open = False
+
+    @property
+    def text(self) -> str:
+        """到目前为止的可见文本。"""
+        return "".join(self._visible)
+
+    def feed(self, chunk: str) -> str:
+        """输入一个 chunk，返回其中新增的可见文本。"""
+        data = self._pending + chunk
+        self._pending = ""
+        # 末尾可能是被切断的标签，留到下一个 chunk 再判断
+        lt = data.rfind("<", max(0, len(data) - _MAX_PARTIAL_TAG))
+        if lt != -1 and _PARTIAL_TAG_RE.match(data, lt) and not _TAG_RE.match(data, lt):
+            data, self._pending = data[:lt], data[lt:]
+        return self._scan(data)
+
+    def flush(self) -> str:
+        """输入结束，输出保留的尾部。"""
+        data, self._pending = self._pending, ""
+        return self._scan(data)
+
+    def run(self, text: str) -> str:
+        """批量处理一整段文本，返回全部可见文本。"""
+        self.feed(text)
+        self.flush()
+        return self.text
+
+    def _scan(self, data: str) -> str:
+        out = []
+        position = 0
+        for match in _TAG_RE.finditer(data):
+            if self.depth == 0:
+                out.append(data[position:match.start()])
+            position = match.end()
+            if match.group(1):  # 结束标签
+                if self.depth > 0:
+                    self.depth -= 1
+                elif not self._seen_open:
+                    # 没有开始标签的 </think>：之前的全部内容都是思考
+                    out.clear()
+                    self._visible.clear()
+                    self.retracted = True
+            else:
+                self.depth += 1
+                self._seen_open = True
+        if self.depth == 0:
+            out.append(data[position:])
+        new_text = "".join(out)
+        if new_text:
+            self._visible.append(new_text)
+        return new_text
+
+
+def remove_thinking_tags(text: str) -> str:
+    """移除文本中的思考标签及其内容，并合并多余的空行。"""
+    if "<" not in text:
+        return _BLANK_LINES_RE.sub("\n\n", text).strip()
+    return _BLANK_LINES_RE.sub("\n\n", ThinkFilter().run(text)).strip()
+
+
+def extract_thinking(text: str) -> str:
+    """返回文本中第一个 <think> 块的内容（用于写入日志），没有时返回空字符串。"""
+    start = _TAG_RE.search(text)
+    if start is None or start.group(1):
+        return ""
+    depth = 1
+    for match in _TAG_RE.finditer(text, start.end()):
+        depth += -1 if match.group(1) else 1
+        if depth == 0:
+            return text[start.end():match.start()].strip()
+    return ""
+
+
+def extract_text(content: Any) -> str:
+    """
+    从模型回复的 content 中提取纯文本（未清洗思考过程）。
+
+    支持字符串、ReActAgent 的结构化输出 {"speak": ...} / {"content": ...}、
+    agentscope 1.x 的内容块 {"type": "text", "text": ...}，以及它们组成的列表
+    （列表中的 thinking 块会被跳过，多个 text 块按顺序拼接）。
+    """
+    if isinstance(content, str):
+        return content.strip()
+    if isinstance(content, dict):
+        if "speak" in content:
+            return str(content["speak"]).strip()
+        if "content" in content:
+            return str(content["content"]).strip()
+        if content.get("type") == "text":
+            return str(content.get("text", "")).strip()
+        if "type" in content:
+            return ""  # thinking / tool_use 等非文本块
+        return str(content)
+    if isinstance(content, list):
+        if content and all(isinstance(block, dict) and "type" in block for block in content):
+            return "\n".join(filter(None, (extract_text(block) for block in content)))
+        return extract_text(content[0]) if content else ""
+    return str(content) if content is not None else ""
+
+
+@functools.lru_cache(maxsize=64)
+def _speaker_prefix_re(speaker: str) -> "re.Pattern":
+    return re.compile(re.escape(speaker) + r"\s*[:：]")
+
+
+def clean_speech(text: str, speaker: Optional[str] = None) -> str:
+    """
+    清洗一段发言或遗言：移除思考标签、"(thinking):" 前缀、写在发言前的分析段落。
+
+    Args:
+        text (str): 已提取的回复文本
+        speaker (str, optional): 发言玩家的名称，用于识别 "Player_X:" 前缀
+    """
+    text = remove_thinking_tags(text)
+    thinking_prefix = _THINKING_PREFIX_RE.match(text)
+    if thinking_prefix:
+        text = text[thinking_prefix.end():]
+
+    # 处理可能的格式："思考过程... Player_X: 实际发言内容"
+    if speaker:
+        prefixes = list(_speaker_prefix_re(speaker).finditer(text))
+        if prefixes:
+            first_part = text[:prefixes[0].start()].strip()
+            if (thinking_prefix and first_part) or "(thinking)" in first_part.lower() or \
+                    (len(first_part) > 100 and _THINKING_INDICATOR_RE.search(first_part)):
+                # 前面是思考过程：取最后一个 "Player_X:" 之后的内容
+                text = text[prefixes[-1].end():].strip()
+            else:
+                # 否则保留完整内容，只去掉第一个玩家名前缀
+                rest = text[prefixes[0].end():].strip()
+                text = f"{first_part} {rest}" if first_part else rest
+
+    # 处理段落级别的思考内容：只有当第一段明确是思考内容且较长时才移除
+    paragraphs = [p.strip() for p in text.split("\n\n") if p.strip()]
+    if len(paragraphs) > 1 and len(paragraphs[0]) > 80 and _THINKING_PARAGRAPH_RE.search(paragraphs[0]):
+        paragraphs = paragraphs[1:]
+    return "\n\n".join(paragraphs)
@@ -0,0 +1,54 @@
+# werewolf_game/seeding.py
+"""
+每局游戏的随机种子。引擎中的随机决定（开局分配角色、429 时随机换模型、
+无效目标时裁判随机选人）都使用本局自己的 random.Random(种子)，不再使用全局的 random：
+同一种子、同一配置的两局做出完全相同的随机决定，并发的多张桌子、反事实分支之间也互不影响。
+模型回复本身的随机性（服务端采样）不受种子控制。
+
+种子写入游戏日志、事件日志（game_start / game_end 事件）和检查点，复现某一局：
+
+    python main.py --seed <日志中的种子>
+
+SEEDING["seed"] 为空时每局使用新的随机种子；设置后第一局使用该种子，
+之后各局（重玩、批量评测）使用由它派生的种子，整串对局都可以复现。
+"""
+import hashlib
+import itertools
+import secrets
+from typing import Any, Dict
+
+try:
+    from configs import SEEDING
+except ImportError:
+    SEEDING = {}
+
+# 默认配置，configs.py 中的 SEEDING 会覆盖同名字段
+DEFAULT_SEEDING_CONFIG = {
+    # 基础种子，None 表示每局随机
+    "seed": None,
+}
+
+# 本进程中已开始的对局数，用于从基础种子派生各局的种子
+_game_counter = itertools.count()
+
+
+def get_seeding_config() -> Dict:
+    """合并默认配置与 configs.py 中的 SEEDING。"""
+    config = dict(DEFAULT_SEEDING_CONFIG)
+    config.update(SEEDING)
+    return config
+
+
+def derive_seed(*parts: Any) -> int:
+    """由若干部分（基础种子、序号、用途等）确定性地派生一个 32 位种子，与 PYTHONHASHSEED 无关。"""
+    digest = hashlib.sha256(":".join(str(part) for part in parts).encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big")
+
+
+def next_game_seed() -> int:
+    """新一局游戏的种子：未配置基础种子时随机生成；配置后第一局为基础种子本身，之后按序号派生。"""
+    base = get_seeding_config().get("seed")
+    index = next(_game_counter)
+    if base is None:
+        return secrets.randbits(32)
+    return int(base) if index == 0 else derive_seed(base, index)
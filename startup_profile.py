@@ -0,0 +1,197 @@
+# werewolf_game/startup_profile.py
+"""
+冷启动耗时分析：在全新的子进程中（python -X importtime）测量从解释器启动到
+第一次模型回复的各阶段耗时，并按模块汇总导入时间，用于发现冷启动退化
+（例如在模块顶层新增了重量级依赖）。批量评测的 worker 频繁启动，冷启动直接计入每个任务。
+
+报告的指标（多次运行取最小值，受机器负载的影响最小；单位毫秒）：
+- interpreter_ms：空解释器启动（python -c pass），作为参照
+- import_main_ms：import main（只导入配置、日志等轻量模块）
+- import_engine_ms：导入游戏引擎（agents.*，包括 agentscope）
+- first_client_ms：创建第一个模型客户端（首次导入 openai、httpx 等）
+- first_call_ms：第一次模型调用（用本地模拟服务器，首次导入 openai 的接口模块）
+- total_ms：子进程总墙钟时间
+
+使用方法：
+    python startup_profile.py --save-baseline          # 生成基线 startup_baseline.json
+    python startup_profile.py                          # 与基线对比，退化超过阈值时返回非零退出码
+    python startup_profile.py --runs 7 --top 30        # 更多次运行，显示更多模块
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from typing import Dict, List, Tuple
+
+from benchmark import compare
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE_PATH = "startup_baseline.json"
+STAGES = ("interpreter_ms", "import_main_ms", "import_engine_ms", "first_client_ms", "first_call_ms", "total_ms")
+
+# 在子进程中执行，按阶段计时并把结果作为最后一行 JSON 输出
+_CHILD_SCRIPT = """
+import time
+t0 = time.perf_counter()
+import sys, json, asyncio
+import main
+t1 = time.perf_counter()
+import agents.game_master, agents.player_agent, agents.user_agent
+t2 = time.perf_counter()
+from mock_server import MockChatServer
+server = MockChatServer({"port": 0, "latency": {"dist": "fixed", "value": 0.0}, "tokens_per_second": 0,
+                         "faults": {"rate_limit": 0.0, "timeout": 0.0, "malformed": 0.0}})
+base_url = server.start_in_thread()
+t3 = time.perf_counter()
+from agentscope.model import OpenAIChatModel
+model = OpenAIChatModel(model_name="mock-model", api_key="mock", client_args={"base_url": base_url})
+t4 = time.perf_counter()
+async def first_call():
+    response = await model([{"role": "user", "content": "ping"}])
+    if hasattr(response, "__aiter__"):
+        async for _ in response:
+            pass
+asyncio.run(first_call())
+t5 = time.perf_counter()
+server.stop_thread()
+print(json.dumps({"import_main_ms": (t1 - t0) * 1000, "import_engine_ms": (t2 - t1) * 1000,
+                  "first_client_ms": (t4 - t3) * 1000, "first_call_ms": (t5 - t4) * 1000}))
+"""
+
+
+def parse_importtime(stderr: str) -> Dict[str, Tuple[int, int]]:
+    """解析 -X importtime 的输出，返回 {模块: (自身耗时us, 累计耗时us)}。"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            modules[name.strip()] = (int(self_us), int(cumulative_us))
+        except ValueError:
+            continue
+    return modules
+
+
+def run_once() -> Tuple[Dict[str, float], Dict[str, Tuple[int, int]]]:
+    """在全新的子进程中运行一次冷启动，返回 (各阶段耗时, 各模块导入耗时)。"""
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    interpreter_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", _CHILD_SCRIPT], cwd=ROOT,
+                          capture_output=True, text=True, stdin=subprocess.DEVNULL)
+    total_ms = (time.perf_counter() - started) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"冷启动子进程失败:\n{proc.stderr[-2000:]}")
+    stages = json.loads(proc.stdout.strip().splitlines()[-1])
+    stages.update({"interpreter_ms": interpreter_ms, "total_ms": total_ms})
+    return stages, parse_importtime(proc.stderr)
+
+
+def local_modules() -> set:
+    """本仓库的顶层模块名（根目录下的 .py 文件和 agents 包）。"""
+    names = {name[:-3] for name in os.listdir(ROOT) if name.endswith(".py")}
+    names.add("agents")
+    return names
+
+
+def run_profile(runs: int) -> Dict:
+    """多次冷启动取最小值，返回结果字典。"""
+    stage_runs: Dict[str, List[float]] = {name: [] for name in STAGES}
+    module_runs: Dict[str, List[Tuple[int, int]]] = {}
+    for index in range(runs):
+        stages, modules = run_once()
+        for name in STAGES:
+            stage_runs[name].append(stages[name])
+        for name, times in modules.items():
+            module_runs.setdefault(name, []).append(times)
+        print(f"  第 {index + 1}/{runs} 次: {stages['total_ms']:.0f} ms")
+
+    modules = {name: (min(t[0] for t in times) / 1000, min(t[1] for t in times) / 1000)
+               for name, times in module_runs.items()}
+    packages: Dict[str, float] = {}
+    for name, (self_ms, _) in modules.items():
+        top = name.split(".")[0]
+        packages[top] = packages.get(top, 0.0) + self_ms
+
+    return {
+        "meta": {
+            "runs": runs,
+            "python": sys.version.split()[0],
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        "metrics": {name: round(min(values), 2) for name, values in stage_runs.items()},
+        "phases": {},
+        "packages": {name: round(ms, 2) for name, ms in sorted(packages.items(), key=lambda item: -item[1])},
+        "modules": {name: {"self_ms": round(s, 2), "cumulative_ms": round(c, 2)}
+                    for name, (s, c) in sorted(modules.items(), key=lambda item: -item[1][0])},
+    }
+
+
+def format_report(result: Dict, top: int) -> str:
+    """把 run_profile 的结果格式化为文本。"""
+    lines = [f"\n冷启动各阶段（{result['meta']['runs']} 次中的最小值）"]
+    for name in STAGES:
+        lines.append(f"  {name:<20}{result['metrics'][name]:>10.1f} ms")
+
+    lines.append(f"\n按顶层包汇总的导入耗时（前 {top}）")
+    for name, ms in list(result["packages"].items())[:top]:
+        lines.append(f"  {name:<36}{ms:>10.1f} ms")
+
+    lines.append(f"\n自身导入耗时最多的模块（前 {top}）")
+    for name, times in list(result["modules"].items())[:top]:
+        lines.append(f"  {name:<52}{times['self_ms']:>8.1f} ms（累计 {times['cumulative_ms']:.1f} ms）")
+
+    local = local_modules()
+    lines.append("\n本仓库模块（累计导入耗时）")
+    own = sorted(((name, times) for name, times in result["modules"].items() if name.split(".")[0] in local),
+                 key=lambda item: -item[1]["cumulative_ms"])
+    for name, times in own:
+        lines.append(f"  {name:<36}{times['cumulative_ms']:>10.1f} ms")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="冷启动耗时分析")
+    parser.add_argument("--runs", type=int, default=5, help="冷启动次数（取最小值）")
+    parser.add_argument("--top", type=int, default=15, help="显示的模块/包数量")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="基线文件路径")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument("--output", help="把本次结果另存为 JSON 文件")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="允许的相对退化比例")
+    parser.add_argument("--min-delta-ms", type=float, default=30.0, help="绝对变化小于该值时不视为退化")
+    args = parser.parse_args()
+
+    print(f"运行 {args.runs} 次冷启动 ...")
+    result = run_profile(args.runs)
+    print(format_report(result, args.top))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n基线已保存至: {os.path.abspath(args.baseline)}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\n未找到基线文件 {args.baseline}，使用 --save-baseline 生成")
+        return
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(result, baseline, args.tolerance, min_delta_ms=args.min_delta_ms)
+    if regressions:
+        print(f"\n冷启动退化 {len(regressions)} 项: {', '.join(regressions)}")
+        sys.exit(1)
+    print("\n冷启动未发现退化")
+
+
+if __name__ == "__main__":
+    main()
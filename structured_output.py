@@ -0,0 +1,203 @@
+# werewolf_game/structured_output.py
+"""
+结构化决策模式：投票、击杀、查验、用药、开枪等决策要求模型输出受 JSON Schema
+约束的回复，例如 {"action": "vote", "target": "Player_3"}，并在本地校验。
+
+- 通过 OpenAI 兼容接口的 response_format 传入 schema（json_schema 模式），
+  或只要求输出 JSON（json_object 模式，兼容更多服务商），字段都在本地校验
+- 校验通过的回复会被改写成各决策原有的标准格式（如 "我投票给: Player_3"），
+  后续解析逻辑无需改动；校验失败时保留原文，按原有的自由文本方式解析
+- 服务商不支持 response_format 时，该模型自动回退到自由文本模式（进程内记住）
+- 按模型统计决策回复的无效率（即需要重试或兜底的比例），游戏结束时写入日志
+
+默认关闭，在 configs.py 的 STRUCTURED_OUTPUT 中开启。
+"""
+import json
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from game_context import game_local
+from target_matcher import (
+    TargetMatcher, MATCH_TARGET, MATCH_ABSTAIN, ABSTAIN_TOKENS, HUNTER_ABSTAIN_TOKENS, POISON_ABSTAIN_TOKENS,
+)
+
+try:
+    from configs import STRUCTURED_OUTPUT
+except ImportError:
+    STRUCTURED_OUTPUT = {}
+
+# 默认配置，configs.py 中的 STRUCTURED_OUTPUT 会覆盖同名字段
+DEFAULT_STRUCTURED_OUTPUT_CONFIG = {
+    "enabled": False,
+    # "json_schema"：按 schema 约束生成；"json_object"：只要求合法 JSON，字段在本地校验
+    "mode": "json_schema",
+    # 使用结构化输出的模型 key（MODEL_LIST 中的键）；None 表示全部模型先尝试，服务商拒绝后自动回退
+    "models": None,
+}
+
+# 各决策类型：action 名称、标准格式、弃权时的标准回复、自由文本的格式标记和弃权同义词
+DECISIONS = {
+    "vote": {"action": "vote", "format": "我投票给: {target}", "abstain": "弃票",
+             "marker": "我投票给", "abstain_tokens": ABSTAIN_TOKENS},
+    "wolf_kill": {"action": "kill", "format": "我们决定淘汰: {target}", "abstain": None,
+                  "marker": "我们决定淘汰", "abstain_tokens": ()},
+    "seer_check": {"action": "check", "format": "我查验: {target}", "abstain": None,
+                   "marker": "我查验", "abstain_tokens": ()},
+    "witch_poison": {"action": "poison", "format": "我毒杀: {target}", "abstain": "不使用",
+                     "marker": "我毒杀", "abstain_tokens": POISON_ABSTAIN_TOKENS},
+    "hunter_shot": {"action": "shoot", "format": "我开枪带走: {target}", "abstain": "弃票",
+                    "marker": "我开枪带走", "abstain_tokens": HUNTER_ABSTAIN_TOKENS},
+    # 解药是是否题，没有目标
+    "witch_save": {"action": "save", "format": None, "abstain": None, "marker": None, "abstain_tokens": ()},
+}
+
+# 服务商拒绝 response_format 的模型 key
+_UNSUPPORTED_MODELS: set = set()
+
+_CODE_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.IGNORECASE)
+
+
+def get_structured_output_config() -> Dict:
+    """合并默认配置与 configs.py 中的 STRUCTURED_OUTPUT。"""
+    config = dict(DEFAULT_STRUCTURED_OUTPUT_CONFIG)
+    config.update(STRUCTURED_OUTPUT)
+    return config
+
+
+def build_schema(call_site: str, targets: List[str]) -> Dict:
+    """生成某个决策的 JSON Schema；目标限定为当前候选玩家。"""
+    spec = DECISIONS[call_site]
+    if call_site == "witch_save":
+        properties = {"action": {"type": "string", "enum": [spec["action"]]}, "use": {"type": "boolean"}}
+        required = ["action", "use"]
+    else:
+        target_schema = {"type": "string", "enum": list(targets)}
+        if spec["abstain"]:
+            target_schema = {"type": ["string", "null"], "enum": list(targets) + [None]}
+        properties = {"action": {"type": "string", "enum": [spec["action"]]}, "target": target_schema}
+        required = ["action", "target"]
+    return {"type": "object", "properties": properties, "required": required, "additionalProperties": False}
+
+
+def decision_instruction(call_site: str, targets: List[str]) -> str:
+    """附加到 prompt 末尾的 JSON 输出要求（json_object 模式下服务商要求 prompt 中出现 JSON 字样）。"""
+    spec = DECISIONS[call_site]
+    if call_site == "witch_save":
+        return '\n\n请只输出一个 JSON 对象，不要包含其他内容：{"action": "save", "use": true 或 false}'
+    example = json.dumps({"action": spec["action"], "target": targets[0] if targets else "Player_1"}, ensure_ascii=False)
+    abstain = "；放弃时 target 填 null" if spec["abstain"] else ""
+    return f"\n\n请只输出一个 JSON 对象，不要包含其他内容，例如：{example}（target 必须是可选玩家之一{abstain}）"
+
+
+class StructuredDecisions:
+    """
+    结构化决策的请求构造、本地校验和按模型的统计。
+
+    用法：
+        if structured_decisions.active("vote", model_key):
+            response_format, instruction = structured_decisions.request("vote", targets)
+        ...
+        canonical = structured_decisions.parse("vote", reply_text, targets)  # 无效时为 None
+        structured_decisions.record(model_key, structured=True, valid=canonical is not None)
+    """
+
+    def __init__(self) -> None:
+        # 不支持结构化输出的模型在进程内共享，所有桌子都不再尝试
+        self.unsupported: set = _UNSUPPORTED_MODELS
+        self.stats: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def reset(self) -> None:
+        """开始新一局的统计（不支持结构化输出的模型在进程内一直记住）。"""
+        self.stats.clear()
+
+    def active(self, call_site: str, model_key: str) -> bool:
+        config = get_structured_output_config()
+        if not config.get("enabled") or call_site not in DECISIONS or model_key in self.unsupported:
+            return False
+        models = config.get("models")
+        return models is None or model_key in models
+
+    def request(self, call_site: str, targets: List[str]) -> Tuple[Dict, str]:
+        """返回 (response_format, 附加到 prompt 的说明)。"""
+        if get_structured_output_config().get("mode") == "json_object":
+            response_format = {"type": "json_object"}
+        else:
+            response_format = {"type": "json_schema", "json_schema": {
+                "name": f"{call_site}_decision",
+                "schema": build_schema(call_site, targets),
+                "strict": True,
+            }}
+        return response_format, decision_instruction(call_site, targets)
+
+    @staticmethod
+    def is_unsupported_error(error: Exception) -> bool:
+        """判断异常是否表示服务商不支持 response_format。"""
+        text = str(error).lower()
+        return ("response_format" in text or "json_schema" in text) and "429" not in text
+
+    def mark_unsupported(self, model_key: str) -> None:
+        self.unsupported.add(model_key)
+
+    def parse(self, call_site: str, text: str, targets: List[str]) -> Optional[str]:
+        """
+        校验结构化回复，返回该决策的标准格式文本；不是合法 JSON 或字段不符合 schema 时返回 None。
+        """
+        spec = DECISIONS.get(call_site)
+        if spec is None or not text:
+            return None
+        try:
+            data = json.loads(_CODE_FENCE_RE.sub("", text))
+        except ValueError:
+            return None
+        if not isinstance(data, dict) or data.get("action", spec["action"]) != spec["action"]:
+            return None
+        if call_site == "witch_save":
+            use = data.get("use")
+            return None if not isinstance(use, bool) else ("使用解药" if use else "不使用解药")
+        target = data.get("target")
+        if target is None or (isinstance(target, str) and target.strip().lower() in ("", "null", "none")):
+            return spec["abstain"]
+        if not isinstance(target, str):
+            return None
+        result = TargetMatcher.for_targets(targets, abstain_tokens=spec["abstain_tokens"]).match(target)
+        if result.status == MATCH_TARGET:
+            return spec["format"].format(target=result.target)
+        if result.status == MATCH_ABSTAIN:
+            return spec["abstain"]
+        return None
+
+    @staticmethod
+    def is_valid_free_text(call_site: str, text: str, targets: List[str]) -> bool:
+        """自由文本回复能否直接解析出决策（与各决策点的解析规则一致）。"""
+        spec = DECISIONS.get(call_site)
+        if spec is None or not text:
+            return False
+        if call_site == "witch_save":
+            return "使用解药" in text
+        result = TargetMatcher.for_targets(targets, abstain_tokens=spec["abstain_tokens"]).match(text, marker=spec["marker"])
+        return result.status == MATCH_TARGET or (result.status == MATCH_ABSTAIN and spec["abstain"] is not None)
+
+    def record(self, model_key: str, structured: bool, valid: bool) -> None:
+        """记录一次决策回复。"""
+        stats = self.stats[model_key]
+        stats["decisions"] += 1
+        stats["structured"] += structured
+        stats["invalid"] += not valid
+
+    def report(self) -> str:
+        """按模型汇总决策回复的无效率（需要重试或兜底的比例）。"""
+        if not self.stats:
+            return "[决策解析统计]: 暂无记录"
+        lines = ["[决策解析统计] 模型 | 决策次数 | 结构化输出 | 无效回复（需重试）"]
+        for model_key, stats in sorted(self.stats.items()):
+            decisions = stats["decisions"]
+            lines.append(f"  {model_key}: {decisions} | {stats['structured']} | "
+                         f"{stats['invalid']} ({stats['invalid'] / decisions:.0%})")
+        if self.unsupported:
+            lines.append(f"  不支持结构化输出、已回退到自由文本的模型: {', '.join(sorted(self.unsupported))}")
+        return "\n".join(lines)
+
+
+# 创建一个全局的结构化决策实例，方便在其他模块中导入和使用
+structured_decisions = game_local(StructuredDecisions)
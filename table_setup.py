@@ -0,0 +1,90 @@
+# werewolf_game/table_setup.py
+"""
+按座位数生成游戏配置（GAME_SETUP / AGENT_CONFIG）。
+
+configs.py 中手写的 GAME_SETUP 和 AGENT_CONFIG 只对应 9 人局；
+设置 TABLE_SETUP["num_players"] 后，按角色预设自动生成对应人数的角色配置，
+并把 AI 玩家轮流分配到 MODEL_LIST 中的各个模型。
+"""
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from configs import TABLE_SETUP
+except ImportError:
+    TABLE_SETUP = {}
+
+# 默认配置，configs.py 中的 TABLE_SETUP 会覆盖同名字段
+DEFAULT_TABLE_SETUP_CONFIG = {
+    # 座位数；None 表示直接使用 configs.py 中手写的 GAME_SETUP 和 AGENT_CONFIG
+    "num_players": None,
+    # 参与轮流分配的模型 key；None 表示 MODEL_LIST 中的全部模型
+    "models": None,
+    "provider": "modelscope",
+}
+
+# 角色预设：狼人约占三分之一，神职为预言家、女巫、猎人各一，其余为村民
+ROLE_PRESETS = {
+    9: {"werewolf": 3, "villager": 3, "seer": 1, "witch": 1, "hunter": 1},
+    12: {"werewolf": 4, "villager": 5, "seer": 1, "witch": 1, "hunter": 1},
+    15: {"werewolf": 5, "villager": 7, "seer": 1, "witch": 1, "hunter": 1},
+    18: {"werewolf": 6, "villager": 9, "seer": 1, "witch": 1, "hunter": 1},
+}
+
+
+def get_table_setup_config() -> Dict:
+    """合并默认配置与 configs.py 中的 TABLE_SETUP。"""
+    config = dict(DEFAULT_TABLE_SETUP_CONFIG)
+    config.update(TABLE_SETUP)
+    return config
+
+
+def seat_key(name: str) -> Tuple[int, str]:
+    """
+    座位排序键：按编号而不是字符串排序，保证 Player_2 排在 Player_10 之前。
+    """
+    prefix, _, number = name.rpartition("_")
+    return (int(number), prefix) if number.isdigit() else (10 ** 6, name)
+
+
+def generate_game_setup(num_players: int) -> Dict:
+    """按角色预设生成 GAME_SETUP。"""
+    if num_players not in ROLE_PRESETS:
+        raise ValueError(f"不支持 {num_players} 人局，可选人数: {sorted(ROLE_PRESETS)}")
+    return {"num_players": num_players, "roles": dict(ROLE_PRESETS[num_players])}
+
+
+def generate_agent_config(num_ai_players: int, model_keys: List[str], provider: str = "modelscope") -> List[Dict]:
+    """把 AI 玩家轮流分配到各个模型，生成 AGENT_CONFIG。"""
+    if not model_keys:
+        raise ValueError("没有可分配的模型，请检查 MODEL_LIST")
+    return [
+        {"agent_class": "PlayerAgent", "model_name": model_keys[i % len(model_keys)], "provider": provider}
+        for i in range(num_ai_players)
+    ]
+
+
+def roles_list(game_setup: Dict) -> List[str]:
+    """把 GAME_SETUP 的角色配置展开为角色列表。"""
+    roles = []
+    for role, count in game_setup["roles"].items():
+        roles.extend([role] * count)
+    return roles
+
+
+def load_table_config(num_players: Optional[int] = None) -> Tuple[Dict, List[Dict]]:
+    """
+    返回本局使用的 (GAME_SETUP, AGENT_CONFIG)。
+
+    Args:
+        num_players (int, optional): 指定座位数；不指定时使用 TABLE_SETUP["num_players"]，
+            两者都为空时返回 configs.py 中手写的配置
+    """
+    from configs import MODEL_LIST, GAME_SETUP, AGENT_CONFIG
+
+    config = get_table_setup_config()
+    num_players = num_players or config.get("num_players")
+    if not num_players:
+        return GAME_SETUP, AGENT_CONFIG
+    model_keys = [key for key in (config.get("models") or MODEL_LIST) if key in MODEL_LIST]
+    # 0 号座位是人类玩家，其余座位由 AI 填充
+    return generate_game_setup(num_players), generate_agent_config(num_players - 1, model_keys, config["provider"])
@@ -0,0 +1,147 @@
+# werewolf_game/target_matcher.py
+"""
+从玩家回复中解析目标玩家（投票、狼人击杀、预言家查验、女巫毒药、猎人开枪共用）。
+
+每组候选目标只编译一次（按目标集合缓存），玩家名称、编号别名
+（"Player_3"、"player 3"、"Player3"、"3号"）和弃权同义词合成一个正则，
+对回复做一次扫描：
+- 带格式标记的回复（如 "我投票给: Player_3"）取标记后第一个提到的目标
+- 否则只提到一个目标时返回该目标，提到多个不同目标时返回"含糊"
+- 名称按编号边界匹配，Player_1 不会误匹配 Player_10
+"""
+import re
+import functools
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+# 匹配结果状态
+MATCH_TARGET = "target"
+MATCH_ABSTAIN = "abstain"
+MATCH_AMBIGUOUS = "ambiguous"
+MATCH_NONE = "none"
+
+# 各决策场景的弃权同义词
+ABSTAIN_TOKENS = ("弃票", "不投票", "不投", "abstain", "pass", "skip")
+HUNTER_ABSTAIN_TOKENS = ABSTAIN_TOKENS + ("不想", "不开枪")
+POISON_ABSTAIN_TOKENS = ("不使用", "跳过", "不毒")
+# 只有整条回复等于这些词时才视为弃权（避免误匹配正常句子中的字母）
+EXACT_ABSTAIN_TOKENS = ("n", "no")
+
+_NUMERIC_ALIAS = r"player[\s_\-]*(?P<num>\d+)(?!\d)|(?<!\d)(?P<num_cn>\d+)\s*号"
+
+
+class MatchResult(NamedTuple):
+    status: str
+    target: Optional[str] = None
+    candidates: Tuple[str, ...] = ()
+
+
+@functools.lru_cache(maxsize=32)
+def _marker_re(marker: str) -> "re.Pattern":
+    return re.compile(re.escape(marker) + r"\s*[:：]?")
+
+
+def _abstain_pattern(token: str) -> str:
+    # 英文同义词按单词匹配，避免 "pass" 命中 "passive"
+    if token.isascii():
+        return r"(?<![a-z])" + re.escape(token) + r"(?![a-z])"
+    return re.escape(token)
+
+
+class TargetMatcher:
+    """
+    针对一组候选目标编译好的匹配器。
+
+    用法：
+        matcher = TargetMatcher.for_targets(potential_targets)
+        result = matcher.match(raw_response, marker="我投票给")
+        if result.status == MATCH_TARGET: ...
+    """
+
+    def __init__(self, targets: Iterable[str], abstain_tokens: Iterable[str] = ABSTAIN_TOKENS) -> None:
+        self.targets = tuple(targets)
+        self.abstain_tokens = tuple(abstain_tokens)
+
+        by_number = {}
+        for name in self.targets:
+            number = name.rsplit("_", 1)[-1]
+            if number.isdigit():
+                by_number[int(number)] = name
+        self._by_number = by_number
+
+        # 整条回复就是编号或弃权词时的快速查找
+        exact = {name.lower(): name for name in self.targets}
+        exact.update({str(number): name for number, name in by_number.items()})
+        # 不允许弃权的决策（abstain_tokens 为空）不接受 "n"、"no" 之类的整条弃权回复
+        if self.abstain_tokens:
+            exact.update({token: None for token in self.abstain_tokens + EXACT_ABSTAIN_TOKENS})
+        self._exact = exact
+
+        # 长名称在前，保证 Player_10 优先于 Player_1；名称后不能紧跟数字
+        names = sorted(self.targets, key=len, reverse=True)
+        alternatives = [r"(?P<name>" + "|".join(re.escape(n) for n in names) + r")(?!\d)"] if names else []
+        alternatives.append(_NUMERIC_ALIAS)
+        # 没有弃权词时用永不匹配的 (?!) 占位，保证 abstain 分组始终存在
+        abstain = "|".join(_abstain_pattern(t) for t in self.abstain_tokens) or "(?!)"
+        alternatives.append(r"(?P<abstain>" + abstain + ")")
+        self._pattern = re.compile("|".join(alternatives), re.IGNORECASE)
+        self._name_lookup = {name.lower(): name for name in self.targets}
+
+    @classmethod
+    def for_targets(cls, targets: Iterable[str], abstain_tokens: Iterable[str] = ABSTAIN_TOKENS) -> "TargetMatcher":
+        """返回该目标集合的匹配器；同一集合只编译一次。"""
+        return _cached_matcher(tuple(targets), tuple(abstain_tokens))
+
+    def _mentions(self, text: str) -> List[Optional[str]]:
+        """按出现顺序返回提到的目标；None 表示弃权。"""
+        mentions = []
+        for match in self._pattern.finditer(text):
+            if match.group("name"):
+                mentions.append(self._name_lookup[match.group("name").lower()])
+            elif match.group("abstain"):
+                mentions.append(None)
+            else:
+                number = int(match.group("num") or match.group("num_cn"))
+                if number in self._by_number:
+                    mentions.append(self._by_number[number])
+        return mentions
+
+    def match(self, text: str, marker: Optional[str] = None) -> MatchResult:
+        """
+        解析一条回复。
+
+        Args:
+            text (str): 玩家回复
+            marker (str, optional): 格式标记，如 "我投票给"；回复中有该标记时只看标记后的内容
+
+        Returns:
+            MatchResult: status 为 target / abstain / ambiguous / none
+        """
+        if not text:
+            return MatchResult(MATCH_NONE)
+        normalized = text.strip().strip("。.!！\"'[]【】").strip().lower()
+        if normalized in self._exact:
+            target = self._exact[normalized]
+            return MatchResult(MATCH_TARGET, target) if target else MatchResult(MATCH_ABSTAIN)
+
+        if marker:
+            found = None
+            for found in _marker_re(marker).finditer(text):
+                pass
+            if found is not None:
+                mentions = self._mentions(text[found.end():])
+                if mentions:
+                    first = mentions[0]
+                    return MatchResult(MATCH_TARGET, first) if first else MatchResult(MATCH_ABSTAIN)
+
+        mentions = self._mentions(text)
+        distinct = tuple(dict.fromkeys(mentions))
+        if not distinct:
+            return MatchResult(MATCH_NONE)
+        if len(distinct) > 1:
+            return MatchResult(MATCH_AMBIGUOUS, candidates=tuple(t or "弃权" for t in distinct))
+        return MatchResult(MATCH_TARGET, distinct[0]) if distinct[0] else MatchResult(MATCH_ABSTAIN)
+
+
+@functools.lru_cache(maxsize=64)
+def _cached_matcher(targets: Tuple[str, ...], abstain_tokens: Tuple[str, ...]) -> TargetMatcher:
+    return TargetMatcher(targets, abstain_tokens)
@@ -0,0 +1,77 @@
+"""
+测试对局统计（analytics.py）的 compute_tables
+
+两个小夹具：座位带模型的对局，以及没有记录模型的对局（如 logs/ 中的示例日志），
+后者的按模型各表应被跳过，其余表照常计算。
+
+运行：python test_analytics.py
+"""
+import sys
+
+import numpy as np
+
+from analytics import EVENT_KINDS, TABLES, GameColumns, compute_tables
+
+ROLES = ["seer", "villager", "werewolf"]
+_KIND = {kind: code for code, kind in enumerate(EVENT_KINDS)}
+MODEL_TABLES = ("winrate-by-model", "winrate-by-model-role", "vote-accuracy-by-model", "abstain-by-model")
+
+
+def make_columns(with_models: bool) -> GameColumns:
+    """两局 4 人局：座位 0 预言家、1/2 村民、3 狼人；第一局狼人获胜，第二局好人获胜。"""
+    role = np.array([[0, 1, 1, 2], [0, 1, 1, 2]], dtype=np.int8)
+    model = np.array([[0, 1, 0, 1], [1, 0, 1, 0]], dtype=np.int16) if with_models else np.full((2, 4), -1, np.int16)
+    # (对局, 天, 类型, 行动者, 目标)
+    events = np.array([
+        (0, 1, _KIND["wolf_kill"], 3, 0),
+        (0, 1, _KIND["vote"], 1, 2),
+        (0, 1, _KIND["abstain"], 2, -1),
+        (1, 1, _KIND["vote"], 0, 3),
+        (1, 1, _KIND["vote"], 1, 3),
+        (1, 1, _KIND["vote_out"], -1, 3),
+    ], dtype=np.int32)
+    return GameColumns(
+        game_ids=np.array(["g0", "g1"]), wolf_won=np.array([True, False]), days=np.array([2, 1], dtype=np.int16),
+        role=role, model=model, roles=ROLES, models=["m0", "m1"] if with_models else [],
+        ev_game=events[:, 0], ev_day=events[:, 1].astype(np.int16), ev_kind=events[:, 2].astype(np.int8),
+        ev_actor=events[:, 3].astype(np.int16), ev_target=events[:, 4].astype(np.int16),
+    )
+
+
+failures = 0
+
+
+def check(name: str, ok: bool) -> None:
+    global failures
+    failures += not ok
+    print(f"[{'PASS' if ok else 'FAIL'}] {name}")
+
+
+print("=" * 60)
+print("对局统计")
+print("=" * 60)
+
+with_models = compute_tables(make_columns(True), reps=50)
+check("有模型时计算所有表", set(with_models) == set(TABLES))
+check("阵营胜率", with_models["summary"][1][0][:2] == (2, 0.5))
+role_rates = {row[0]: row[2] for row in with_models["winrate-by-role"][1]}
+check("角色胜率", role_rates == {"seer": 0.5, "villager": 0.5, "werewolf": 0.5})
+model_rows = {row[0]: row[1:3] for row in with_models["winrate-by-model"][1]}
+check("模型胜率按座位计", model_rows == {"m0": (4, 0.25), "m1": (4, 0.75)})
+vote_rows = {row[0]: row[1:3] for row in with_models["vote-accuracy-by-role"][1]}
+check("投票准确率", vote_rows == {"seer": (1, 1.0), "villager": (2, 0.5)})
+abstain_rows = {row[0]: row[1:3] for row in with_models["abstain-by-model"][1]}
+check("弃票率", abstain_rows == {"m0": (2, 0.5), "m1": (2, 0.0)})
+
+without_models = compute_tables(make_columns(False), reps=50)
+check("没有模型时跳过按模型的表", not any(name in without_models for name in MODEL_TABLES))
+check("没有模型时其余表照常计算",
+      set(without_models) == set(TABLES) - set(MODEL_TABLES)
+      and without_models["winrate-by-role"] == with_models["winrate-by-role"])
+check("seer-survival", [row[:3] for row in without_models["seer-survival"][1]] == [(1, 2, 0.5)])
+
+print("\n" + "=" * 60)
+print("测试完成！" if not failures else f"{failures} 个用例失败")
+print("=" * 60)
+if failures:
+    sys.exit(1)
@@ -0,0 +1,90 @@
+"""
+测试引擎开销随座位数的增长（9/12/15/18 人局）
+
+用本地模拟服务器（零延迟）代替真实模型，按座位数分别跑若干局，
+报告每个游戏日各阶段在主线程上的 CPU 耗时（多轮取最小值），并用所有座位数
+拟合增长指数：每个游戏日的引擎开销 ∝ 座位数^k。
+k 接近 1 说明开销随座位数线性增长；超过 --max-exponent 时视为失败。
+
+运行：python test_scaling.py [--games 3] [--repeats 3] [--seats 9,12,15,18]
+"""
+import os
+import sys
+import math
+import asyncio
+import argparse
+import tempfile
+
+from benchmark import PHASES, run_benchmark
+
+
+def per_day(result: dict) -> dict:
+    """把一组基准结果换算为每个游戏日的 CPU 耗时（毫秒）。"""
+    days = max(result["metrics"]["days_per_game"], 1)
+    costs = {"engine": result["metrics"]["engine_cpu_ms"] / days}
+    for name in PHASES:
+        costs[name] = result["phases"][name]["cpu_ms"] / days
+    return costs
+
+
+def growth_exponent(seats: list, costs: list) -> float:
+    """用 log(cost) 对 log(seats) 的最小二乘斜率估算 cost ∝ seats^k 中的 k（用上所有座位数，比只看两端稳定）。"""
+    points = [(math.log(n), math.log(c)) for n, c in zip(seats, costs) if c > 0]
+    if len(points) < 2:
+        return 0.0
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    var_x = sum((x - mean_x) ** 2 for x, _ in points)
+    if var_x == 0:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="引擎开销随座位数的增长测试")
+    parser.add_argument("--games", type=int, default=3, help="每种座位数运行的局数")
+    parser.add_argument("--seats", default="9,12,15,18", help="逗号分隔的座位数")
+    parser.add_argument("--repeats", type=int, default=3, help="每种座位数重复测量的轮数，取最小值以排除调度和 GC 的干扰")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--max-exponent", type=float, default=1.2, help="允许的最大增长指数")
+    args = parser.parse_args()
+
+    seat_counts = sorted(int(n) for n in args.seats.split(","))
+    os.chdir(tempfile.mkdtemp(prefix="werewolf_scaling_"))
+
+    # 先跑一局预热，避免首次导入和初始化的开销计入最小座位数
+    print("预热 ...")
+    asyncio.run(run_benchmark(1, args.seed, latency=0.0, tokens_per_second=0, num_players=seat_counts[0]))
+
+    # 同一种子下各轮的对局完全相同，差异只来自计时噪声；各座位数交替运行，每个阶段取各轮的最小值
+    results = {}
+    for round_num in range(1, args.repeats + 1):
+        for seats in seat_counts:
+            print(f"第 {round_num}/{args.repeats} 轮：运行 {seats} 人局 x {args.games} ...")
+            result = asyncio.run(run_benchmark(args.games, args.seed, latency=0.0, tokens_per_second=0, num_players=seats))
+            costs = per_day(result)
+            if seats in results:
+                costs = {name: min(value, results[seats][1][name]) for name, value in costs.items()}
+            results[seats] = (result, costs)
+
+    print("\n" + "=" * 60)
+    print("每个游戏日的 CPU 耗时（毫秒）")
+    print("=" * 60)
+    columns = ["engine"] + [name for name in PHASES if any(results[s][1][name] for s in seat_counts)]
+    print(f"{'阶段':<18}" + "".join(f"{str(s) + '人':>10}" for s in seat_counts) + f"{'指数 k':>10}")
+    exponents = {}
+    for name in columns:
+        values = [results[s][1][name] for s in seat_counts]
+        exponents[name] = growth_exponent(seat_counts, values)
+        print(f"{name:<18}" + "".join(f"{v:>10.1f}" for v in values) + f"{exponents[name]:>10.2f}")
+    print(f"{'天数/局':<18}" + "".join(f"{results[s][0]['metrics']['days_per_game']:>10.1f}" for s in seat_counts))
+
+    print("\n" + "=" * 60)
+    ok = exponents["engine"] <= args.max_exponent
+    print(f"[{'PASS' if ok else 'FAIL'}] 引擎开销增长指数 k = {exponents['engine']:.2f}（上限 {args.max_exponent}）")
+    print("=" * 60)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
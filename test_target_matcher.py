@@ -0,0 +1,67 @@
+"""
+测试目标解析功能（target_matcher.py）
+
+运行：python test_target_matcher.py
+"""
+import sys
+
+from target_matcher import (
+    TargetMatcher, MATCH_TARGET, MATCH_ABSTAIN, MATCH_AMBIGUOUS, MATCH_NONE, HUNTER_ABSTAIN_TOKENS,
+)
+
+TARGETS = ["Player_1", "Player_3", "Player_10"]
+
+# (名称, 回复, 格式标记, 期望状态, 期望目标)
+CASES = [
+    ("完整名称", "Player_3", None, MATCH_TARGET, "Player_3"),
+    ("Player_1 与 Player_10 不混淆", "我投票给: Player_10", "我投票给", MATCH_TARGET, "Player_10"),
+    ("纯编号", "10", None, MATCH_TARGET, "Player_10"),
+    ("编号别名 player 3", "player 3", None, MATCH_TARGET, "Player_3"),
+    ("编号别名 Player3", "我选Player3", None, MATCH_TARGET, "Player_3"),
+    ("编号别名 3号", "投3号", None, MATCH_TARGET, "Player_3"),
+    ("全角冒号", "我们决定淘汰：Player_1", "我们决定淘汰", MATCH_TARGET, "Player_1"),
+    ("标记后的第一个目标", "我不投Player_3。我投票给: Player_1，因为Player_3是好人", "我投票给", MATCH_TARGET, "Player_1"),
+    ("弃票", "弃票", None, MATCH_ABSTAIN, None),
+    ("标记后弃票", "我投票给：弃票", "我投票给", MATCH_ABSTAIN, None),
+    ("英文弃票按单词匹配", "passive Player_3", None, MATCH_TARGET, "Player_3"),
+    ("多个目标为含糊", "Player_1 和 Player_3 都很可疑", None, MATCH_AMBIGUOUS, None),
+    ("目标与弃票同时出现为含糊", "弃票，或者投Player_3", None, MATCH_AMBIGUOUS, None),
+    ("不在候选中的玩家", "Player_2", None, MATCH_NONE, None),
+    ("无关编号", "第2天我投Player_31", None, MATCH_NONE, None),
+    ("空回复", "", None, MATCH_NONE, None),
+]
+
+failures = 0
+matcher = TargetMatcher.for_targets(TARGETS)
+
+print("=" * 60)
+print("目标解析")
+print("=" * 60)
+for name, text, marker, status, target in CASES:
+    result = matcher.match(text, marker=marker)
+    ok = result.status == status and result.target == target
+    failures += not ok
+    print(f"[{'PASS' if ok else 'FAIL'}] {name}")
+    if not ok:
+        print(f"  期望: {status} {target}")
+        print(f"  实际: {result}")
+
+hunter = TargetMatcher.for_targets(TARGETS, abstain_tokens=HUNTER_ABSTAIN_TOKENS)
+ok = hunter.match("我不想开枪").status == MATCH_ABSTAIN
+failures += not ok
+print(f"[{'PASS' if ok else 'FAIL'}] 猎人弃枪同义词")
+
+no_abstain = TargetMatcher.for_targets(TARGETS, abstain_tokens=())
+ok = all(no_abstain.match(text).status == MATCH_NONE for text in ("我们决定淘汰: Player_2", "弃票", "n", "No"))
+failures += not ok
+print(f"[{'PASS' if ok else 'FAIL'}] 不允许弃权的决策")
+
+ok = TargetMatcher.for_targets(list(TARGETS)) is matcher
+failures += not ok
+print(f"[{'PASS' if ok else 'FAIL'}] 同一目标集合只编译一次")
+
+print("\n" + "=" * 60)
+print("测试完成！" if not failures else f"{failures} 个用例失败")
+print("=" * 60)
+if failures:
+    sys.exit(1)
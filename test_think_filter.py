@@ -1,61 +1,147 @@
 """
-测试思考标签过滤功能
+测试思考标签过滤功能（response_sanitizer.py）
+
+语料取自 logs/ 中真实的模型输出，覆盖：未闭合/只有结束标签的 <think>、
+"Player_X(thinking):" 前缀、嵌套标签、agentscope 内容块等情况。
+每个用例同时用批量和流式（随机切分 chunk）两种方式处理，两者结果必须一致。
+
+运行：python test_think_filter.py
 """
-import re
-
-def remove_thinking_tags(text: str) -> str:
-    """
-    移除文本中的 <think>...</think> 标签及其内容。
-    """
-    # 使用正则表达式移除 <think>...</think> 标签（包括标签内的所有内容）
-    cleaned_text = re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL | re.IGNORECASE)
-    
-    # 也处理可能的变体
-    cleaned_text = re.sub(r'</?think(?:ing)?>.*?</think(?:ing)?>', '', cleaned_text, flags=re.DOTALL | re.IGNORECASE)
-    
-    # 清理多余的空行
-    cleaned_text = re.sub(r'\n\s*\n', '\n\n', cleaned_text)
-    
-    return cleaned_text.strip()
-
-# 测试用例
-test_text1 = """<think>我需要分析当前的情况...</think>作为Player_6，我同意大家的观点。"""
-
-test_text2 = """首先，我需要分析当前的发言情况。
-<think>
-从发言记录来看：
-- Player_0：发言简短
-- Player_1：建议预言家透露信息
-我决定怀疑Player_0
-</think>
-作为Player_6，我同意大家的观点，平安夜说明女巫使用了解药。"""
-
-test_text3 = """</think>作为Player_6，我同意大家的观点"""
+import sys
+import random
+import time
+
+from response_sanitizer import ThinkFilter, clean_speech, extract_text, extract_thinking, remove_thinking_tags
+
+# (名称, 输入, 发言者, 期望输出)
+CORPUS = [
+    ("单行思考标签",
+     "<think>我需要分析当前的情况...</think>作为Player_6，我同意大家的观点。",
+     "Player_6", "作为Player_6，我同意大家的观点。"),
+    ("多行思考标签",
+     "首先，我需要分析当前的发言情况。\n<think>\n从发言记录来看：\n- Player_0：发言简短\n"
+     "- Player_1：建议预言家透露信息\n我决定怀疑Player_0\n</think>\n"
+     "作为Player_6，我同意大家的观点，平安夜说明女巫使用了解药。",
+     None, "首先，我需要分析当前的发言情况。\n\n作为Player_6，我同意大家的观点，平安夜说明女巫使用了解药。"),
+    ("只有结束标签",
+     "</think>作为Player_6，我同意大家的观点",
+     "Player_6", "作为Player_6，我同意大家的观点"),
+    ("省略开始标签的推理（DeepSeek-R1）",
+     "嗯，作为女巫Player_8，现在局势已经明朗：昨晚狼人刀了猎人Player_6。\n</think>\n\n我是女巫，昨晚毒了Player_0。",
+     "Player_8", "我是女巫，昨晚毒了Player_0。"),
+    ("未闭合的思考标签（被截断）",
+     "我投Player_3。<think>不过Player_4的反击虽然有力，却只盯着",
+     None, "我投Player_3。"),
+    ("嵌套标签",
+     "<think>外层<think>内层</think>仍是思考</think>Player_2的发言有问题。",
+     None, "Player_2的发言有问题。"),
+    ("thinking 变体与大小写",
+     "<Thinking>策略：先跟票</Thinking>我跟随大家投Player_1。",
+     None, "我跟随大家投Player_1。"),
+    ("(thinking) 前缀",
+     "Player_8(thinking): 嗯...现在我是女巫，第一晚就遇到Player_1被淘汰的情况。",
+     "Player_8", "嗯...现在我是女巫，第一晚就遇到Player_1被淘汰的情况。"),
+    ("思考过程写在发言前",
+     "Player_7(thinking): （现在我是Player_7了，一个没有特殊能力的平民。场上局势很清晰，"
+     "焦点集中在Player_3和Player_4的互踩上。）\nPlayer_7: 我觉得Player_3的行为太反常了。",
+     "Player_7", "我觉得Player_3的行为太反常了。"),
+    ("只去掉玩家名前缀",
+     "Player_4: 我确实没说话，因为我在听，也在观察。",
+     "Player_4", "我确实没说话，因为我在听，也在观察。"),
+    ("Player_1 与 Player_10 不混淆",
+     "Player_10: 我同意Player_1的看法。",
+     "Player_1", "Player_10: 我同意Player_1的看法。"),
+    ("长分析段落在前",
+     "当前局面分析：昨晚平安夜，说明女巫用了解药。Player_3第一天就急着投沉默玩家，这不像好人心态；"
+     "Player_4的反击虽然有力，却只盯着Player_3一个人，对其他玩家毫无分析，这种针对性也值得警惕。\n\n"
+     "我建议今天先投Player_3。",
+     "Player_2", "我建议今天先投Player_3。"),
+    ("普通发言保持不变",
+     "第一天女巫救人了，但没有更多的提示，看大家发言",
+     "Player_0", "第一天女巫救人了，但没有更多的提示，看大家发言"),
+    ("文本中的小于号",
+     "我觉得 Player_1 < Player_2 的可信度，<b>投Player_1</b>",
+     None, "我觉得 Player_1 < Player_2 的可信度，<b>投Player_1</b>"),
+]
+
+# agentscope 1.x 的消息内容
+CONTENT_CASES = [
+    ("文本块", {"type": "text", "text": "使用解药"}, "使用解药"),
+    ("思考块 + 文本块", [{"type": "thinking", "thinking": "先想想"}, {"type": "text", "text": "我们决定淘汰: Player_0"}],
+     "我们决定淘汰: Player_0"),
+    ("ReActAgent 结构化输出", {"speak": "我投Player_5"}, "我投Player_5"),
+    ("字符串列表", ["Player_3", "其他"], "Player_3"),
+    ("空内容", None, ""),
+]
+
+
+def stream_sanitize(text: str, rng: random.Random) -> str:
+    """把文本随机切成 chunk 逐个送入 ThinkFilter，返回最终可见文本。"""
+    think_filter = ThinkFilter()
+    position = 0
+    while position < len(text):
+        size = rng.randint(1, 7)
+        think_filter.feed(text[position:position + size])
+        position += size
+    think_filter.flush()
+    return think_filter.text
+
+
+failures = 0
+rng = random.Random(0)
 
 print("=" * 60)
-print("测试1 - 单行思考标签")
+print("发言清洗")
 print("=" * 60)
-print("原文:")
-print(test_text1)
-print("\n过滤后:")
-print(remove_thinking_tags(test_text1))
+for name, text, speaker, expected in CORPUS:
+    result = clean_speech(text, speaker=speaker)
+    stream_ok = all(
+        stream_sanitize(text, rng).strip() == ThinkFilter().run(text).strip() for _ in range(20)
+    )
+    ok = result == expected and stream_ok
+    failures += not ok
+    print(f"[{'PASS' if ok else 'FAIL'}] {name}")
+    if not ok:
+        print(f"  期望: {expected!r}")
+        print(f"  实际: {result!r}")
+        if not stream_ok:
+            print("  流式与批量结果不一致")
 
 print("\n" + "=" * 60)
-print("测试2 - 多行思考标签")
+print("内容提取")
 print("=" * 60)
-print("原文:")
-print(test_text2)
-print("\n过滤后:")
-print(remove_thinking_tags(test_text2))
+for name, content, expected in CONTENT_CASES:
+    result = remove_thinking_tags(extract_text(content))
+    ok = result == expected
+    failures += not ok
+    print(f"[{'PASS' if ok else 'FAIL'}] {name}")
+    if not ok:
+        print(f"  期望: {expected!r}")
+        print(f"  实际: {result!r}")
+
+ok = extract_thinking("<think>外层<think>内层</think>尾</think>发言") == "外层<think>内层</think>尾"
+failures += not ok
+print(f"[{'PASS' if ok else 'FAIL'}] 提取思考内容")
 
 print("\n" + "=" * 60)
-print("测试3 - 只有结束标签")
+print("性能")
 print("=" * 60)
-print("原文:")
-print(test_text3)
-print("\n过滤后:")
-print(remove_thinking_tags(test_text3))
+long_text = "".join(text for _, text, _, _ in CORPUS) * 20
+start = time.perf_counter()
+for _ in range(200):
+    clean_speech(long_text, speaker="Player_7")
+batch_us = (time.perf_counter() - start) / 200 * 1e6
+chunks = [long_text[i:i + 8] for i in range(0, len(long_text), 8)]
+start = time.perf_counter()
+think_filter = ThinkFilter()
+for chunk in chunks:
+    think_filter.feed(chunk)
+chunk_us = (time.perf_counter() - start) / len(chunks) * 1e6
+print(f"批量清洗 {len(long_text)} 字符: {batch_us:.0f} us/次")
+print(f"流式过滤: {chunk_us:.2f} us/chunk")
 
 print("\n" + "=" * 60)
-print("测试完成！")
+print("测试完成！" if not failures else f"{failures} 个用例失败")
 print("=" * 60)
+if failures:
+    sys.exit(1)
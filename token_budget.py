@@ -0,0 +1,184 @@
+# werewolf_game/token_budget.py
+"""
+按座位、模型和整局控制模型的 token 用量。
+
+- 每种决策类型有自己的生成上限（max_tokens）：投票、用药等只需要一句话，
+  发言和遗言可以长一些。推理模型（如 DeepSeek-R1）先输出很长的 <think>，
+  按模型单独设置上限或不限制（model_max_tokens），避免在思考中途被截断。
+- 按座位、模型、整局累计 token 用量（本地估算，见 prompt_budget.count_tokens）。
+- 预算接近用完时逐级降级：先缩短输出（降低 max_tokens 并要求简洁回答），
+  用完后切换到配置的廉价模型。
+
+所有参数都在 configs.py 的 TOKEN_BUDGET 中配置。
+"""
+from collections import defaultdict
+from typing import Dict, Optional
+
+from game_context import game_local
+
+try:
+    from configs import TOKEN_BUDGET
+except ImportError:
+    TOKEN_BUDGET = {}
+
+# 默认配置，configs.py 中的 TOKEN_BUDGET 会覆盖同名字段
+DEFAULT_TOKEN_BUDGET_CONFIG = {
+    "enabled": True,
+    # 每种决策类型（即 _get_silent_reply 的 call_site）的生成上限，None 表示不限制
+    "max_tokens": {
+        "vote": 256,
+        "witch_save": 128,
+        "witch_poison": 256,
+        "seer_check": 256,
+        "hunter_shot": 256,
+        "wolf_kill": 512,
+        "wolf_discussion": 768,
+        "speech": 1024,
+        "last_words": 768,
+        "summary": 1024,
+        "default": 1024,
+    },
+    # 按模型 key 覆盖上面的上限：{决策类型: 上限} 只覆盖其中的项，None 表示该模型不限制
+    "model_max_tokens": {
+        "dsR1": None,
+    },
+    # 累计预算（prompt + completion），None 表示不限制
+    "per_seat": None,
+    "per_game": None,
+    # 按模型 key（MODEL_LIST 中的键）设置的整局预算，如 {"dsR1": 150000}
+    "per_model": {},
+    # 用量超过预算的该比例后进入简洁模式
+    "brief_ratio": 0.8,
+    # 简洁模式下 max_tokens 乘以该系数
+    "brief_factor": 0.5,
+    # 预算用完后切换到的模型 key；None 表示只保留简洁模式
+    "fallback_model": None,
+}
+
+# 降级级别
+LEVEL_NORMAL = "normal"
+LEVEL_BRIEF = "brief"
+LEVEL_FALLBACK = "fallback"
+
+# 简洁模式下附加到 prompt 末尾的要求
+BRIEF_INSTRUCTION = "\n\n（请不要展开推理过程，直接给出结论，回答尽量简短。）"
+
+
+def get_token_budget_config() -> Dict:
+    """合并默认配置与 configs.py 中的 TOKEN_BUDGET。"""
+    config = dict(DEFAULT_TOKEN_BUDGET_CONFIG)
+    config.update(TOKEN_BUDGET)
+    config["max_tokens"] = {**DEFAULT_TOKEN_BUDGET_CONFIG["max_tokens"], **TOKEN_BUDGET.get("max_tokens", {})}
+    config["model_max_tokens"] = {**DEFAULT_TOKEN_BUDGET_CONFIG["model_max_tokens"],
+                                  **TOKEN_BUDGET.get("model_max_tokens", {})}
+    return config
+
+
+class TokenBudget:
+    """
+    一局游戏中的 token 用量统计与降级决策。
+
+    用法：
+        plan = token_budget.plan("vote", seat="Player_3", model_key="dsR1")
+        # plan = {"level": "brief", "max_tokens": 128, "fallback_model": None, "reason": "..."}
+        ...
+        token_budget.record("Player_3", "dsR1", prompt_tokens, completion_tokens)
+    """
+
+    def __init__(self) -> None:
+        self.by_seat: Dict[str, int] = defaultdict(int)
+        self.by_model: Dict[str, int] = defaultdict(int)
+        self.total = 0
+        self.degraded: Dict[str, int] = defaultdict(int)
+
+    def reset(self) -> None:
+        self.by_seat.clear()
+        self.by_model.clear()
+        self.total = 0
+        self.degraded.clear()
+
+    def state_dict(self) -> Dict:
+        """本局用量的快照（写入检查点）。"""
+        return {"by_seat": dict(self.by_seat), "by_model": dict(self.by_model),
+                "total": self.total, "degraded": dict(self.degraded)}
+
+    def load_state_dict(self, state: Dict) -> None:
+        """从检查点恢复本局用量，恢复后的游戏继续按原预算降级。"""
+        self.reset()
+        self.by_seat.update(state.get("by_seat", {}))
+        self.by_model.update(state.get("by_model", {}))
+        self.total = state.get("total", 0)
+        self.degraded.update(state.get("degraded", {}))
+
+    def record(self, seat: Optional[str], model_key: str, prompt_tokens: int, completion_tokens: int) -> None:
+        """累计一次调用的 token 用量。seat 为 None 表示不属于任何座位（如裁判的记忆总结）。"""
+        used = prompt_tokens + completion_tokens
+        if seat is not None:
+            self.by_seat[seat] += used
+        self.by_model[model_key] += used
+        self.total += used
+
+    def usage_ratio(self, seat: Optional[str], model_key: str) -> float:
+        """返回座位、模型、整局三种预算中用量占比最高的一个。"""
+        config = get_token_budget_config()
+        ratios = [0.0]
+        if config.get("per_seat") and seat is not None:
+            ratios.append(self.by_seat[seat] / config["per_seat"])
+        if config.get("per_game"):
+            ratios.append(self.total / config["per_game"])
+        model_budget = config.get("per_model", {}).get(model_key)
+        if model_budget:
+            ratios.append(self.by_model[model_key] / model_budget)
+        return max(ratios)
+
+    def plan(self, call_site: str, seat: Optional[str], model_key: str) -> Dict:
+        """
+        决定下一次调用的生成上限和降级方式。
+
+        Args:
+            call_site (str): 决策类型，如 "vote"、"speech"
+            seat (str, optional): 玩家名称；None 表示不计入座位预算
+            model_key (str): 当前模型在 MODEL_LIST 中的 key
+
+        Returns:
+            Dict: {"level", "max_tokens", "fallback_model", "reason"}
+        """
+        config = get_token_budget_config()
+        if not config.get("enabled"):
+            return {"level": LEVEL_NORMAL, "max_tokens": None, "fallback_model": None, "reason": ""}
+
+        limits = config["max_tokens"]
+        model_limits = config.get("model_max_tokens", {})
+        if model_key in model_limits:
+            limits = {} if model_limits[model_key] is None else {**limits, **model_limits[model_key]}
+        max_tokens = limits.get(call_site, limits.get("default"))
+        ratio = self.usage_ratio(seat, model_key)
+        level, fallback_model, reason = LEVEL_NORMAL, None, ""
+
+        if ratio >= 1.0 and config.get("fallback_model") and config["fallback_model"] != model_key:
+            level, fallback_model = LEVEL_FALLBACK, config["fallback_model"]
+            reason = f"预算已用 {ratio:.0%}，切换到 {fallback_model}"
+        elif ratio >= config.get("brief_ratio", 0.8):
+            level = LEVEL_BRIEF
+            reason = f"预算已用 {ratio:.0%}，进入简洁模式"
+
+        if level != LEVEL_NORMAL:
+            self.degraded[level] += 1
+            if max_tokens:
+                max_tokens = max(int(max_tokens * config.get("brief_factor", 0.5)), 32)
+        return {"level": level, "max_tokens": max_tokens, "fallback_model": fallback_model, "reason": reason}
+
+    def report(self) -> str:
+        """生成写入 game_log 的用量摘要。"""
+        if not self.total:
+            return "[Token 用量统计]: 暂无记录"
+        lines = [f"[Token 用量统计] 整局共 {self.total} token（本地估算）"]
+        lines.append("按模型: " + ", ".join(f"{k}={v}" for k, v in sorted(self.by_model.items())))
+        lines.append("按座位: " + ", ".join(f"{k}={v}" for k, v in sorted(self.by_seat.items())))
+        if self.degraded:
+            lines.append("降级次数: " + ", ".join(f"{k}={v}" for k, v in sorted(self.degraded.items())))
+        return "\n".join(lines)
+
+
+# 创建一个全局的预算实例，方便在其他模块中导入和使用
+token_budget = game_local(TokenBudget)
@@ -0,0 +1,218 @@
+# werewolf_game/tracing.py
+"""
+轻量级的分阶段 Span 追踪。
+
+每个阶段、子步骤和模型调用都是一个 span，父子关系通过 contextvars 维护，
+因此在 asyncio.gather 等并发场景下，每个 Task 都会继承创建它时的父 span。
+游戏结束后可以导出为 Chrome trace-event JSON，直接用 chrome://tracing
+或 https://ui.perfetto.dev 打开，以火焰图查看整局游戏的时间线：
+同一个 asyncio Task 中的 span 画在同一行，并发的 Task 各占一行。
+"""
+import os
+import json
+import time
+import asyncio
+import functools
+import threading
+import contextvars
+from typing import Dict, List, Optional
+
+from game_context import game_local
+
+try:
+    from configs import TRACING
+except ImportError:
+    TRACING = {}
+
+# 默认配置，configs.py 中的 TRACING 会覆盖同名字段
+DEFAULT_TRACING_CONFIG = {
+    # 是否记录 span；关闭时 span() 几乎没有开销
+    "enabled": False,
+    # 游戏结束时是否导出 logs/trace_*.json
+    "export_at_game_end": True,
+}
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+def get_tracing_config() -> Dict:
+    """合并默认配置与 configs.py 中的 TRACING。"""
+    config = dict(DEFAULT_TRACING_CONFIG)
+    config.update(TRACING)
+    return config
+
+
+class Span:
+    """一个已开始的 span，结束时写入 Tracer。"""
+
+    __slots__ = ("tracer", "span_id", "parent_id", "name", "args", "start", "cpu_start", "tid", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, args: Dict) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.span_id = 0
+        self.parent_id = 0
+        self.start = 0.0
+        self.cpu_start = 0.0
+        self.tid = 0
+        self._token = None
+
+    def annotate(self, **args) -> None:
+        """为 span 补充参数（如调用结果、token 数）。"""
+        self.args.update(args)
+
+    def __enter__(self) -> "Span":
+        parent = _current_span.get()
+        self.parent_id = parent.span_id if parent is not None else 0
+        self.span_id = self.tracer._next_id()
+        self.tid = self.tracer._task_lane()
+        self._token = _current_span.set(self)
+        self.start = time.perf_counter()
+        self.cpu_start = time.thread_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        end = time.perf_counter()
+        cpu_end = time.thread_time()
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer._finish(self, end, cpu_end)
+
+
+class _NullSpan:
+    """追踪关闭时使用的空 span。"""
+
+    def annotate(self, **args) -> None:
+        pass
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """
+    收集一局游戏中的所有 span。
+
+    用法：
+        with tracer.span("vote", voter=name):
+            ...
+
+        @traced("night")
+        async def _night_phase(self): ...
+    """
+
+    def __init__(self) -> None:
+        self.enabled = get_tracing_config().get("enabled", False)
+        self.events: List[Dict] = []
+        self.game_id = ""
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._span_counter = 0
+        self._lanes: Dict[int, int] = {}
+        self._lane_names: Dict[int, str] = {}
+
+    def reset(self, game_id: Optional[str] = None) -> None:
+        """开始新一局的追踪。"""
+        with self._lock:
+            self.enabled = get_tracing_config().get("enabled", False)
+            self.events = []
+            self.game_id = game_id or ""
+            self._origin = time.perf_counter()
+            self._span_counter = 0
+            self._lanes = {}
+            self._lane_names = {}
+
+    def span(self, name: str, **args):
+        """创建一个 span 上下文管理器。"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, args)
+
+    def current(self):
+        """返回当前上下文中的 span，可用于补充参数。"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _current_span.get() or _NULL_SPAN
+
+    def _next_id(self) -> int:
+        with self._lock:
+            self._span_counter += 1
+            return self._span_counter
+
+    def _task_lane(self) -> int:
+        """把当前 asyncio Task 映射为一个稳定的小整数，作为 trace 中的 tid。"""
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        key = id(task) if task is not None else threading.get_ident()
+        with self._lock:
+            lane = self._lanes.get(key)
+            if lane is None:
+                lane = len(self._lanes) + 1
+                self._lanes[key] = lane
+                self._lane_names[lane] = task.get_name() if task is not None else threading.current_thread().name
+            return lane
+
+    def _finish(self, span: Span, end: float, cpu_end: float) -> None:
+        args = dict(span.args)
+        args["span_id"] = span.span_id
+        args["parent_id"] = span.parent_id
+        event = {
+            "name": span.name,
+            "ph": "X",
+            "ts": round((span.start - self._origin) * 1e6, 1),
+            "dur": round((end - span.start) * 1e6, 1),
+            # 线程 CPU 时间：不包含等待模型的时间，但包含同一线程上并发 Task 的 CPU 开销
+            "tts": round(span.cpu_start * 1e6, 1),
+            "tdur": round((cpu_end - span.cpu_start) * 1e6, 1),
+            "pid": 1,
+            "tid": span.tid,
+            "args": args,
+        }
+        with self._lock:
+            self.events.append(event)
+
+    def to_chrome_trace(self) -> Dict:
+        """转换为 Chrome trace-event 格式。"""
+        with self._lock:
+            events = sorted(self.events, key=lambda e: (e["ts"], -e["dur"]))
+            lanes = dict(self._lane_names)
+        metadata = [{"name": "process_name", "ph": "M", "pid": 1, "args": {"name": f"werewolf {self.game_id}"}}]
+        for tid, name in sorted(lanes.items()):
+            metadata.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}})
+        return {"traceEvents": metadata + events, "displayTimeUnit": "ms"}
+
+    def export(self, log_dir: str = "logs") -> Optional[str]:
+        """写入 trace_{game_id}.json，返回文件路径；未记录任何 span 时返回 None。"""
+        if not self.events:
+            return None
+        os.makedirs(log_dir, exist_ok=True)
+        suffix = self.game_id or time.strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(log_dir, f"trace_{suffix}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f, ensure_ascii=False)
+        return path
+
+
+# 创建一个全局的追踪实例，方便在其他模块中导入和使用
+tracer = game_local(Tracer)
+
+
+def traced(name: str):
+    """把一个 async 方法整体包在 span 中的装饰器。"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator